@@ -0,0 +1,221 @@
+"""
+Deck-independent archetype tables: how every card of a set rates in each
+mono-color and two-color archetype
+"""
+import os
+import sys
+import json
+import array
+import base64
+import itertools
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+from card_table import TYPE_FLAGS, color_mask
+from deck_context import DeckContext
+from scoring_weights import settings_fingerprint
+
+# Mono colors first, then every two-color pair
+ARCHETYPES = tuple("WUBRG") + tuple("".join(pair) for pair in itertools.combinations("WUBRG", 2))
+
+# Bump when the profile or the file layout changes, so cached tables are rebuilt
+ARCHETYPE_TABLE_VERSION = 1
+
+# Nonland cards in the representative archetype deck
+PROFILE_SIZE = 23
+
+# Keywords and creature types on at least this share of an archetype's cards
+# are part of its profile
+PROFILE_THEME_SHARE = 0.1
+
+
+def archetype_cache_path(set_cache_file: str) -> str:
+    """Archetype table file stored next to a set cache file (cache/TLA.json -> cache/TLA.archetypes.json)"""
+    root, _ = os.path.splitext(set_cache_file)
+    return root + ".archetypes.json"
+
+
+def archetype_profile(engine, colors: str) -> Dict[str, Any]:
+    """
+    Representative deck analysis (in _analyze_deck's shape) for an
+    archetype: PROFILE_SIZE cards in its colors with the ideal mana curve
+    and creature ratio, and the keywords and creature types common among
+    the set's cards of those colors. Curve and balance are therefore
+    neutral, so cards differ by color fit, synergy and power.
+    """
+    weights = engine.weights
+    mask = color_mask(colors)
+    keywords = Counter()
+    creature_types = Counter()
+    members = 0
+    # Type flags and colors come from the columns and per-name caches, so a
+    # mapped set builds no card records
+    flags = engine._card_attributes()[1]
+    for name, rows in engine._name_rows.items():
+        card_flags = flags[rows[0]]
+        card_mask = engine._bucket_cache[name][1]
+        if card_flags & TYPE_FLAGS["is_land"] or not card_mask or card_mask & ~mask:
+            continue
+        members += 1
+        keywords.update(engine._keyword_cache[name])
+        if card_flags & TYPE_FLAGS["is_creature"]:
+            creature_types.update(set(engine._creature_type_cache[name]))
+
+    def themes(counts: Counter) -> Counter:
+        return Counter({key: max(1, round(PROFILE_SIZE * count / members))
+                        for key, count in counts.items() if count >= PROFILE_THEME_SHARE * members})
+
+    creatures = round(PROFILE_SIZE * weights.creature_ratio)
+    curve = Counter(dict(enumerate(weights.ideal_curve)))
+    type_index = themes(creature_types) if members else Counter()
+    return {
+        "count": PROFILE_SIZE,
+        "creatures": creatures,
+        "spells": PROFILE_SIZE - creatures,
+        "lands": 0,
+        "cmc_distribution": curve,
+        "colors": Counter({color: PROFILE_SIZE for color in colors}),
+        "color_identity": set(colors),
+        "keywords": themes(keywords) if members else Counter(),
+        "creature_types": Counter(type_index),
+        "creature_type_index": type_index,
+        "mana_curve": {},
+        "avg_cmc": sum(cmc * count for cmc, count in curve.items()) / max(1.0, sum(curve.values())),
+        "synergies": [],
+    }
+
+
+class ArchetypeTable:
+    """
+    Score of every card of a set (one row per name) in each of ARCHETYPES,
+    stored compactly as a row-major int16 array of the unclamped score x 10
+    (so cards above the 10 cap still rank apart), plus each card's color
+    mask for on-color and signpost lookups.
+    """
+
+    def __init__(self, names: List[str], scores: array.array, masks: bytes, fingerprint: str):
+        self.names = names
+        self.scores = scores
+        self.masks = masks
+        self.fingerprint = fingerprint
+        self._rows = {name: row for row, name in enumerate(names)}
+
+    @classmethod
+    def compute(cls, engine) -> "ArchetypeTable":
+        """Score every card against each archetype profile with the engine's scoring components"""
+        names = list(engine._name_rows)
+        rows = [engine._name_rows[name][0] for name in names]
+        if not engine.columnar:
+            # Per-card scoring reads only a card's name and creature flag;
+            # everything else comes from the engine's per-name caches
+            flags = engine._card_attributes()[1]
+            cards = [{"name": name, "is_creature": bool(flags[row] & TYPE_FLAGS["is_creature"])}
+                     for name, row in zip(names, rows)]
+        columns = []
+        for archetype in ARCHETYPES:
+            context = DeckContext(engine, [], archetype_profile(engine, archetype))
+            if engine.columnar:
+                totals = engine._unclamped_scores(engine._score_columns(context), context).tolist()
+                columns.append([totals[row] for row in rows])
+            else:
+                scored = {"components": [engine._score_card(card, context) for card in cards]}
+                columns.append(engine._unclamped_scores(scored, context))
+
+        scores = array.array("h")
+        for i in range(len(names)):
+            scores.extend(int(round(column[i] * 10)) for column in columns)
+        masks = bytes(engine._bucket_cache[name][1] for name in names)
+        return cls(names, scores, masks, _fingerprint(engine))
+
+    @classmethod
+    def load(cls, path: str, engine) -> Optional["ArchetypeTable"]:
+        """
+        Table from a cache file, or None if it is missing, unreadable, or was
+        built for other cards (names or content), archetypes or scoring settings.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            scores = array.array("h")
+            scores.frombytes(base64.b64decode(data["scores"]))
+            if data["byteorder"] != sys.byteorder:
+                scores.byteswap()
+            table = cls(data["names"], scores, base64.b64decode(data["masks"]), data["fingerprint"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if (data.get("archetypes") != list(ARCHETYPES) or table.fingerprint != _fingerprint(engine)
+                or table.names != list(engine._name_rows)
+                or len(table.scores) != len(table.names) * len(ARCHETYPES)):
+            return None
+        return table
+
+    def save(self, path: str):
+        """Write the table as JSON with the matrix base64 encoded"""
+        data = {
+            "archetypes": list(ARCHETYPES),
+            "fingerprint": self.fingerprint,
+            "byteorder": sys.byteorder,
+            "names": self.names,
+            "scores": base64.b64encode(self.scores.tobytes()).decode("ascii"),
+            "masks": base64.b64encode(self.masks).decode("ascii"),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def score(self, card_name: str, archetype: str) -> float:
+        """A card's unclamped score in one archetype"""
+        return self.scores[self._rows[card_name] * len(ARCHETYPES) + _archetype_index(archetype)] / 10
+
+    def rating(self, card_name: str, archetype: str) -> float:
+        """A card's 1-10 rating in one archetype"""
+        return _clamp(self.score(card_name, archetype))
+
+    def ratings(self, card_name: str) -> Dict[str, float]:
+        """A card's 1-10 rating in every archetype"""
+        start = self._rows[card_name] * len(ARCHETYPES)
+        return {archetype: _clamp(value / 10)
+                for archetype, value in zip(ARCHETYPES, self.scores[start:start + len(ARCHETYPES)])}
+
+    def best_rating(self, card_name: str) -> float:
+        """A card's 1-10 rating in the archetype that suits it best"""
+        start = self._rows[card_name] * len(ARCHETYPES)
+        return _clamp(max(self.scores[start:start + len(ARCHETYPES)]) / 10)
+
+    def best(self, archetype: str, count: int = 15) -> List[tuple]:
+        """The highest scoring (card_name, rating) rows castable in an archetype (colorless included)"""
+        mask = color_mask(archetype)
+        return self._top(archetype, [row for row, card_mask in enumerate(self.masks)
+                                     if not card_mask & ~mask], count)
+
+    def signposts(self, archetype: str, count: int = 5) -> List[tuple]:
+        """The highest scoring multicolor cards of exactly a two-color archetype's colors"""
+        if len(archetype) < 2:
+            return []
+        mask = color_mask(archetype)
+        return self._top(archetype, [row for row, card_mask in enumerate(self.masks) if card_mask == mask], count)
+
+    def _top(self, archetype: str, rows: List[int], count: int) -> List[tuple]:
+        column = _archetype_index(archetype)
+        stride = len(ARCHETYPES)
+        rows = sorted(rows, key=lambda row: -self.scores[row * stride + column])[:count]
+        return [(self.names[row], _clamp(self.scores[row * stride + column] / 10)) for row in rows]
+
+
+def _archetype_index(archetype: str) -> int:
+    """Column of an archetype, given its colors in any order or case"""
+    colors = "".join(sorted(archetype.upper(), key="WUBRG".find))
+    if colors not in ARCHETYPES:
+        raise ValueError(f"Unknown archetype: {archetype}")
+    return ARCHETYPES.index(colors)
+
+
+def _clamp(score: float) -> float:
+    return round(max(1.0, min(10.0, score)), 1)
+
+
+def _fingerprint(engine) -> str:
+    return (f"{ARCHETYPE_TABLE_VERSION}:{PROFILE_SIZE}:{PROFILE_THEME_SHARE}:{settings_fingerprint()}:"
+            f"{engine.card_digest()}")
@@ -0,0 +1,419 @@
+"""
+Performance benchmarks for the card rating engine
+Run with: python benchmark.py [SET_CODE]
+"""
+import sys
+import os
+import gc
+import json
+import time
+import types
+import random
+import tempfile
+import statistics
+import tracemalloc
+
+import config
+from card_rating_engine import CardRatingEngine, np
+from card_table import CardTable
+from lookahead import LookaheadRater
+from deck_builder import DeckBuilder
+from archetypes import ArchetypeTable
+from synergy_matrix import SynergyMatrix, synergy_cache_path
+import scryfall_api
+from scryfall_api import ScryfallAPI
+from scryfall_stub import StubScryfall, canned_cards
+from set_pipeline import stream_set
+from set_cache import set_cache_path, read_set_cache, write_set_cache, load_cached_set
+from card_store import CardStore, card_store_path, open_card_store
+
+
+def time_call(func, repeat: int = 30) -> float:
+    """Median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_deck_size_scaling(set_cards):
+    """
+    Rating latency against deck size, with the rating cache disabled.
+    Creature-type synergy is a lookup in the deck's type index, so the
+    cost per rated card should stay flat from a few picks up to a
+    MAX_DECK_SIZE singleton pool.
+    """
+    rng = random.Random(1)
+    names = sorted({card["name"] for card in set_cards})
+    sizes = [1, 10, 23, config.DEFAULT_DECK_SIZE, config.MAX_DECK_SIZE]
+
+    print(f"\nRate latency vs deck size ({len(set_cards)} cards in set)")
+    print(f"{'deck':>6} {'per-card ms':>12} {'columnar ms':>12}")
+    for size in sizes:
+        deck_names = rng.sample(names, min(size, len(names)))
+        row = []
+        for columnar in (False, True):
+            engine = CardRatingEngine(set_cards, columnar=columnar)
+            engine.rating_cache_size = 0
+            deck = engine.new_deck(deck_names)
+            row.append(time_call(lambda: engine.rank_cards(deck).top(20), repeat=15 if not columnar else 50))
+        print(f"{size:>6} {row[0]:>12.2f} {row[1]:>12.2f}")
+
+
+def bench_pick_rerate(set_cards):
+    """
+    Latency of re-rating after each pick of a simulated draft. Only the
+    score components whose deck inputs changed are patched, so this should
+    stay well below a full rescore of the set.
+    """
+    rng = random.Random(2)
+    names = [card["name"] for card in set_cards]
+    engine = CardRatingEngine(set_cards)
+    full = CardRatingEngine(set_cards)
+    full.rating_cache_size = 0
+    deck = engine.new_deck()
+    
+    samples = {"delta": [], "full": []}
+    for name in rng.sample(names, config.DEFAULT_DECK_SIZE):
+        deck.add(name)
+        for label, target in (("delta", engine), ("full", full)):
+            start = time.perf_counter()
+            target.rank_cards(deck).top(20)
+            samples[label].append((time.perf_counter() - start) * 1000)
+    
+    print(f"\nRe-rate after each pick ({config.DEFAULT_DECK_SIZE} picks)")
+    for label, times in samples.items():
+        print(f"  {label:>5}: median {statistics.median(times):.3f} ms, max {max(times):.3f} ms")
+
+
+def bench_rate_pack(set_cards):
+    """
+    Latency of rating a 14-card pack against a mid-draft deck. The deck's
+    compiled context is reused across calls, so only the pack is scored.
+    Target: under 1 ms.
+    """
+    rng = random.Random(3)
+    names = sorted({card["name"] for card in set_cards})
+    engine = CardRatingEngine(set_cards)
+    deck = engine.new_deck(rng.sample(names, 23))
+    packs = [rng.sample(names, 14) for _ in range(50)]
+    
+    samples = []
+    for pack in packs:
+        start = time.perf_counter()
+        engine.rate_pack(deck, pack)
+        samples.append((time.perf_counter() - start) * 1000)
+    full = time_call(lambda: engine.rate_cards(deck.names), repeat=15)
+    
+    print(f"\nRate a 14-card pack (deck of {len(deck)})")
+    print(f"  rate_pack:  median {statistics.median(samples):.3f} ms, max {max(samples):.3f} ms")
+    print(f"  rate_cards: median {full:.3f} ms (whole set)")
+
+
+def bench_lookahead(set_cards):
+    """
+    Two-ply lookahead over the top candidates of a mid-draft deck, against
+    the naive approach of one uncached rate_cards call per candidate.
+    """
+    rng = random.Random(3)
+    names = sorted({card["name"] for card in set_cards})
+    deck = rng.sample(names, 23)
+    top_k = config.LOOKAHEAD_CANDIDATES
+    
+    engine = CardRatingEngine(set_cards)
+    rater = LookaheadRater(engine)
+    candidates = [row[0] for row in rater.rate(deck, time_budget=0)]
+    
+    def lookahead():
+        engine.clear_cache()
+        rater.rate(deck, time_budget=0)
+    
+    naive_engine = CardRatingEngine(set_cards)
+    naive_engine.rating_cache_size = 0
+    
+    def naive():
+        naive_engine.rate_cards(deck)
+        for name in candidates:
+            naive_engine.rate_cards(deck + [name])
+    
+    print(f"\nLookahead over the top {top_k} candidates (deck of {len(deck)})")
+    print(f"  LookaheadRater:           median {time_call(lookahead, repeat=15):.3f} ms")
+    print(f"  rate_cards per candidate: median {time_call(naive, repeat=15):.3f} ms")
+
+
+def bench_deck_quality(set_cards):
+    """
+    Whole-deck quality after one card swap, maintained incrementally by
+    DeckState, against rebuilding the deck from its card names.
+    """
+    rng = random.Random(3)
+    names = sorted({card["name"] for card in set_cards})
+    engine = CardRatingEngine(set_cards)
+    deck = engine.new_deck(rng.sample(names, 23))
+    swaps = [rng.choice(names) for _ in range(1000)]
+    
+    def incremental():
+        for name in swaps:
+            card = deck.pop(0)
+            deck.add(name)
+            deck.quality()
+            deck.pop()
+            deck.add(card)
+    
+    def rebuild():
+        for name in swaps[:100]:
+            engine.new_deck(deck.names[1:] + [name]).quality()
+    
+    print(f"\nDeck quality after a swap (deck of {len(deck)})")
+    print(f"  incremental: {time_call(incremental, repeat=5):.4f} us per swap")
+    print(f"  rebuild:     {time_call(rebuild, repeat=5) * 10:.4f} us per swap")
+
+
+def bench_deck_builder(set_cards):
+    """Building the best decks from sealed-sized and draft-sized pools. Target: 90 cards under 1 s."""
+    rng = random.Random(1)
+    names = [card["name"] for card in set_cards]
+    builder = DeckBuilder(CardRatingEngine(set_cards))
+    
+    print("\nDeck builder (all color pairs and splashes, one process)")
+    for size in (45, 90):
+        pool = rng.sample(names, size)
+        print(f"  {size}-card pool: median {time_call(lambda: builder.build(pool), repeat=5):.0f} ms")
+
+
+def bench_archetype_table(set_cards, path: str = "benchmark.archetypes.json"):
+    """Computing the per-archetype ratings versus loading them from the cache file"""
+    engine = CardRatingEngine(set_cards)
+    table = ArchetypeTable.compute(engine)
+    table.save(path)
+    try:
+        print(f"\nArchetype table ({len(table)} cards x {len(table.scores) // len(table)} archetypes, "
+              f"{os.path.getsize(path)} bytes on disk)")
+        print(f"  compute: median {time_call(lambda: ArchetypeTable.compute(engine), repeat=10):.2f} ms")
+        print(f"  load:    median {time_call(lambda: ArchetypeTable.load(path, engine), repeat=10):.2f} ms")
+        print(f"  best 15 WU: median {time_call(lambda: table.best('WU')):.3f} ms")
+    finally:
+        os.remove(path)
+
+
+def bench_synergy_matrix(set_cards, path: str = "benchmark.synergy.json"):
+    """Building the pairwise synergy matrix versus loading it, and the per-pick mat-vec update"""
+    engine = CardRatingEngine(set_cards)
+    pairings = engine.weights.synergy_pairings
+    matrix = engine.synergy_matrix()
+    matrix.save(path)
+    try:
+        print(f"\nSynergy matrix ({len(matrix)} x {len(matrix)}, {matrix.nnz} entries, "
+              f"{os.path.getsize(path)} bytes on disk)")
+        print(f"  compute: median {time_call(lambda: SynergyMatrix.compute(engine, pairings), repeat=10):.2f} ms")
+        print(f"  load:    median {time_call(lambda: SynergyMatrix.load(path, engine, pairings), repeat=10):.2f} ms")
+    finally:
+        os.remove(path)
+    
+    rng = random.Random(5)
+    deck = rng.sample(list(matrix.positions.values()), 23)
+    counts = dict.fromkeys(deck, 1)
+    print(f"  23-card deck mat-vec: median {time_call(lambda: matrix.matvec(counts)):.3f} ms")
+    if engine.columnar:
+        hits = np.zeros(len(matrix))
+        print(f"  one-pick row update:  median {time_call(lambda: engine._add_pair_rows(hits, {deck[0]: 1}, 1)):.4f} ms")
+
+
+def bench_page_fetch(pages: int = 6, latency: float = 0.3):
+    """Fetching a set's search pages one at a time versus concurrently, from a local stand-in server"""
+    print(f"\nSet fetch ({pages} pages of 175 cards, {latency * 1000:.0f} ms per response, "
+          f"{config.SCRYFALL_REQUEST_INTERVAL * 1000:.0f} ms request interval)")
+    with StubScryfall(canned_cards(pages * 175), latency=latency) as stub:
+        base_url, ScryfallAPI.BASE_URL = ScryfallAPI.BASE_URL, stub.url
+        try:
+            for workers in (1, config.SCRYFALL_FETCH_WORKERS):
+                start = time.perf_counter()
+                ScryfallAPI.get_set_cards("TST", workers=workers)
+                print(f"  {workers} worker(s): {(time.perf_counter() - start) * 1000:.0f} ms")
+        finally:
+            ScryfallAPI.BASE_URL = base_url
+
+
+def bench_set_stream(pages: int = 6, latency: float = 0.2):
+    """Fetch-then-parse versus streaming pages into the engine: time to the first usable cards and peak memory"""
+    print(f"\nSet load ({pages} pages of 175 cards, {latency * 1000:.0f} ms per response)")
+    with StubScryfall(canned_cards(pages * 175), latency=latency) as stub:
+        base_url, ScryfallAPI.BASE_URL = ScryfallAPI.BASE_URL, stub.url
+        try:
+            def accumulate():
+                engine = CardRatingEngine(ScryfallAPI.parse_cards(ScryfallAPI.get_set_cards("TST")))
+                first_cards.append(time.perf_counter())
+                return engine
+            
+            def stream():
+                return stream_set("TST", on_page=lambda engine, cards: first_cards.append(time.perf_counter()))
+            
+            for label, load in (("fetch then parse", accumulate), ("streamed pages", stream)):
+                first_cards = []
+                tracemalloc.start()
+                start = time.perf_counter()
+                engine = load()
+                total = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"  {label:17} first cards {(first_cards[0] - start) * 1000:5.0f} ms, "
+                      f"all {len(engine.all_cards)} {total * 1000:5.0f} ms, peak {peak / 1024:6.0f} KiB")
+        finally:
+            ScryfallAPI.BASE_URL = base_url
+
+
+def bench_set_catalog(latency: float = 0.3):
+    """Time until the set list is available: no catalog, a fresh catalog and a stale one"""
+    print(f"\nSet catalog ({latency * 1000:.0f} ms per response)")
+    sets = [{"code": f"s{i:03}", "name": f"Set {i}"} for i in range(900)]
+    with StubScryfall([], latency=latency, sets=sets) as stub, tempfile.TemporaryDirectory() as cache_dir:
+        saved = ScryfallAPI.BASE_URL, config.CACHE_DIRECTORY, config.CACHE_EXPIRATION
+        ScryfallAPI.BASE_URL, config.CACHE_DIRECTORY = stub.url, cache_dir
+        try:
+            for label, expiration in (("no catalog", None), ("fresh catalog", saved[2]), ("stale catalog", 1e-9)):
+                if expiration is not None:
+                    config.CACHE_EXPIRATION = expiration
+                start = time.perf_counter()
+                ScryfallAPI.get_set_codes()
+                print(f"  {label:14} {(time.perf_counter() - start) * 1000:7.1f} ms")
+            scryfall_api._catalog_refresh.join()
+        finally:
+            ScryfallAPI.BASE_URL, config.CACHE_DIRECTORY, config.CACHE_EXPIRATION = saved
+
+
+def bench_set_cache(set_code: str):
+    """
+    Indent=2 JSON set cache versus the binary set cache: file size, read
+    time and time to a ready engine. Loading goes through the card store
+    built from the set caches (as in main), which maps the cards instead
+    of decoding them; the binary read alone is shown for comparison.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The JSON format of earlier versions, written from the set's current cache
+        json_file = os.path.join(cache_dir, f"{set_code}.json")
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(load_cached_set(set_code), f, indent=2)
+        
+        def read_json():
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return CardTable.from_dicts(json.load(f))
+        
+        binary_file = set_cache_path(cache_dir, set_code)
+        write_set_cache(binary_file, read_json())
+        json_size, binary_size = os.path.getsize(json_file), os.path.getsize(binary_file)
+        json_read = time_call(read_json, repeat=50)
+        binary_read = time_call(lambda: read_set_cache(binary_file), repeat=50)
+        open_card_store(cache_dir).close()
+        store_size = os.path.getsize(card_store_path(cache_dir))
+        store_load = time_call(lambda: open_card_store(cache_dir).open_set(set_code), repeat=50)
+        json_engine = time_call(lambda: CardRatingEngine(read_json()), repeat=20)
+        store_engine = time_call(lambda: CardRatingEngine(open_card_store(cache_dir).open_set(set_code)), repeat=20)
+    
+    print(f"\nSet cache ({set_code})")
+    print(f"  size:         JSON {json_size / 1024:6.0f} KiB, binary {binary_size / 1024:6.1f} KiB "
+          f"({json_size / binary_size:.1f}x smaller; card store {store_size / 1024:.0f} KiB)")
+    print(f"  load:         JSON {json_read:6.2f} ms,  binary {store_load:6.2f} ms  "
+          f"({json_read / store_load:.1f}x faster; decoding every card: {binary_read:.2f} ms)")
+    print(f"  ready engine: JSON {json_engine:6.2f} ms,  binary {store_engine:6.2f} ms  "
+          f"({json_engine / store_engine:.1f}x faster)")
+
+
+def bench_card_store(set_code: str, set_count: int = 40):
+    """
+    Startup with set_count cached sets: each set's binary cache versus the
+    memory-mapped card store, to a ready engine with its first ranked page
+    and to every set opened
+    """
+    cards = CardTable.from_dicts(load_cached_set(set_code))
+    codes = [f"S{i:02d}" for i in range(set_count)]
+    deck = [card["name"] for card in cards[::30]]
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for code in codes:
+            write_set_cache(set_cache_path(cache_dir, code), cards)
+        start = time.perf_counter()
+        open_card_store(cache_dir).close()
+        build = (time.perf_counter() - start) * 1000
+        store_size = os.path.getsize(card_store_path(cache_dir))
+        cache_size = sum(os.path.getsize(set_cache_path(cache_dir, code)) for code in codes)
+        
+        # As in main, the set's synergy matrix is loaded from its cache file
+        synergy_file = synergy_cache_path(set_cache_path(cache_dir, codes[0]))
+        CardRatingEngine(cards).load_synergy_matrix(synergy_file)
+        
+        def first_page(table):
+            engine = CardRatingEngine(table)
+            engine.load_synergy_matrix(synergy_file)
+            return engine.rank_cards(deck, page_size=10).page(0)
+        
+        cache_engine = time_call(lambda: CardRatingEngine(read_set_cache(set_cache_path(cache_dir, codes[0]))[1]),
+                                 repeat=20)
+        store_engine = time_call(lambda: CardRatingEngine(open_card_store(cache_dir).open_set(codes[0])), repeat=20)
+        cache_page = time_call(lambda: first_page(read_set_cache(set_cache_path(cache_dir, codes[0]))[1]), repeat=20)
+        store_page = time_call(lambda: first_page(open_card_store(cache_dir).open_set(codes[0])), repeat=20)
+        cache_all = time_call(lambda: [read_set_cache(set_cache_path(cache_dir, code)) for code in codes], repeat=5)
+        store_all = time_call(lambda: [open_card_store(cache_dir).open_set(code) for code in codes], repeat=5)
+        store_open = time_call(lambda: CardStore(card_store_path(cache_dir)), repeat=50)
+    
+    print(f"\nCard store ({set_count} cached copies of {set_code}, {len(cards)} cards each)")
+    print(f"  size:           set caches {cache_size / 1024:6.0f} KiB, store {store_size / 1024:6.0f} KiB "
+          f"(built in {build:.0f} ms)")
+    print(f"  ready engine:   set cache {cache_engine:6.2f} ms,  store {store_engine:6.2f} ms  "
+          f"({cache_engine / store_engine:.1f}x faster)")
+    print(f"  first page:     set cache {cache_page:6.2f} ms,  store {store_page:6.2f} ms  "
+          f"({cache_page / store_page:.1f}x faster)")
+    print(f"  every set:      set caches {cache_all:6.1f} ms, store {store_all:6.1f} ms  "
+          f"({cache_all / store_all:.1f}x faster)")
+    print(f"  map the store:  {store_open:.3f} ms")
+
+
+def deep_sizeof(obj) -> int:
+    """Bytes used by an object and everything it references (each object counted once)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, types.ModuleType, types.FunctionType)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        stack.extend(gc.get_referents(item))
+    return total
+
+
+def bench_card_memory(set_code: str):
+    """Bytes per card for parsed dicts versus the compact CardTable"""
+    dict_cards = load_cached_set(set_code)
+    table = CardTable.from_dicts(load_cached_set(set_code))
+    dict_bytes = deep_sizeof(dict_cards) / len(dict_cards)
+    table_bytes = deep_sizeof(table) / len(table)
+
+    print(f"\nMemory per card ({set_code}, {len(table)} cards)")
+    print(f"  parsed dicts: {dict_bytes:8.0f} bytes")
+    print(f"  CardTable:    {table_bytes:8.0f} bytes ({dict_bytes / table_bytes:.1f}x smaller)")
+
+
+def main():
+    set_code = sys.argv[1] if len(sys.argv) > 1 else "TLA"
+    set_cards = load_cached_set(set_code)
+    bench_card_memory(set_code)
+    bench_set_cache(set_code)
+    bench_card_store(set_code)
+    bench_deck_size_scaling(set_cards)
+    bench_pick_rerate(set_cards)
+    bench_rate_pack(set_cards)
+    bench_lookahead(set_cards)
+    bench_deck_quality(set_cards)
+    bench_deck_builder(set_cards)
+    bench_archetype_table(set_cards)
+    bench_synergy_matrix(set_cards)
+    bench_page_fetch()
+    bench_set_stream()
+    bench_set_catalog()
+
+
+if __name__ == "__main__":
+    main()
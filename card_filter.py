@@ -0,0 +1,111 @@
+"""
+Candidate filters applied before cards are scored
+"""
+from typing import List, Dict, Any, Optional, Iterable
+
+from card_table import COLOR_BITS, TYPE_FLAGS, color_mask
+
+# Type names accepted by CardFilter(types=...), mapped to card flag bits
+TYPE_NAMES = {key[3:]: bit for key, bit in TYPE_FLAGS.items()}
+
+
+class CardFilter:
+    """
+    Which set cards to consider when rating a deck.
+    Every condition is optional; a card must pass all given conditions.
+    Conditions are checked against per-card bitmasks precomputed by the
+    rating engine, so excluded cards are never scored.
+    """
+
+    def __init__(self, colors: Optional[str] = None, deck_colors: bool = False,
+                 min_cmc: Optional[float] = None, max_cmc: Optional[float] = None,
+                 types: Optional[Iterable[str]] = None, rarities: Optional[Iterable[str]] = None,
+                 exclude_deck: bool = False, text: Optional[str] = None):
+        """
+        colors: only cards within these colors (e.g. "WU"; colorless always passes)
+        deck_colors: only cards within the deck's color identity
+        min_cmc / max_cmc: inclusive mana value range
+        types: card types, any of which must match (creature, instant, sorcery,
+               enchantment, artifact, land)
+        rarities: allowed rarities
+        exclude_deck: skip cards already in the deck
+        text: case-insensitive substring of the name, type line or oracle text
+        """
+        self.colors = colors.upper() if colors else None
+        self.deck_colors = deck_colors
+        self.min_cmc = min_cmc
+        self.max_cmc = max_cmc
+        self.types = [t.lower() for t in types] if types else None
+        self.rarities = [r.lower() for r in rarities] if rarities else None
+        self.exclude_deck = exclude_deck
+        self.text = text.lower() if text else None
+
+        unknown = [t for t in self.types or [] if t not in TYPE_NAMES]
+        if unknown:
+            raise ValueError(f"Unknown card type: {', '.join(unknown)}")
+        unknown = [c for c in self.colors or "" if c not in COLOR_BITS]
+        if unknown:
+            raise ValueError(f"Unknown color: {', '.join(unknown)}")
+
+    @classmethod
+    def parse(cls, spec: str) -> "CardFilter":
+        """
+        Build a filter from a space-separated spec, e.g.
+        "deck-colors cmc<=3 type=creature rarity=common,uncommon new".
+        Tokens: colors=WU, deck-colors, cmc<=N, cmc>=N, type=a,b, rarity=a,b,
+        new (not already in the deck), text=word.
+        """
+        options = {}
+        for token in spec.split():
+            lowered = token.lower()
+            if lowered == "deck-colors":
+                options["deck_colors"] = True
+            elif lowered == "new":
+                options["exclude_deck"] = True
+            elif lowered.startswith("cmc<="):
+                options["max_cmc"] = float(lowered[5:])
+            elif lowered.startswith("cmc>="):
+                options["min_cmc"] = float(lowered[5:])
+            elif lowered.startswith("colors="):
+                options["colors"] = token[7:]
+            elif lowered.startswith("type="):
+                options["types"] = lowered[5:].split(",")
+            elif lowered.startswith("rarity="):
+                options["rarities"] = lowered[7:].split(",")
+            elif lowered.startswith("text="):
+                options["text"] = token[5:]
+            else:
+                raise ValueError(f"Unknown filter: {token}")
+        return cls(**options)
+
+    def __bool__(self) -> bool:
+        return any((self.colors, self.deck_colors, self.min_cmc is not None, self.max_cmc is not None,
+                    self.types, self.rarities, self.exclude_deck, self.text))
+
+    def allowed_colors(self, analysis: Optional[Dict[str, Any]]) -> Optional[int]:
+        """5-bit mask of the colors cards may have, or None for any"""
+        mask = None
+        if self.colors:
+            mask = color_mask(self.colors)
+        if self.deck_colors and analysis and analysis["color_identity"]:
+            deck_mask = color_mask(analysis["color_identity"])
+            mask = deck_mask if mask is None else mask & deck_mask
+        return mask
+
+    def type_mask(self) -> int:
+        """Card flag bits of which at least one must be set (0 for any type)"""
+        mask = 0
+        for name in self.types or []:
+            mask |= TYPE_NAMES[name]
+        return mask
+
+    def matches_text(self, card: Dict[str, Any]) -> bool:
+        """Whether the text condition (if any) matches a card"""
+        if not self.text:
+            return True
+        return (self.text in card["name"].lower() or self.text in card.get("type_line", "").lower()
+                or self.text in (card.get("oracle_text") or "").lower())
+
+    def deck_names(self, deck_cards: List[Dict[str, Any]]) -> set:
+        """Names to exclude because they are already in the deck"""
+        return {card["name"] for card in deck_cards} if self.exclude_deck else set()
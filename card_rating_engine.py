@@ -1,26 +1,124 @@
 """
 Card rating and analysis engine for MTG draft
 """
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Optional, Union
 import re
-from collections import Counter
+import hashlib
+from collections import Counter, OrderedDict
+
+import config
+
+from archetypes import ArchetypeTable
+from card_table import CardTable, TableRows, TYPE_FLAGS, color_mask
+from card_filter import CardFilter
+from card_store import MappedCards
+from deck_context import DeckContext
+from deck_state import DeckState
+from name_index import CardNameIndex
+from ranking import Ranking
+from scoring_weights import ScoringWeights, reload_config_if_changed
+from synergy_matrix import SynergyMatrix, matrix_fingerprint
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional - the per-card path is used without it
+    np = None
+
+# Oracle text fragments used by the limited power rating
+REMOVAL_WORDS = ("destroy", "exile", "damage", "discard", "counter")
+PROTECTION_PHRASES = ("can't", "prevent")
+
+# Deck analysis fields read by each columnar score component. After a pick,
+# a component is only rescored when one of its inputs changed.
+COMPONENT_INPUTS = {
+    "mana_curve": ("cmc_distribution",),
+    "color": ("color_identity",),
+    "balance": ("creatures", "spells"),
+    "synergy": ("keywords", "creature_type_index"),
+}
+
 
 class CardRatingEngine:
     """Analyzes and rates cards based on deck composition"""
     
-    def __init__(self, set_cards: List[Dict[str, Any]]):
-        """Initialize the rating engine with all cards from the set"""
+    def __init__(self, set_cards: List[Dict[str, Any]], columnar: bool = True):
+        """
+        Initialize the rating engine with all cards from the set.
+        Cards (dicts or Card records) are stored as a compact CardTable.
+        A set opened from a CardStore is indexed from its precomputed
+        columns, so no card record is built until a card is accessed.
+        When columnar is True and numpy is available, card attributes are
+        packed into arrays and the whole set is scored in a few array operations.
+        """
+        if not isinstance(set_cards, CardTable):
+            set_cards = CardTable.from_dicts(set_cards)
         self.all_cards = set_cards
-        self.card_lookup = {card["name"].lower(): card for card in set_cards}
+        # Lowercase name -> row of its last print; the fuzzy name index is built on first use
+        self._lookup_rows = {}
+        self._name_index = None
+        self._name_rows = {}
+        self._row_names = []
+        self._card_digest = None
         
         # Pre-process creature types and keywords for faster lookup
         self._creature_type_cache = {}
         self._keyword_cache = {}
         self._power_toughness_cache = {}
-        for card in set_cards:
+        self._bucket_cache = {}
+        # Per-card DeckState counter updates, filled as cards are added
+        self._contribution_cache = {}
+        # Deck-independent features, computed once
+        self._feature_cache = {}
+        self._index_cards(0)
+        
+        self.columnar = columnar and np is not None
+        if self.columnar:
+            self._build_columns()
+        
+        # Memoized ratings keyed by deck signature and scoring configuration
+        self._rating_cache = OrderedDict()
+        self.rating_cache_size = config.RATING_CACHE_SIZE if config.CACHE_ANALYSIS_RESULTS else 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_derived = 0
+        # Files the archetype table and synergy matrix are persisted to
+        # (see load_archetypes and load_synergy_matrix)
+        self.archetype_path = None
+        self.synergy_path = None
+        self._synergy_matrix = None
+        self._compile_scoring()
+    
+    def _index_cards(self, start: int):
+        """Fill the name lookups and per-card caches for the set cards from index start on"""
+        if isinstance(self.all_cards, MappedCards):
+            names = self.all_cards.names
+        else:
+            cards = self.all_cards[start:]
+            names = [card["name"] for card in cards]
+        for i, name in enumerate(names, start):
+            self._lookup_rows[name.lower()] = i
+            self._name_rows.setdefault(name, []).append(i)
+        self._row_names.extend(names)
+        if self._name_index is not None:
+            self._name_index.add(name.lower() for name in names)
+        
+        if isinstance(self.all_cards, MappedCards):
+            for name, keywords, types, bucket, power_toughness, features in self.all_cards.engine_caches():
+                self._keyword_cache[name] = keywords
+                self._creature_type_cache[name] = types
+                self._bucket_cache[name] = bucket
+                if power_toughness is not None:
+                    self._power_toughness_cache[name] = power_toughness
+                self._feature_cache[name] = features
+            return
+        
+        for card in cards:
             card_name = card["name"]
             self._creature_type_cache[card_name] = self._extract_creature_types(card["type_line"])
             self._keyword_cache[card_name] = set(card.get("keywords", []))
+            # (cmc bin, color mask, creature flag) used to index DeckContext tables
+            self._bucket_cache[card_name] = (min(int(card.get("cmc", 0)), 6), color_mask(card["colors"]),
+                                             bool(card["is_creature"]))
             if card.get("is_creature"):
                 try:
                     self._power_toughness_cache[card_name] = (
@@ -29,66 +127,795 @@ class CardRatingEngine:
                     )
                 except (ValueError, TypeError):
                     self._power_toughness_cache[card_name] = (0, 0)
+        
+        for card in cards:
+            self._feature_cache[card["name"]] = self._card_features(card)
+    
+    @property
+    def card_names(self) -> List[str]:
+        """Name of each card in table order (prints of a card repeat it), without building card records"""
+        return list(self._row_names)
+    
+    def first_rows(self) -> Dict[str, int]:
+        """Table row of each card name's first print, in table order"""
+        return {name: rows[0] for name, rows in self._name_rows.items()}
+    
+    def color_mask_of(self, card_name: str) -> int:
+        """Color mask a card name is scored with (see card_table.color_mask)"""
+        return self._bucket_cache[card_name][1]
+    
+    @property
+    def name_index(self) -> CardNameIndex:
+        """Trigram index over the lowercase card names, for fuzzy lookups"""
+        if self._name_index is None:
+            self._name_index = CardNameIndex(self._lookup_rows)
+        return self._name_index
+    
+    def add_cards(self, cards: List[Dict[str, Any]]):
+        """
+        Append cards to the set, e.g. page by page while a set downloads.
+        Lookups, columns and power scores are extended by the new rows only;
+        everything derived from the whole set (pick order, synergy matrix,
+        archetype table, memoized ratings) is rebuilt on next use.
+        """
+        start = self.all_cards.extend(cards)
+        self._index_cards(start)
+        # A reprint replaces the per-name caches DeckState contributions are built from
+        for name in set(self._row_names[start:]):
+            self._contribution_cache.pop(name, None)
+        self._card_digest = None
+        self._synergy_matrix = None
+        if self.columnar:
+            self._build_columns(start)
+        # A config changed since the last compile still recompiles every card
+        self._compile_scoring(start if self._config_hash() == self._scoring_hash else 0)
+    
+    def _changed_rows(self, start: int) -> List[int]:
+        """
+        Rows from start on, plus earlier rows sharing a name with them (the
+        per-name caches those rows were built from have just been replaced)
+        """
+        names = set(self._row_names[start:])
+        earlier = [row for name in names for row in self._name_rows[name] if row < start]
+        return sorted(earlier) + list(range(start, len(self._row_names)))
+    
+    def _config_hash(self) -> int:
+        """Hash of the configuration settings that affect scoring"""
+        return hash(repr(ScoringWeights.settings())) ^ hash(self.columnar)
+    
+    def _compile_scoring(self, start: int = 0):
+        """
+        Compile the config's scoring settings into flat weights and the
+        per-card static power scores. Called on construction and whenever
+        the config changes; with start > 0 (cards appended under the same
+        config) only the power scores of the new rows are computed.
+        """
+        if start:
+            changed = self._changed_rows(start)
+            self._power_cache.update((name, self._static_power(self._feature_cache[name]))
+                                     for name in set(self._row_names[start:]))
+        else:
+            self.weights = ScoringWeights()
+            self._scoring_hash = self._config_hash()
+            self._power_cache = {name: self._static_power(features)
+                                 for name, features in self._feature_cache.items()}
+        self._pick_order_ratings = None
+        self._archetype_table = None
+        matrix = self._synergy_matrix
+        if matrix is not None and matrix.fingerprint != matrix_fingerprint(self.weights.synergy_pairings,
+                                                                           self.card_digest()):
+            self._synergy_matrix = None
+        self._rating_cache.clear()
+        
+        if self.columnar:
+            if start:
+                power = np.zeros(len(self._row_names))
+                power[:start] = self._col_power_score
+                power[changed] = [self._power_cache[self._row_names[row]] for row in changed]
+                self._col_power_score = power
+            else:
+                self._col_power_score = np.array([self._power_cache[name] for name in self._row_names])
+            self._synergy_bonus_columns = tuple((keyword, weight, self._has_keyword(keyword))
+                                                for keyword, weight in self.weights.synergy_keywords)
+    
+    def refresh_config(self) -> bool:
+        """
+        Recompile scoring if config.py changed on disk (it is re-imported)
+        or its settings were changed in-process. Returns True if recompiled.
+        """
+        reload_config_if_changed()
+        if self._config_hash() == self._scoring_hash:
+            return False
+        self._compile_scoring()
+        return True
     
-    def rate_cards(self, selected_cards: List[str], format_legality: str = "draft") -> List[tuple]:
+    def _build_columns(self, start: int = 0):
+        """
+        Pack per-card attributes into numpy arrays for columnar scoring.
+        With start > 0 the arrays are extended by the rows from start on,
+        e.g. a page of a streaming set, instead of being rebuilt.
+        """
+        n = len(self._row_names)
+        if not start:
+            self._keyword_index, self._type_index = {}, {}
+            self._col_cmc = np.zeros(0)
+            self._col_flags = np.zeros(0, dtype=np.intp)
+            self._col_colors = np.zeros(0, dtype=np.intp)
+            self._col_rarity = np.zeros(0, dtype=object)
+            self._col_keywords = self._col_types = np.zeros((0, 0))
+        changed = self._changed_rows(start)
+        
+        # Keywords and creature types new to the set get a column each
+        keyword_index, type_index = self._keyword_index, self._type_index
+        for card_name in set(self._row_names[start:]):
+            for keyword in self._keyword_cache[card_name]:
+                keyword_index.setdefault(keyword, len(keyword_index))
+            for ctype in self._creature_type_cache[card_name]:
+                type_index.setdefault(ctype, len(type_index))
+        keywords = np.zeros((n, len(keyword_index)))
+        keywords[:start, :self._col_keywords.shape[1]] = self._col_keywords
+        types = np.zeros((n, len(type_index)))
+        types[:start, :self._col_types.shape[1]] = self._col_types
+        keywords[changed] = 0.0
+        types[changed] = 0.0
+        for i in changed:
+            card_name = self._row_names[i]
+            for keyword in self._keyword_cache[card_name]:
+                keywords[i, keyword_index[keyword]] = 1.0
+            for ctype in self._creature_type_cache[card_name]:
+                types[i, type_index[ctype]] = 1.0
+        
+        cmc, flags, colors, _, rarity = self._card_attributes(start)
+        cmc = np.concatenate((self._col_cmc, np.array(cmc, dtype=float)))
+        flags = np.concatenate((self._col_flags, np.array(flags, dtype=np.intp)))
+        colors = np.concatenate((self._col_colors, np.array(colors, dtype=np.intp)))
+        cmc_bin = np.minimum(cmc.astype(np.intp), 6)
+        is_creature = (flags & TYPE_FLAGS["is_creature"]) != 0
+        
+        self._col_cmc_bin = cmc_bin
+        self._col_cmc = cmc
+        self._col_flags = flags
+        self._col_rarity = np.concatenate((self._col_rarity, np.array(rarity, dtype=object)))
+        self._col_colors = colors
+        self._col_is_creature = is_creature
+        self._col_keywords = keywords
+        self._col_types = types
+        self._col_has_evasion = self._has_keyword("flying", "menace", "evasion")
+        
+        # Cards grouped by the bucket each deck-dependent component looks up
+        self._bin_members = {value: np.flatnonzero(cmc_bin == value) for value in range(7)}
+        self._color_members = {mask: np.flatnonzero(colors == mask) for mask in range(32)}
+        self._creature_members = {flag: np.flatnonzero(is_creature == flag) for flag in (False, True)}
+    
+    def _card_attributes(self, start: int = 0) -> tuple:
+        """
+        cmc, type flags, color mask, color identity mask and rarity of the
+        cards from row start on; a mapped set's are read from its columns
+        without building card records
+        """
+        cards = self.all_cards
+        if isinstance(cards, MappedCards):
+            return (cards.column("cmc")[start:], cards.column("flags")[start:], cards.column("color_bits")[start:],
+                    cards.column("identity_bits")[start:], cards.strings("rarity")[start:])
+        rows = cards[start:]
+        return ([card.cmc for card in rows], [card.flags for card in rows], [card.color_bits for card in rows],
+                [card.identity_bits for card in rows], [card.rarity for card in rows])
+    
+    def card_digest(self) -> str:
+        """
+        SHA-1 of what scoring reads from each card, row by row. Tables
+        derived from the set and cached on disk (archetype table, synergy
+        matrix) are only reused while it matches, so they are rebuilt when
+        card content or the parser's keywords change under the same names.
+        """
+        if self._card_digest is None:
+            rows = []
+            for name, cmc, *attributes in zip(self._row_names, *self._card_attributes()):
+                power_toughness = self._power_toughness_cache.get(name)
+                features = self._feature_cache[name]
+                # stat_value follows from power/toughness and cmc, so only the flags are added
+                rows.append((name, float(cmc), *attributes,
+                             sorted(self._keyword_cache[name]), self._creature_type_cache[name],
+                             power_toughness and tuple(map(float, power_toughness)),
+                             [features[key] for key in ("evasive", "removal", "draw", "protection", "rare")]))
+            self._card_digest = hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+        return self._card_digest
+    
+    def _has_keyword(self, *keywords: str):
+        """Boolean column: cards having any of the keywords"""
+        cols = [self._keyword_index[kw] for kw in keywords if kw in self._keyword_index]
+        if not cols:
+            return np.zeros(len(self.all_cards), dtype=bool)
+        return self._col_keywords[:, cols].any(axis=1)
+    
+    def new_deck(self, card_names: Optional[List[str]] = None) -> DeckState:
+        """Create an incrementally analyzed deck, optionally seeded with card names"""
+        deck = DeckState(self)
+        for name in card_names or []:
+            deck.add(name)
+        return deck
+    
+    def deck_quality(self, selected_cards: Union[List[str], DeckState]) -> float:
+        """
+        Whole-deck quality score of card names or a DeckState (see
+        DeckState.quality). Callers scoring many decks should keep a
+        DeckState and call its quality() after each add()/remove().
+        """
+        self.refresh_config()
+        if not isinstance(selected_cards, DeckState):
+            selected_cards = self.new_deck(selected_cards)
+        return selected_cards.quality()
+    
+    def rate_cards(self, selected_cards: Union[List[str], DeckState, DeckContext],
+                   format_legality: str = "draft", card_filter: Optional[CardFilter] = None) -> List[tuple]:
         """
         Rate all cards in the set based on existing deck composition.
-        Returns list of tuples: (card_name, rating, explanation)
-        Includes cards already in the deck.
+        selected_cards is a list of card names, a DeckState or a DeckContext.
+        Returns list of tuples: (card_name, rating, explanation, card)
+        Includes cards already in the deck unless card_filter excludes them.
+        """
+        ranking = self.rank_cards(selected_cards, format_legality, card_filter=card_filter)
+        return ranking.top(len(ranking))
+    
+    def compile_deck(self, selected_cards: Union[List[str], DeckState, DeckContext]) -> DeckContext:
+        """
+        Compile a deck (card names, DeckState or an existing context) into a
+        DeckContext holding its analysis and score lookup tables.
+        Contexts compiled under older scoring settings are recompiled.
         """
-        # Parse selected cards
+        self.refresh_config()
+        if isinstance(selected_cards, DeckContext):
+            if selected_cards.scoring_hash == self._scoring_hash:
+                return selected_cards
+            return DeckContext(self, selected_cards.deck_cards, selected_cards.analysis)
+        if isinstance(selected_cards, DeckState):
+            return selected_cards.context
+        
         deck_cards = self._parse_selected_cards(selected_cards)
-        if not deck_cards:
-            return []
+        return DeckContext(self, deck_cards, self._analyze_deck(deck_cards))
+    
+    def rank_cards(self, selected_cards: Union[List[str], DeckState, DeckContext],
+                   format_legality: str = "draft", page_size: int = 20,
+                   card_filter: Optional[CardFilter] = None) -> Ranking:
+        """
+        Score all cards in the set and return a lazily paged Ranking.
+        Rows (and their explanations) are only built for the pages requested.
+        With a card_filter only the cards passing it are scored and ranked.
+        """
+        context = self.compile_deck(selected_cards)
+        if not context.deck_cards:
+            return Ranking([], [], None, page_size)
+        if card_filter:
+            return self._rank_candidates(context, self._filter_candidates(card_filter, context), page_size)
         
-        # Analyze current deck state
-        deck_analysis = self._analyze_deck(deck_cards)
+        scored = self._scores_for_deck(context)
+        return Ranking(self.all_cards, scored["ratings"], lambda i: self._explain_scored(scored, i), page_size,
+                       names=self._row_names)
+    
+    def score_rows(self, selected_cards: Union[List[str], DeckState, DeckContext]) -> Dict[str, Any]:
+        """
+        Scores of every set card (by table row) against a deck, from the
+        same memoized delta path as rank_cards: "ratings" (clamped and
+        rounded), "totals" (the component sum before the 1-10 clamp, a
+        numpy array on the columnar path) and "explain", which builds the
+        explanation for a row.
+        """
+        context = self.compile_deck(selected_cards)
+        scored = self._scores_for_deck(context)
+        return {
+            "ratings": scored["ratings"],
+            "totals": self._unclamped_scores(scored, context),
+            "explain": lambda i: self._explain_scored(scored, i),
+        }
+    
+    def _explain_scored(self, scored: Dict[str, Any], i: int) -> str:
+        """Explanation for set card i from whole-set scores (_scores_for_deck)"""
+        if self.columnar:
+            return self._explain_rating(
+                self.all_cards[i], float(scored["mana_curve"][i]), float(scored["color"][i]),
+                float(scored["balance"][i]), float(scored["synergy"][i]), float(scored["power"][i]))
+        return self._explain_rating(self.all_cards[i], *scored["components"][i][:-1])
+    
+    def _unclamped_scores(self, scored: Dict[str, Any], context: DeckContext):
+        """
+        Component sum of every set card from _scores_for_deck, before the
+        1-10 clamp, so cards above 10 can still be told apart.
+        """
+        if self.columnar:
+            total = 5.0 + scored["mana_curve"]
+            total += scored["color"]
+            total += scored["balance"]
+            total += scored["synergy"]
+            total += scored["power"]
+            total += context.completion
+            return total
+        return [5.0 + curve + color + balance + synergy + power + context.completion
+                for curve, color, balance, synergy, power, _ in scored["components"]]
+    
+    def _filter_candidates(self, card_filter: CardFilter, context: DeckContext) -> List[int]:
+        """Indices of the set cards passing a filter, from the precomputed card bitmasks"""
+        allowed = card_filter.allowed_colors(context.analysis)
+        type_mask = card_filter.type_mask()
+        min_cmc, max_cmc = card_filter.min_cmc, card_filter.max_cmc
         
-        # Rate each card in the set (including those already in deck)
-        ratings = []
-        for card in self.all_cards:
-            rating, explanation = self._rate_card(card, deck_cards, deck_analysis)
-            ratings.append((card["name"], rating, explanation, card))
+        if self.columnar:
+            keep = np.ones(len(self.all_cards), dtype=bool)
+            if allowed is not None:
+                keep &= (self._col_colors & ~allowed) == 0
+            if min_cmc is not None:
+                keep &= self._col_cmc >= min_cmc
+            if max_cmc is not None:
+                keep &= self._col_cmc <= max_cmc
+            if type_mask:
+                keep &= (self._col_flags & type_mask) != 0
+            if card_filter.rarities:
+                keep &= np.isin(self._col_rarity, card_filter.rarities)
+            for name in card_filter.deck_names(context.deck_cards):
+                keep[self._name_rows.get(name, [])] = False
+            candidates = np.flatnonzero(keep).tolist()
+        else:
+            excluded = card_filter.deck_names(context.deck_cards)
+            cmc, flags, colors, _, rarity = self._card_attributes()
+            candidates = [
+                i for i, (name, card_cmc, card_flags, card_colors, card_rarity)
+                in enumerate(zip(self._row_names, cmc, flags, colors, rarity))
+                if (allowed is None or not card_colors & ~allowed)
+                and (min_cmc is None or card_cmc >= min_cmc)
+                and (max_cmc is None or card_cmc <= max_cmc)
+                and (not type_mask or card_flags & type_mask)
+                and (not card_filter.rarities or card_rarity in card_filter.rarities)
+                and name not in excluded
+            ]
         
-        # Sort by rating (descending)
-        ratings.sort(key=lambda x: x[1], reverse=True)
+        if card_filter.text:
+            candidates = [i for i in candidates if card_filter.matches_text(self.all_cards[i])]
+        return candidates
+    
+    def _rank_candidates(self, context: DeckContext, candidates: List[int], page_size: int) -> Ranking:
+        """Score only the candidate cards (set indices) and rank them"""
+        cards = TableRows(self.all_cards, candidates)
+        names = [self._row_names[i] for i in candidates]
         
-        return ratings
+        if self.columnar and candidates:
+            rows = np.array(candidates, dtype=np.intp)
+            analysis = context.analysis
+            mana_curve = np.array(context.curve_table)[self._col_cmc_bin[rows]]
+            color = np.array(context.color_table)[self._col_colors[rows]]
+            balance = np.array(context.balance_table)[self._col_is_creature[rows].astype(np.intp)]
+            synergy = self._weigh_synergy(self._keyword_hits(analysis["keywords"], rows),
+                                          self._type_hits(analysis["creature_type_index"], rows),
+                                          analysis["keywords"], rows)
+            if self.weights.pair_synergy and len(context):
+                hits = np.zeros(len(self.synergy_matrix()))
+                self._add_pair_rows(hits, self._deck_positions(context), 1)
+                synergy = synergy + self.weights.pair_synergy * hits[self._col_name_pos[rows]] / len(context)
+            power = self._col_power_score[rows]
+            
+            total = 5.0 + mana_curve
+            total += color
+            total += balance
+            total += synergy
+            total += power
+            total += context.completion
+            np.clip(total, 1.0, 10.0, out=total)
+            ratings = [round(rating, 1) for rating in total.tolist()]
+            
+            def explain(i):
+                return self._explain_rating(cards[i], float(mana_curve[i]), float(color[i]),
+                                            float(balance[i]), float(synergy[i]), float(power[i]))
+        else:
+            components = [self._score_card(card, context) for card in cards]
+            ratings = [round(scores[-1], 1) for scores in components]
+            
+            def explain(i):
+                return self._explain_rating(cards[i], *components[i][:-1])
+        
+        return Ranking(cards, ratings, explain, page_size, names=names)
     
-    def _parse_selected_cards(self, card_names: List[str]) -> List[Dict[str, Any]]:
-        """Convert card names to full card objects"""
-        deck_cards = []
-        for name in card_names:
-            name_lower = name.lower().strip()
-            if name_lower in self.card_lookup:
-                deck_cards.append(self.card_lookup[name_lower])
+    def rate_pack(self, selected_cards: Union[List[str], DeckState, DeckContext],
+                  pack_card_names: List[str], format_legality: str = "draft") -> List[tuple]:
+        """
+        Rate only the cards of the current pack, best first.
+        Pack names are resolved through the name index (unmatched names are
+        skipped). Pass a DeckState or DeckContext to reuse the compiled deck
+        across the picks of a pack; with an empty deck the pick order rating
+        is used. Returns list of tuples: (card_name, rating, explanation, card)
+        """
+        context = self.compile_deck(selected_cards)
+        rows = []
+        for card in self.resolve_cards(pack_card_names):
+            if card is None:
+                continue
+            if context.deck_cards:
+                scores = self._score_card(card, context)
+                rating = round(scores[-1], 1)
+                explanation = self._explain_rating(card, *scores[:-1])
             else:
-                # Try fuzzy matching
-                match = self._fuzzy_match_card(name_lower)
-                if match:
-                    deck_cards.append(match)
+                rating = self._static_rating(card)
+                explanation = self._explain_rating(card, 0.0, 0.0, 0.0, 0.0, self._rate_limited_power(card))
+            rows.append((card["name"], rating, explanation, card))
         
-        return deck_cards
+        rows.sort(key=lambda row: -row[1])
+        return rows
     
-    def _fuzzy_match_card(self, card_name: str) -> Dict[str, Any] or None:
-        """Attempt fuzzy matching for card names"""
-        card_name = card_name.strip().lower()
+    def pick_order(self, page_size: int = 20, card_filter: Optional[CardFilter] = None) -> Ranking:
+        """
+        Rank the set by deck-independent scores only: base rating plus
+        limited power and the configured rarity weight. Available before
+        any card is picked, and computed once per scoring configuration.
+        With a card_filter only the cards passing it are ranked.
+        """
+        self.refresh_config()
+        if self._pick_order_ratings is None:
+            # From the per-name power scores and the rarity column, so a
+            # mapped set builds records only for the rows a page shows
+            rarity_weights = self.weights.rarity
+            self._pick_order_ratings = [
+                self._clamp_static(self._power_cache[name], rarity_weights.get(rarity, 0.0))
+                for name, rarity in zip(self._row_names, self._card_attributes()[4])
+            ]
+            blend = self.weights.archetype_pick_blend
+            if blend:
+                # Cards that are strong in some archetype move up the early picks
+                table = self.archetype_table()
+                self._pick_order_ratings = [
+                    round((1.0 - blend) * rating + blend * table.best_rating(name), 1)
+                    for rating, name in zip(self._pick_order_ratings, self._row_names)
+                ]
+        
+        if card_filter:
+            rows = self._filter_candidates(card_filter, self.compile_deck([]))
+            cards = TableRows(self.all_cards, rows)
+            names = [self._row_names[i] for i in rows]
+            ratings = [self._pick_order_ratings[i] for i in rows]
+        else:
+            cards, names, ratings = self.all_cards, self._row_names, self._pick_order_ratings
+        
+        def explain(i):
+            return self._explain_rating(cards[i], 0.0, 0.0, 0.0, 0.0, self._power_cache[names[i]])
+        
+        return Ranking(cards, ratings, explain, page_size, names=names)
+    
+    def archetype_table(self) -> ArchetypeTable:
+        """
+        Ratings of every card in each color archetype (see archetypes.py),
+        computed once per scoring configuration. Read from and written to
+        archetype_path when one is set.
+        """
+        self.refresh_config()
+        if self._archetype_table is None:
+            table = None
+            if self.archetype_path:
+                table = ArchetypeTable.load(self.archetype_path, self)
+            if table is None:
+                table = ArchetypeTable.compute(self)
+                if self.archetype_path:
+                    try:
+                        table.save(self.archetype_path)
+                    except OSError as e:
+                        print(f"Warning: could not save archetype table: {e}")
+            self._archetype_table = table
+        return self._archetype_table
+    
+    def load_archetypes(self, path: str) -> ArchetypeTable:
+        """Persist the archetype table at path, loading it if it is still current"""
+        self.archetype_path = path
+        self._archetype_table = None
+        return self.archetype_table()
+    
+    def synergy_matrix(self) -> SynergyMatrix:
+        """
+        Pairwise synergy matrix of the set (see synergy_matrix.py), built
+        once and again only when config.SYNERGY_PAIRINGS changes. Read from
+        and written to synergy_path when one is set.
+        """
+        if self._synergy_matrix is None:
+            pairings = self.weights.synergy_pairings
+            matrix = None
+            if self.synergy_path:
+                matrix = SynergyMatrix.load(self.synergy_path, self, pairings)
+            if matrix is None:
+                matrix = SynergyMatrix.compute(self, pairings)
+                if self.synergy_path:
+                    try:
+                        matrix.save(self.synergy_path)
+                    except OSError as e:
+                        print(f"Warning: could not save synergy matrix: {e}")
+            self._synergy_matrix = matrix
+            if self.columnar:
+                self._col_pair_csr = (np.array(matrix.indptr, dtype=np.intp),
+                                      np.array(matrix.indices, dtype=np.intp),
+                                      np.array(matrix.data, dtype=float))
+                self._col_name_pos = np.array([matrix.positions[name] for name in self._row_names],
+                                              dtype=np.intp)
+        return self._synergy_matrix
+    
+    def load_synergy_matrix(self, path: str) -> SynergyMatrix:
+        """Persist the synergy matrix at path, loading it if it is still current"""
+        self.synergy_path = path
+        self._synergy_matrix = None
+        return self.synergy_matrix()
+    
+    def _static_rating(self, card: Dict[str, Any]) -> float:
+        """Pick order rating: base plus limited power and rarity weight, clamped and rounded"""
+        return self._clamp_static(self._rate_limited_power(card), self.weights.rarity.get(card["rarity"], 0.0))
+    
+    @staticmethod
+    def _clamp_static(power: float, rarity_weight: float) -> float:
+        """Static rating from a card's power score and rarity weight"""
+        return round(max(1.0, min(10.0, 5.0 + power + rarity_weight)), 1)
+    
+    def deck_signature(self, deck_cards: List[Dict[str, Any]]) -> tuple:
+        """Canonical deck key: the sorted multiset of resolved card names"""
+        return tuple(sorted(card["name"] for card in deck_cards))
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters of the rating cache"""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "derived": self.cache_derived,
+            "size": len(self._rating_cache),
+            "max_size": self.rating_cache_size,
+        }
+    
+    def clear_cache(self):
+        """Drop all memoized ratings"""
+        self._rating_cache.clear()
+    
+    def _scores_for_deck(self, context: DeckContext) -> Dict[str, Any]:
+        """
+        Score every card for a compiled deck, memoized by deck signature.
+        On a miss, unchanged components are taken from the cached deck that
+        is one card smaller (or the most recent entry) instead of rescored.
+        """
+        signature = context.signature
+        key = (signature, self._scoring_hash)
+        cache = self._rating_cache
+        
+        if key in cache:
+            self.cache_hits += 1
+            cache.move_to_end(key)
+            return cache[key]
+        self.cache_misses += 1
+        
+        if self.columnar:
+            previous = self._neighbour_scores(signature)
+            if previous is not None:
+                self.cache_derived += 1
+            scored = self._score_columns(context, previous)
+            scored["ratings"] = [round(rating, 1) for rating in scored["total"].tolist()]
+        else:
+            # Rate each card in the set (including those already in deck)
+            components = [self._score_card(card, context) for card in self.all_cards]
+            scored = {
+                "components": components,
+                "ratings": [round(scores[-1], 1) for scores in components],
+            }
         
-        # Direct substring match
-        for name, card in self.card_lookup.items():
-            if card_name in name or name in card_name:
-                return card
+        if self.rating_cache_size > 0:
+            cache[key] = scored
+            while len(cache) > self.rating_cache_size:
+                cache.popitem(last=False)
+        return scored
+    
+    def _neighbour_scores(self, signature: tuple) -> Optional[Dict[str, Any]]:
+        """Cached scores of the same deck minus one card, else the most recent entry"""
+        cache = self._rating_cache
+        if not cache:
+            return None
+        
+        for i, name in enumerate(signature):
+            if i and signature[i - 1] == name:
+                continue
+            key = (signature[:i] + signature[i + 1:], self._scoring_hash)
+            if key in cache:
+                return cache[key]
+        return next(reversed(cache.values()))
+    
+    def _deck_inputs(self, analysis: Dict) -> Dict[str, tuple]:
+        """Snapshot of the deck analysis fields each score component reads"""
+        inputs = {}
+        for component, fields in COMPONENT_INPUTS.items():
+            snapshot = []
+            for field in fields:
+                value = analysis[field]
+                if isinstance(value, dict):
+                    value = frozenset(value.items())
+                elif isinstance(value, (set, frozenset)):
+                    value = frozenset(value)
+                snapshot.append(value)
+            inputs[component] = tuple(snapshot)
+        return inputs
+    
+    def _score_columns(self, context: DeckContext,
+                       previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Compute every score component for the whole set as arrays.
+        Deck-dependent terms come from the context's lookup tables and are
+        gathered per card. If previous scores are given, only components
+        whose inputs changed are rescored, and only for the cards those
+        changes can affect.
+        """
+        analysis = context.analysis
+        inputs = self._deck_inputs(analysis)
+        
+        def changed(component):
+            return previous is None or previous["inputs"][component] != inputs[component]
         
-        # Levenshtein distance (simple version)
-        min_distance = float('inf')
-        best_match = None
-        for name, card in self.card_lookup.items():
-            distance = levenshtein_distance(card_name, name)
-            if distance < min_distance and distance < 3:
-                min_distance = distance
-                best_match = card
+        scored = dict(previous) if previous is not None else {}
+        scored["inputs"] = inputs
+        if changed("mana_curve"):
+            self._patch_mana_curve(scored, context, previous)
+        if changed("color"):
+            self._patch_table(scored, "color", self._color_members, context.color_table)
+        if changed("balance"):
+            self._patch_table(scored, "balance", self._creature_members, context.balance_table)
+        if changed("synergy"):
+            self._patch_synergy(scored, analysis, previous)
+        self._patch_pair_synergy(scored, context, previous)
+        scored["power"] = self._col_power_score
+        completion = context.completion
         
-        return best_match
+        total = 5.0 + scored["mana_curve"]
+        total += scored["color"]
+        total += scored["balance"]
+        total += scored["synergy"]
+        total += scored["power"]
+        total += completion
+        np.clip(total, 1.0, 10.0, out=total)
+        scored["total"] = total
+        return scored
+    
+    def _patch_mana_curve(self, scored: Dict[str, Any], context: DeckContext, previous: Optional[Dict]):
+        """Rescore the cards in the cmc bins whose deck counts changed"""
+        if previous is None:
+            bins = range(7)
+            values = np.zeros(len(self.all_cards))
+        else:
+            # Counts above 6 share bin 6
+            old, new = previous["inputs"]["mana_curve"][0], scored["inputs"]["mana_curve"][0]
+            bins = sorted({min(cmc, 6) for cmc, _ in old ^ new})
+            values = previous["mana_curve"].copy()
+        for cmc_bin in bins:
+            values[self._bin_members[cmc_bin]] = context.curve_table[cmc_bin]
+        scored["mana_curve"] = values
+    
+    def _patch_table(self, scored: Dict[str, Any], component: str, members: Dict[Any, Any],
+                     table: tuple):
+        """
+        Rescore a component that depends on one bucket per card (color mask,
+        creature flag): only buckets whose table value changed are written.
+        """
+        old_table = scored.get(component + "_table")
+        if old_table is None:
+            values = np.zeros(len(self.all_cards))
+            buckets = members
+        else:
+            values = scored[component].copy()
+            buckets = [bucket for bucket in members if table[bucket] != old_table[bucket]]
+        for bucket in buckets:
+            values[members[bucket]] = table[bucket]
+        scored[component] = values
+        scored[component + "_table"] = table
+    
+    def _patch_synergy(self, scored: Dict[str, Any], analysis: Dict, previous: Optional[Dict]):
+        """
+        Columnar version of _rate_synergies.
+        Per card counts of keywords and creature types shared with the deck
+        are patched from a previous deck for the keywords and types that
+        were added or removed; the weighted sum is then taken in the same
+        order as the per-card path.
+        """
+        weights = self.weights
+        deck_keywords = analysis["keywords"]
+        type_index = analysis["creature_type_index"]
+        
+        if previous is None:
+            keyword_hits = self._keyword_hits(deck_keywords)
+            type_hits = self._type_hits(type_index)
+        else:
+            old_keywords = dict(previous["inputs"]["synergy"][0])
+            old_types = dict(previous["inputs"]["synergy"][1])
+            keyword_hits = (previous["keyword_hits"]
+                            + self._keyword_hits([kw for kw in deck_keywords if kw not in old_keywords])
+                            - self._keyword_hits([kw for kw in old_keywords if kw not in deck_keywords]))
+            type_hits = (previous["type_hits"]
+                         + self._type_hits([t for t in type_index if t not in old_types])
+                         - self._type_hits([t for t in old_types if t not in type_index]))
+        
+        scored["shared_synergy"] = self._weigh_synergy(keyword_hits, type_hits, deck_keywords)
+        scored["keyword_hits"] = keyword_hits
+        scored["type_hits"] = type_hits
+    
+    def _patch_pair_synergy(self, scored: Dict[str, Any], context: DeckContext, previous: Optional[Dict]):
+        """
+        Columnar version of _rate_pair_synergy: synergy matrix times the
+        deck's card counts. From a previous deck only the rows of the cards
+        added or removed are applied.
+        """
+        weight = self.weights.pair_synergy
+        if not weight or not len(context):
+            scored["synergy"] = scored["shared_synergy"]
+            scored.pop("pair_deck", None)
+            return
+        
+        deck = self._deck_positions(context)
+        if previous is not None and "pair_deck" in previous:
+            old = previous["pair_deck"]
+            hits = previous["pair_hits"].copy()
+            self._add_pair_rows(hits, deck - old, 1)
+            self._add_pair_rows(hits, old - deck, -1)
+        else:
+            hits = np.zeros(len(self._synergy_matrix))
+            self._add_pair_rows(hits, deck, 1)
+        scored["pair_deck"] = deck
+        scored["pair_hits"] = hits
+        scored["synergy"] = scored["shared_synergy"] + weight * hits[self._col_name_pos] / len(context)
+    
+    def _add_pair_rows(self, hits, counts: Counter, sign: int):
+        """Add sign * copies times each counted card's synergy matrix row to hits"""
+        indptr, indices, data = self._col_pair_csr
+        for pos, count in counts.items():
+            start, end = indptr[pos], indptr[pos + 1]
+            hits[indices[start:end]] += (sign * count) * data[start:end]
+    
+    def _deck_positions(self, context: DeckContext) -> Counter:
+        """The deck's card counts by synergy matrix row"""
+        positions = self.synergy_matrix().positions
+        return Counter(positions[name] for name in context.signature)
+    
+    def _weigh_synergy(self, keyword_hits, type_hits, deck_keywords: Counter, rows=slice(None)):
+        """Synergy scores from shared keyword/type counts, for all cards or the given rows"""
+        weights = self.weights
+        synergy = weights.keyword_synergy * keyword_hits
+        synergy += weights.creature_type_synergy * (self._col_is_creature[rows] & (type_hits > 0))
+        for keyword, weight, column in self._synergy_bonus_columns:
+            if deck_keywords.get(keyword, 0) > 0:
+                synergy += weight * column[rows]
+        if _evasion_theme(deck_keywords):
+            synergy += weights.theme_synergy * self._col_has_evasion[rows]
+        return synergy
+    
+    def _keyword_hits(self, keywords: List[str], rows=slice(None)):
+        """Per card, how many of the given keywords it has"""
+        cols = [self._keyword_index[kw] for kw in keywords if kw in self._keyword_index]
+        return self._col_keywords[rows][:, cols].sum(axis=1)
+    
+    def _type_hits(self, creature_types, rows=slice(None)):
+        """Per card, how many of the given creature types it has"""
+        cols = [self._type_index[ctype] for ctype in creature_types if ctype in self._type_index]
+        return self._col_types[rows][:, cols].sum(axis=1)
+    
+    def _parse_selected_cards(self, card_names: List[str]) -> List[Dict[str, Any]]:
+        """Convert card names to full card objects"""
+        return [card for card in self.resolve_cards(card_names) if card]
+    
+    def resolve_card(self, name: str) -> Optional[Dict[str, Any]]:
+        """Look up a card by exact (case-insensitive) name, falling back to fuzzy matching"""
+        name_lower = name.lower().strip()
+        row = self._lookup_rows.get(name_lower)
+        if row is not None:
+            return self.all_cards[row]
+        return self._fuzzy_match_card(name_lower)
+    
+    def resolve_cards(self, names: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Resolve a whole list of card names in one call (None where nothing matches)"""
+        queries = [name.lower().strip() for name in names]
+        # Exact names are looked up directly; only the rest need the fuzzy index
+        misses = [query for query in queries if query not in self._lookup_rows]
+        matches = dict(zip(misses, self.name_index.match_many(misses))) if misses else {}
+        rows = [self._lookup_rows.get(matches.get(query, query)) for query in queries]
+        return [self.all_cards[row] if row is not None else None for row in rows]
+    
+    def _fuzzy_match_card(self, card_name: str) -> Dict[str, Any] or None:
+        """
+        Attempt fuzzy matching for card names.
+        Uses the engine's name index: substring matches first, then the
+        closest name within MAX_MATCH_DISTANCE edits.
+        """
+        match = self.name_index.match(card_name)
+        return self.all_cards[self._lookup_rows[match]] if match is not None else None
     
     def _analyze_deck(self, deck_cards: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze the current deck composition"""
@@ -101,6 +928,8 @@ class CardRatingEngine:
             "colors": Counter(),
             "color_identity": set(),
             "keywords": Counter(),
+            "creature_types": Counter(),
+            "creature_type_index": Counter(),
             "mana_curve": {},
             "avg_cmc": 0,
             "synergies": [],
@@ -138,6 +967,10 @@ class CardRatingEngine:
             card_name = card["name"]
             for keyword in self._keyword_cache.get(card_name, set()):
                 analysis["keywords"][keyword] += 1
+            for ctype in self._creature_type_cache.get(card_name, []):
+                analysis["creature_types"][ctype] += 1
+                if card["is_creature"]:
+                    analysis["creature_type_index"][ctype] += 1
         
         if len(deck_cards) > 0:
             analysis["avg_cmc"] = total_cmc / len(deck_cards)
@@ -177,14 +1010,10 @@ class CardRatingEngine:
             color_pair = "".join(sorted(colors))
             synergies.append(f"{color_pair} colors")
         
-        # Creature type detection - use cached types
-        creature_types = []
-        for card in deck_cards:
-            creature_types.extend(self._creature_type_cache.get(card["name"], []))
-        
-        type_counts = Counter(creature_types)
+        # Creature type detection - counted during deck analysis
+        type_counts = analysis["creature_types"]
         for ctype, count in type_counts.most_common(3):
-            if count >= 2:
+            if count >= self.weights.type_theme_threshold:
                 synergies.append(f"{ctype} synergy")
         
         return synergies
@@ -198,226 +1027,257 @@ class CardRatingEngine:
         types = [t.strip().lower() for t in creature_part.split()]
         return types
     
-    def _rate_card(self, card: Dict[str, Any], deck_cards: List[Dict[str, Any]], 
-                   analysis: Dict[str, Any]) -> tuple:
+    def _rate_card(self, card: Dict[str, Any], context: DeckContext) -> tuple:
         """
-        Rate a single card based on deck composition.
+        Rate a single card based on a compiled deck context.
         Returns (rating, explanation)
         """
+        mana_curve_score, color_score, balance_score, synergy_score, power_score, rating = \
+            self._score_card(card, context)
+        
+        explanation = self._explain_rating(card, mana_curve_score, color_score,
+                                           balance_score, synergy_score, power_score)
+        
+        return round(rating, 1), explanation
+    
+    def _score_card(self, card: Dict[str, Any], context: DeckContext) -> tuple:
+        """
+        Compute the score components of a single card.
+        Returns (mana_curve, color, balance, synergy, power, rating) with the
+        rating clamped to 1-10 but not yet rounded.
+        """
         rating = 5.0  # Base rating
-        reasons = []
         
-        # 1. Mana curve analysis (very important in limited)
-        mana_curve_score = self._rate_mana_curve_fit(card, analysis)
+        # 1-3. Mana curve, color and creature/spell balance - table lookups
+        mana_curve_score, color_score, balance_score = context.lookup(card["name"])
         rating += mana_curve_score
+        rating += color_score
+        rating += balance_score
+        
+        # 4. Synergy with existing cards
+        synergy_score = self._rate_synergies(card, context.deck_cards, context.analysis)
+        synergy_score += self._rate_pair_synergy(card, context)
+        rating += synergy_score
+        
+        # 5. Power level in limited
+        power_score = self._rate_limited_power(card)
+        rating += power_score
+        
+        # 6. Deck completion bonus
+        rating += context.completion
+        
+        # Clamp rating between 1 and 10
+        rating = max(1.0, min(10.0, rating))
+        
+        return mana_curve_score, color_score, balance_score, synergy_score, power_score, rating
+    
+    def _explain_rating(self, card: Dict[str, Any], mana_curve_score: float, color_score: float,
+                        balance_score: float, synergy_score: float, power_score: float) -> str:
+        """Build the human readable explanation for a card's score components"""
+        reasons = []
+        
         if mana_curve_score > 1:
             reasons.append(f"good mana curve fit ({mana_curve_score:+.1f})")
         elif mana_curve_score < -1:
             reasons.append(f"mana curve already crowded ({mana_curve_score:+.1f})")
         
-        # 2. Color synergy
-        color_score = self._rate_color_fit(card, analysis)
-        rating += color_score
         if color_score > 0.5:
             reasons.append(f"color synergy ({color_score:+.1f})")
         elif color_score < -0.5:
             reasons.append(f"color conflict ({color_score:+.1f})")
         
-        # 3. Creature/Spell balance
-        balance_score = self._rate_deck_balance(card, analysis)
-        rating += balance_score
         if balance_score > 0.5:
             reasons.append(f"balances deck ({balance_score:+.1f})")
         elif balance_score < -0.5:
             reasons.append(f"throws off balance ({balance_score:+.1f})")
         
-        # 4. Synergy with existing cards
-        synergy_score = self._rate_synergies(card, deck_cards, analysis)
-        rating += synergy_score
         if synergy_score > 1:
             reasons.append(f"strong synergies ({synergy_score:+.1f})")
         elif synergy_score > 0:
             reasons.append(f"some synergies ({synergy_score:+.1f})")
         
-        # 5. Power level in limited
-        power_score = self._rate_limited_power(card)
-        rating += power_score
         if power_score > 1:
             reasons.append(f"strong limited card ({power_score:+.1f})")
         
-        # 6. Deck completion bonus
-        deck_size_penalty = (40 - analysis["count"]) / 40.0  # Bonus to fill deck
-        completion_score = 0.5 * deck_size_penalty
-        rating += completion_score
-        
-        # 7. Rarity factor (rare/mythic often stronger but less available)
-        if card["rarity"] == "rare" or card["rarity"] == "mythic":
+        # Rarity factor (rare/mythic often stronger but less available)
+        features = self._feature_cache.get(card["name"]) or self._card_features(card)
+        if features["rare"]:
             reasons.append("rare/mythic power level")
         
-        # Clamp rating between 1 and 10
-        rating = max(1.0, min(10.0, rating))
-        
-        explanation = ", ".join(reasons) if reasons else "fills a slot"
-        
-        return round(rating, 1), explanation
+        return ", ".join(reasons) if reasons else "fills a slot"
     
     def _rate_mana_curve_fit(self, card: Dict[str, Any], analysis: Dict) -> float:
         """Rate how well the card fits the current mana curve"""
+        weights = self.weights
         cmc = card.get("cmc", 0)
         curve = analysis["cmc_distribution"]
         
-        # Ideal draft deck has: 2-3 1-drops, 3-4 2-drops, 2-3 3-drops, 2-3 4-drops, etc.
-        ideal_counts = {
-            0: 0,
-            1: 2.5,
-            2: 3.5,
-            3: 3,
-            4: 2.5,
-            5: 2,
-            6: 1.5
-        }
-        
+        # Ideal draft deck (config.IDEAL_MANA_CURVE): 2-3 1-drops, 3-4 2-drops, 2-3 3-drops, etc.
         cmc_bin = int(cmc) if int(cmc) <= 6 else 6
         current_count = curve.get(cmc_bin, 0)
-        ideal_count = ideal_counts.get(cmc_bin, 1.5)
+        ideal_count = weights.ideal_curve[cmc_bin]
         
         # Boost if we need cards at this cmc, penalize if we have too many
-        if current_count < ideal_count - 1:
-            return 2.0
+        if current_count < ideal_count - weights.curve_tolerance:
+            return weights.mana_curve_perfect_fit
         elif current_count < ideal_count:
-            return 1.0
+            return weights.mana_curve_good_fit
         elif current_count == ideal_count:
-            return 0.0
+            return weights.mana_curve_exact_fit
         else:
-            return -1.5
+            return weights.mana_curve_crowded
     
     def _rate_color_fit(self, card: Dict[str, Any], analysis: Dict) -> float:
         """Rate how well the card's color aligns with the deck"""
+        weights = self.weights
         card_colors = set(card["colors"])
         deck_colors = analysis["color_identity"]
         
         # If no colors in deck yet, any color is fine
         if not deck_colors:
-            return 0.5 if not card_colors else 0.3
+            return weights.colorless_bonus if not card_colors else weights.color_open
         
         # Perfect fit if card is in deck colors
         if card_colors and card_colors.issubset(deck_colors):
-            return 1.5
+            return weights.color_perfect_fit
         
         # Mono-colored card outside colors is bad
         if len(card_colors) == 1 and not card_colors.issubset(deck_colors):
-            return -2.0
+            return weights.color_conflict
         
         # Colorless is always okay
         if not card_colors:
-            return 0.5
+            return weights.colorless_bonus
         
         # Some colors overlap - acceptable
         if card_colors & deck_colors:
-            return 0.0
+            return weights.color_good_fit
         
         # No colors overlap - bad
-        return -1.5
+        return weights.color_off_colors
     
     def _rate_deck_balance(self, card: Dict[str, Any], analysis: Dict) -> float:
         """Rate creature/spell balance"""
         # In limited, typically want 13-16 creatures, 6-8 tricks/removal, 5-8 utility
+        weights = self.weights
         total_non_land = analysis["creatures"] + analysis["spells"]
         
         creature_ratio = analysis["creatures"] / max(1, total_non_land) if total_non_land > 0 else 0.5
-        ideal_creature_ratio = 0.65  # ~65% creatures
+        ideal_creature_ratio = weights.creature_ratio  # ~65% creatures
+        tolerance = weights.creature_ratio_tolerance
         
         if card["is_creature"]:
-            if creature_ratio < ideal_creature_ratio - 0.1:
-                return 1.5
-            elif creature_ratio < ideal_creature_ratio + 0.1:
-                return 0.5
+            if creature_ratio < ideal_creature_ratio - tolerance:
+                return weights.creature_needed
+            elif creature_ratio < ideal_creature_ratio + tolerance:
+                return weights.balance_neutral
             else:
-                return -1.0
+                return weights.balance_penalty
         else:
-            if creature_ratio > ideal_creature_ratio + 0.1:
-                return 1.5
-            elif creature_ratio > ideal_creature_ratio - 0.1:
-                return 0.5
+            if creature_ratio > ideal_creature_ratio + tolerance:
+                return weights.spell_needed
+            elif creature_ratio > ideal_creature_ratio - tolerance:
+                return weights.balance_neutral
             else:
-                return -0.5
+                return weights.spell_penalty
     
     def _rate_synergies(self, card: Dict[str, Any], deck_cards: List[Dict[str, Any]], 
                         analysis: Dict) -> float:
         """Rate synergies with existing cards"""
-        synergy_score = 0.0
+        weights = self.weights
         deck_keywords = analysis["keywords"]
         
         # Check keyword overlap - use cached keywords
         card_name = card["name"]
         card_keywords = self._keyword_cache.get(card_name, set())
+        shared = sum(1 for keyword in card_keywords if deck_keywords.get(keyword, 0) > 0)
+        synergy_score = weights.keyword_synergy * shared
         
-        for keyword in card_keywords:
-            if deck_keywords.get(keyword, 0) > 0:
-                synergy_score += 1.0  # Big boost for keyword synergies
-        
-        # Check creature type synergies - use cached types
+        # Check creature type synergies - lookups in the deck's type index
         if card["is_creature"]:
-            card_types = set(self._creature_type_cache.get(card_name, []))
-            
-            # Pre-compute creature count instead of iterating
-            for existing_card in deck_cards:
-                if existing_card["is_creature"]:
-                    existing_types = set(self._creature_type_cache.get(existing_card["name"], []))
-                    if card_types & existing_types:
-                        synergy_score += 0.5
-                        break  # Only count once per creature type match
-        
-        # Quick keyword synergy checks
-        draw_bonus = 0.5 if "draw" in card_keywords and deck_keywords.get("draw", 0) > 0 else 0
-        sacrifice_bonus = 1.0 if "sacrifice" in card_keywords and deck_keywords.get("sacrifice", 0) > 0 else 0
-        synergy_score += draw_bonus + sacrifice_bonus
+            type_index = analysis["creature_type_index"]
+            if any(ctype in type_index for ctype in self._creature_type_cache.get(card_name, [])):
+                synergy_score += weights.creature_type_synergy  # Only count once per creature type match
+        
+        # Configured keyword synergy bonuses (config.SYNERGY_KEYWORDS)
+        for keyword, weight in weights.synergy_keywords:
+            if keyword in card_keywords and deck_keywords.get(keyword, 0) > 0:
+                synergy_score += weight
         
         # Evasion synergy - simplified
         evasion_keywords = {"flying", "menace", "evasion"}
-        if card_keywords & evasion_keywords:
-            if deck_keywords.get("draw", 0) > 0 or deck_keywords.get("flying", 0) > 1:
-                synergy_score += 0.5
+        if card_keywords & evasion_keywords and _evasion_theme(deck_keywords):
+            synergy_score += weights.theme_synergy
         
         return synergy_score
     
+    def _rate_pair_synergy(self, card: Dict[str, Any], context: DeckContext) -> float:
+        """Synergy matrix entries between a card and the deck's cards, averaged over the deck"""
+        weight = self.weights.pair_synergy
+        if not weight or not len(context):
+            return 0.0
+        return weight * context.pair_hits(card["name"]) / len(context)
+    
     def _rate_limited_power(self, card: Dict[str, Any]) -> float:
-        """Rate the power level of a card in limited"""
-        score = 0.0
+        """Rate the power level of a card in limited (precomputed per card)"""
+        score = self._power_cache.get(card["name"])
+        if score is None:
+            score = self._static_power(self._card_features(card))
+        return score
+    
+    def _card_features(self, card: Dict[str, Any]) -> Dict[str, Any]:
+        """Deck-independent features of a card used by the power rating"""
+        card_name = card["name"]
+        features = {
+            "stat_value": None,
+            "evasive": False,
+            "removal": False,
+            "draw": False,
+            "protection": False,
+            "rare": card["rarity"] == "rare" or card["rarity"] == "mythic",
+        }
         
-        # Creatures with good stats - use cached data
-        if card["is_creature"]:
-            card_name = card["name"]
-            if card_name in self._power_toughness_cache:
-                power, toughness = self._power_toughness_cache[card_name]
-                cmc = card.get("cmc", 0)
-                
-                # Power/toughness per mana spent
-                total_stats = power + toughness
-                value = total_stats / max(1, cmc)
-                
-                if value >= 2.0:  # Excellent value
-                    score += 1.5
-                elif value >= 1.5:  # Good value
-                    score += 0.5
-                elif value < 0.8:  # Poor value
-                    score -= 1.0
-                
-                # Evasive creatures are better
-                card_keywords = self._keyword_cache.get(card_name, set())
-                if card_keywords & {"flying", "menace", "trample"}:
-                    score += 0.5
+        # Power/toughness per mana spent - use cached data
+        if card["is_creature"] and card_name in self._power_toughness_cache:
+            power, toughness = self._power_toughness_cache[card_name]
+            features["stat_value"] = (power + toughness) / max(1, card.get("cmc", 0))
+            features["evasive"] = bool(self._keyword_cache.get(card_name, set()) & {"flying", "menace", "trample"})
         
-        # Removal spells are always good
+        # Oracle text scans for spells
         if card["is_instant"] or card["is_sorcery"]:
             oracle = card.get("oracle_text", "").lower()
-            # Use tuple lookup for faster word checking
-            if any(word in oracle for word in ("destroy", "exile", "damage", "discard", "counter")):
-                score += 1.5
-            elif "draw" in oracle:
-                score += 1.0
-            elif any(phrase in oracle for phrase in ("can't", "prevent")):
-                score += 0.5
+            features["removal"] = any(word in oracle for word in REMOVAL_WORDS)
+            features["draw"] = "draw" in oracle
+            features["protection"] = any(phrase in oracle for phrase in PROTECTION_PHRASES)
+        
+        return features
+    
+    def _static_power(self, features: Dict[str, Any]) -> float:
+        """Limited power score from a card's precomputed features"""
+        weights = self.weights
+        score = 0.0
+        
+        # Creatures with good stats
+        value = features["stat_value"]
+        if value is not None:
+            if value >= 2.0:  # Excellent value
+                score += weights.great_value
+            elif value >= 1.5:  # Good value
+                score += weights.good_value
+            elif value < 0.8:  # Poor value
+                score += weights.poor_value
+            
+            # Evasive creatures are better
+            if features["evasive"]:
+                score += weights.evasive_creature
+        
+        # Removal spells are always good
+        if features["removal"]:
+            score += weights.removal_spell
+        elif features["draw"]:
+            score += weights.card_draw
+        elif features["protection"]:
+            score += weights.protection_spell
         
         return score
     
@@ -427,6 +1287,11 @@ class CardRatingEngine:
         return color_map.get(color_code, "colorless")
 
 
+def _evasion_theme(deck_keywords: Counter) -> bool:
+    """Whether the deck rewards evasive cards (card draw or several flyers)"""
+    return deck_keywords.get("draw", 0) > 0 or deck_keywords.get("flying", 0) > 1
+
+
 def levenshtein_distance(s1: str, s2: str) -> int:
     """Calculate Levenshtein distance between two strings"""
     if len(s1) < len(s2):
@@ -0,0 +1,382 @@
+"""
+Read-only memory-mapped columnar store holding every cached set
+"""
+import os
+import sys
+import glob
+import json
+import mmap
+import array
+import struct
+import hashlib
+from math import isnan
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+from card_table import Card, CardTable, TYPE_FLAGS, keyword_id
+from scryfall_api import parser_checksum
+from set_cache import SET_CACHE_SUFFIX, SetCacheError, read_set_cache, read_set_cache_header
+
+STORE_MAGIC = b"MTGSTORE"
+
+# Bump when the file layout or the stored engine features change
+STORE_VERSION = 1
+
+STORE_FILE = "cards.store"
+
+# magic, version, big endian flag, fingerprint (see store_fingerprint), metadata size
+_HEADER = struct.Struct("<8sHB5x20sQ")
+
+# Card slots kept in the string heap as start and length columns (length -1 is None)
+_STRING_SLOTS = ("name", "set_code", "type_line", "oracle_text", "mana_cost",
+                 "power", "toughness", "rarity", "image_url", "scryfall_uri")
+
+# Card slots kept as fixed-width columns of their own
+_NUMERIC_SLOTS = (("cmc", "d"), ("flags", "B"), ("color_bits", "B"), ("identity_bits", "B"))
+
+# Bits of the feature_bits column, one per boolean feature of CardRatingEngine._card_features
+# (engine_caches unpacks them inline)
+_FEATURE_BITS = {"evasive": 1, "removal": 2, "draw": 4, "protection": 8, "rare": 16}
+
+_IS_CREATURE = TYPE_FLAGS["is_creature"]
+
+
+def card_store_path(cache_dir: str) -> str:
+    """Store file of a cache directory (cache/cards.store)"""
+    return os.path.join(cache_dir, STORE_FILE)
+
+
+class MappedCards(CardTable):
+    """
+    One set of a CardStore, as a read-only CardTable over slices of the
+    mapping. Only names are decoded when the set is opened; a Card record
+    is built, and kept, the first time its card is accessed. The rating
+    engine indexes the set from the precomputed columns (engine_caches)
+    without accessing any card.
+    """
+
+    def __init__(self, store: "CardStore", code: str, start: int, count: int):
+        self.store = store
+        self.code = code
+        self._start = start
+        self._count = count
+        self._records = {}
+        self.names = self.strings("name")
+
+    def column(self, name: str) -> memoryview:
+        """Typed view of one of the set's fixed-width columns"""
+        return self.store.column(name)[self._start:self._start + self._count]
+
+    def strings(self, slot: str) -> List[Optional[str]]:
+        """Every card's value of a string slot, decoded from the heap"""
+        heap = self.store.column("heap")
+        return [None if length < 0 else str(heap[start:start + length], "utf-8")
+                for start, length in zip(self.column(slot + "_start"), self.column(slot + "_length"))]
+
+    def _id_lists(self, kind: str) -> Iterator[memoryview]:
+        """Per card, its ids in a variable-length id column ("keyword" or "type")"""
+        starts = self.store.column(kind + "_start")[self._start:self._start + self._count + 1]
+        ids = self.store.column(kind + "_ids")
+        return (ids[start:end] for start, end in zip(starts, starts[1:]))
+
+    def engine_caches(self) -> Iterator[tuple]:
+        """
+        Per card: name, keywords, creature types, (cmc bin, color mask,
+        creature flag), (power, toughness) or None and power features,
+        the values CardRatingEngine would otherwise derive from its record.
+        """
+        keyword_vocab, type_vocab = self.store.keywords, self.store.creature_types
+        columns = zip(self.names, self._id_lists("keyword"), self._id_lists("type"),
+                      self.column("cmc"), self.column("color_bits"), self.column("flags"),
+                      self.column("pt_power"), self.column("pt_toughness"),
+                      self.column("stat_value"), self.column("feature_bits"))
+        for name, keywords, types, cmc, colors, flags, power, toughness, stat_value, bits in columns:
+            yield (name,
+                   {keyword_vocab[i] for i in keywords},
+                   [type_vocab[i] for i in types],
+                   (min(int(cmc), 6), colors, bool(flags & _IS_CREATURE)),
+                   None if isnan(power) else (power, toughness),
+                   {"stat_value": None if isnan(stat_value) else stat_value,
+                    "evasive": bool(bits & 1), "removal": bool(bits & 2), "draw": bool(bits & 4),
+                    "protection": bool(bits & 8), "rare": bool(bits & 16)})
+
+    def _record(self, index: int) -> Card:
+        card = self._records.get(index)
+        if card is None:
+            store = self.store
+            row = self._start + index
+            heap = store.column("heap")
+            values = {"name": self.names[index]}
+            for slot in _STRING_SLOTS[1:]:
+                start, length = store.column(slot + "_start")[row], store.column(slot + "_length")[row]
+                values[slot] = None if length < 0 else str(heap[start:start + length], "utf-8")
+            for slot, _ in _NUMERIC_SLOTS:
+                values[slot] = store.column(slot)[row]
+            starts = store.column("keyword_start")
+            values["keyword_ids"] = tuple(keyword_id(store.keywords[i])
+                                          for i in store.column("keyword_ids")[starts[row]:starts[row + 1]])
+            card = self._records[index] = Card.from_slots(values[slot] for slot in Card.__slots__)
+        return card
+
+    @property
+    def materialized(self) -> int:
+        """Number of Card records built so far"""
+        return len(self._records)
+
+    def extend(self, cards: Iterable) -> int:
+        raise TypeError("cards of a CardStore are read-only")
+
+    def to_dicts(self) -> List[Dict]:
+        return [card.to_dict() for card in self]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("card index out of range")
+        return self._record(index)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        return map(self._record, range(self._count))
+
+    def __reduce__(self):
+        # Worker processes map the store file themselves instead of receiving the cards
+        return (_open_set, (self.store.path, self.code))
+
+
+class CardStore:
+    """
+    Every cached set in one file that is memory-mapped rather than read:
+    fixed-width columns (cmc, color masks, type flags, power/toughness and
+    the static power features), keyword and creature type id lists, and
+    an offset-indexed string heap for names, type lines, oracle text and
+    the other strings. Opening it parses only a small metadata block;
+    open_set slices one set out of the mapping. Written by build_card_store.
+    Close it (or use it as a context manager) before the file is replaced.
+    """
+
+    def __init__(self, path: str):
+        """Map a store file. Raises OSError if it cannot be read and ValueError if it is not usable here."""
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+        try:
+            self._read_meta()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_meta(self):
+        """Check the header and parse the metadata block"""
+        view = self._view
+        if len(view) < _HEADER.size or view[:len(STORE_MAGIC)] != STORE_MAGIC:
+            raise ValueError("not a card store file")
+        _, version, big_endian, self.fingerprint, meta_size = _HEADER.unpack_from(view)
+        if version != STORE_VERSION or big_endian != (sys.byteorder == "big"):
+            raise ValueError(f"card store version {version} cannot be used here")
+        meta = json.loads(str(view[_HEADER.size:_HEADER.size + meta_size], "utf-8"))
+        self.sets = {entry["code"]: entry for entry in meta["sets"]}
+        self.keywords = meta["keywords"]
+        self.creature_types = meta["creature_types"]
+        self._layout = meta["columns"]
+
+    def close(self):
+        """
+        Unmap the file. Sets opened from the store must no longer be in
+        use: their column views keep the mapping alive (BufferError).
+        """
+        for view in self._columns.values():
+            view.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "CardStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def column(self, name: str) -> memoryview:
+        """Typed view of a whole column, across every set"""
+        view = self._columns.get(name)
+        if view is None:
+            offset, typecode, length = self._layout[name]
+            end = offset + length * struct.calcsize(typecode)
+            if end > len(self._view):
+                raise ValueError(f"card store column {name} is truncated")
+            view = self._columns[name] = self._view[offset:end].cast(typecode)
+        return view
+
+    def source_timestamps(self) -> Dict[str, float]:
+        """When each stored set was fetched from Scryfall"""
+        return {code: entry["source_timestamp"] for code, entry in self.sets.items()}
+
+    def open_set(self, code: str) -> Optional[MappedCards]:
+        """A set's cards, or None if the store does not hold it"""
+        entry = self.sets.get(code)
+        if entry is None:
+            return None
+        return MappedCards(self, code, entry["start"], entry["count"])
+
+
+def _open_set(path: str, code: str) -> MappedCards:
+    return CardStore(path).open_set(code)
+
+
+def store_fingerprint() -> bytes:
+    """SHA-1 of what the stored columns depend on besides the cards: layout, parser and power rules"""
+    # Imported here because the engine imports this module
+    from card_rating_engine import REMOVAL_WORDS, PROTECTION_PHRASES
+    key = (STORE_VERSION, parser_checksum().hex(), REMOVAL_WORDS, PROTECTION_PHRASES)
+    return hashlib.sha1(repr(key).encode("utf-8")).digest()
+
+
+def build_card_store(path: str, sets: Dict[str, Tuple[CardTable, float]]):
+    """
+    Write a store of sets ({code: (cards, source timestamp)}). Each set is
+    indexed once by a CardRatingEngine to precompute its creature types
+    and power features. The file is written under a temporary name and
+    moved into place.
+    """
+    from card_rating_engine import CardRatingEngine
+
+    columns = {slot: array.array(typecode) for slot, typecode in _NUMERIC_SLOTS}
+    for slot in _STRING_SLOTS:
+        columns[slot + "_start"] = array.array("I")
+        columns[slot + "_length"] = array.array("i")
+    for name, typecode in (("pt_power", "d"), ("pt_toughness", "d"), ("stat_value", "d"),
+                           ("feature_bits", "B"), ("keyword_ids", "H"), ("type_ids", "H")):
+        columns[name] = array.array(typecode)
+    columns["keyword_start"] = array.array("I", [0])
+    columns["type_start"] = array.array("I", [0])
+    heap = bytearray()
+    spans = {}
+    keyword_ids, type_ids = {}, {}
+    nan = float("nan")
+
+    entries = []
+    for code, (cards, timestamp) in sets.items():
+        engine = CardRatingEngine(cards, columnar=False)
+        entries.append({"code": code, "start": len(columns["cmc"]), "count": len(cards),
+                        "source_timestamp": timestamp})
+        for card in engine.all_cards:
+            for slot in _STRING_SLOTS:
+                value = getattr(card, slot)
+                span = spans.get(value)
+                if span is None:
+                    data = b"" if value is None else value.encode("utf-8")
+                    span = spans[value] = (len(heap), -1 if value is None else len(data))
+                    heap.extend(data)
+                columns[slot + "_start"].append(span[0])
+                columns[slot + "_length"].append(span[1])
+            for slot, _ in _NUMERIC_SLOTS:
+                columns[slot].append(getattr(card, slot))
+
+            name = card.name
+            power, toughness = engine._power_toughness_cache.get(name, (nan, nan))
+            columns["pt_power"].append(power)
+            columns["pt_toughness"].append(toughness)
+            features = engine._feature_cache[name]
+            columns["stat_value"].append(nan if features["stat_value"] is None else features["stat_value"])
+            columns["feature_bits"].append(sum(bit for feature, bit in _FEATURE_BITS.items() if features[feature]))
+            columns["keyword_ids"].extend(keyword_ids.setdefault(keyword, len(keyword_ids))
+                                          for keyword in card["keywords"])
+            columns["keyword_start"].append(len(columns["keyword_ids"]))
+            columns["type_ids"].extend(type_ids.setdefault(ctype, len(type_ids))
+                                       for ctype in engine._creature_type_cache[name])
+            columns["type_start"].append(len(columns["type_ids"]))
+    columns["heap"] = array.array("B", heap)
+
+    def layout(start: int) -> Dict[str, list]:
+        """Column offsets, each on an 8-byte boundary, from start on"""
+        offsets = {}
+        for name, column in columns.items():
+            start = -(-start // 8) * 8
+            offsets[name] = [start, column.typecode, len(column)]
+            start += len(column) * column.itemsize
+        return offsets
+
+    # The metadata lists the column offsets, which depend on the metadata's size
+    meta = {"sets": entries, "keywords": list(keyword_ids), "creature_types": list(type_ids)}
+    meta_size = 0
+    while True:
+        meta["columns"] = layout(_HEADER.size + meta_size)
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        if len(meta_bytes) <= meta_size:
+            break
+        meta_size = len(meta_bytes) + 64
+    header = _HEADER.pack(STORE_MAGIC, STORE_VERSION, sys.byteorder == "big", store_fingerprint(), meta_size)
+
+    temp_path = path + ".part"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(meta_bytes.ljust(meta_size))
+            for name, column in columns.items():
+                f.write(bytes(meta["columns"][name][0] - f.tell()))
+                column.tofile(f)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def cached_set_timestamps(cache_dir: str) -> Dict[str, float]:
+    """Source timestamps of the set caches in cache_dir written by the current parser"""
+    checksum = parser_checksum()
+    timestamps = {}
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*" + SET_CACHE_SUFFIX))):
+        try:
+            with open(path, 'rb') as f:
+                header = read_set_cache_header(f.read(256))
+        except (OSError, SetCacheError):
+            continue
+        if header.parser_checksum == checksum:
+            timestamps[os.path.basename(path)[:-len(SET_CACHE_SUFFIX)]] = header.source_timestamp
+    return timestamps
+
+
+def open_card_store(cache_dir: str) -> Optional[CardStore]:
+    """
+    The store of every set cached in cache_dir (see set_cache), rebuilt
+    first when a set cache was added, refetched or removed since it was
+    written, or the parser or power rules changed. None if no set is
+    cached or the store can be neither read nor rebuilt.
+    """
+    path = card_store_path(cache_dir)
+    timestamps = cached_set_timestamps(cache_dir)
+    if not timestamps:
+        return None
+    try:
+        store = CardStore(path)
+        if store.fingerprint == store_fingerprint() and store.source_timestamps() == timestamps:
+            return store
+        # The mapping has to go before the file is replaced (Windows
+        # refuses to replace a mapped file)
+        store.close()
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not read card store {path}: {e}")
+
+    sets = {}
+    for code, timestamp in timestamps.items():
+        try:
+            _, cards = read_set_cache(os.path.join(cache_dir, code + SET_CACHE_SUFFIX))
+        except (OSError, SetCacheError, ValueError):
+            continue
+        sets[code] = (cards, timestamp)
+    try:
+        build_card_store(path, sets)
+        return CardStore(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not build card store {path}: {e}")
+        return None
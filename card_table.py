@@ -0,0 +1,244 @@
+"""
+Compact card records shared by the API layer and the rating engine
+"""
+from typing import List, Dict, Any, Iterable, Optional
+from collections.abc import Mapping, Sequence
+import sys
+
+import config
+
+# Bit assigned to each color in a 5-bit color mask
+COLOR_BITS = {"W": 1, "U": 2, "B": 4, "R": 8, "G": 16}
+
+# Bit assigned to each card type flag
+TYPE_FLAGS = {
+    "is_creature": 1,
+    "is_instant": 2,
+    "is_sorcery": 4,
+    "is_enchantment": 8,
+    "is_artifact": 16,
+    "is_land": 32,
+}
+
+# Keys exposed by the dict-style adapter, in parse_card_data order
+CARD_KEYS = (
+    "name", "set_code", "type_line", "oracle_text", "mana_cost", "cmc",
+    "is_creature", "is_instant", "is_sorcery", "is_enchantment", "is_artifact", "is_land",
+    "power", "toughness", "colors", "color_identity", "rarity", "oracle_text_lower",
+    "keywords", "image_url", "scryfall_uri",
+)
+
+# Keyword vocabulary shared by all cards; Card.keyword_ids index into it
+KEYWORDS = []
+_KEYWORD_IDS = {}
+
+# Seed ids from the tracked vocabulary so they are stable across runs
+for _keyword in config.TRACKED_KEYWORDS:
+    if _keyword not in _KEYWORD_IDS:
+        _KEYWORD_IDS[_keyword] = len(KEYWORDS)
+        KEYWORDS.append(sys.intern(_keyword))
+
+_MASK_COLORS = [tuple(color for color, bit in COLOR_BITS.items() if mask & bit) for mask in range(32)]
+
+
+def color_mask(colors) -> int:
+    """Pack a list of color codes into a 5-bit mask"""
+    mask = 0
+    for color in colors:
+        mask |= COLOR_BITS.get(color, 0)
+    return mask
+
+
+def mask_colors(mask: int) -> List[str]:
+    """Unpack a 5-bit color mask into a list of color codes"""
+    return list(_MASK_COLORS[mask])
+
+
+def keyword_id(keyword: str) -> int:
+    """Id of a keyword in the shared vocabulary, registering it if new"""
+    kw_id = _KEYWORD_IDS.get(keyword)
+    if kw_id is None:
+        kw_id = len(KEYWORDS)
+        KEYWORDS.append(sys.intern(keyword))
+        _KEYWORD_IDS[keyword] = kw_id
+    return kw_id
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Card(Mapping):
+    """
+    Immutable card record with __slots__.
+    Strings are interned so duplicate prints share them, type booleans and
+    colors are stored as bit-flags and keywords as vocabulary ids. The
+    Mapping interface keeps dict-style access (card["name"], card.get(...))
+    working with the same keys parse_card_data produces.
+    """
+
+    __slots__ = ("name", "set_code", "type_line", "oracle_text", "mana_cost", "cmc", "flags",
+                 "power", "toughness", "color_bits", "identity_bits", "rarity", "keyword_ids",
+                 "image_url", "scryfall_uri")
+
+    def __init__(self, name: str, set_code: str = "", type_line: str = "", oracle_text: str = "",
+                 mana_cost: str = "", cmc: float = 0, flags: int = 0, power: Optional[str] = None,
+                 toughness: Optional[str] = None, color_bits: int = 0, identity_bits: int = 0,
+                 rarity: str = "common", keyword_ids: tuple = (), image_url: str = "",
+                 scryfall_uri: str = ""):
+        setter = object.__setattr__
+        setter(self, "name", _intern(name))
+        setter(self, "set_code", _intern(set_code))
+        setter(self, "type_line", _intern(type_line))
+        setter(self, "oracle_text", _intern(oracle_text))
+        setter(self, "mana_cost", _intern(mana_cost))
+        setter(self, "cmc", cmc)
+        setter(self, "flags", flags)
+        setter(self, "power", _intern(power))
+        setter(self, "toughness", _intern(toughness))
+        setter(self, "color_bits", color_bits)
+        setter(self, "identity_bits", identity_bits)
+        setter(self, "rarity", _intern(rarity))
+        setter(self, "keyword_ids", keyword_ids)
+        setter(self, "image_url", image_url)
+        setter(self, "scryfall_uri", scryfall_uri)
+
+    @classmethod
+    def from_dict(cls, card: Dict[str, Any]) -> "Card":
+        """Build a record from a parse_card_data style dict"""
+        if isinstance(card, Card):
+            return card
+        flags = 0
+        for key, bit in TYPE_FLAGS.items():
+            if card.get(key):
+                flags |= bit
+        return cls(
+            name=card.get("name", "Unknown"),
+            set_code=card.get("set_code", ""),
+            type_line=card.get("type_line", ""),
+            oracle_text=card.get("oracle_text", ""),
+            mana_cost=card.get("mana_cost", ""),
+            cmc=card.get("cmc", 0),
+            flags=flags,
+            power=card.get("power"),
+            toughness=card.get("toughness"),
+            color_bits=color_mask(card.get("colors", [])),
+            identity_bits=color_mask(card.get("color_identity", [])),
+            rarity=card.get("rarity", "common"),
+            keyword_ids=tuple(keyword_id(kw) for kw in card.get("keywords", [])),
+            image_url=card.get("image_url", ""),
+            scryfall_uri=card.get("scryfall_uri", ""),
+        )
+
+    @classmethod
+    def from_slots(cls, values: Iterable) -> "Card":
+        """
+        Build a record from its slot values in __slots__ order, without
+        interning; for loaders whose strings are already shared.
+        """
+        card = cls.__new__(cls)
+        for setter, value in zip(_SLOT_SETTERS, values):
+            setter(card, value)
+        return card
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy, e.g. for JSON caching"""
+        return {key: self[key] for key in CARD_KEYS}
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card records are immutable")
+
+    def __getitem__(self, key: str):
+        getter = _GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self)
+
+    def __iter__(self):
+        return iter(CARD_KEYS)
+
+    def __len__(self) -> int:
+        return len(CARD_KEYS)
+
+    def __repr__(self) -> str:
+        return f"Card({self.name!r})"
+
+    def __reduce__(self):
+        # Keyword ids are only meaningful within one process, so pickle by value
+        return (Card.from_dict, (self.to_dict(),))
+
+
+# Slot descriptors' setters, bypassing the immutable __setattr__ (see Card.from_slots)
+_SLOT_SETTERS = [getattr(Card, slot).__set__ for slot in Card.__slots__]
+
+
+def _flag_getter(bit: int):
+    return lambda card: bool(card.flags & bit)
+
+
+def _field_getter(slot: str):
+    return lambda card: getattr(card, slot)
+
+
+_GETTERS = {key: _field_getter(key) for key in CARD_KEYS if key in Card.__slots__}
+_GETTERS.update({key: _flag_getter(bit) for key, bit in TYPE_FLAGS.items()})
+_GETTERS.update({
+    "colors": lambda card: mask_colors(card.color_bits),
+    "color_identity": lambda card: mask_colors(card.identity_bits),
+    "oracle_text_lower": lambda card: (card.oracle_text or "").lower(),
+    "keywords": lambda card: [KEYWORDS[kw_id] for kw_id in card.keyword_ids],
+})
+
+
+class CardTable(Sequence):
+    """
+    Ordered collection of Card records for one card pool. Records are
+    never changed or removed; a set streaming in is appended page by page.
+    """
+
+    def __init__(self, cards: Iterable[Card] = ()):
+        self._cards = list(cards)
+
+    def extend(self, cards: Iterable[Dict[str, Any]]) -> int:
+        """Append parse_card_data style dicts (or Card records); returns the index of the first new card"""
+        start = len(self._cards)
+        self._cards.extend(Card.from_dict(card) for card in cards)
+        return start
+
+    @classmethod
+    def from_dicts(cls, cards: Iterable[Dict[str, Any]]) -> "CardTable":
+        """Build a table from parse_card_data style dicts (or Card records)"""
+        return cls(Card.from_dict(card) for card in cards)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Plain dict copies of every card"""
+        return [card.to_dict() for card in self._cards]
+
+    def __getitem__(self, index):
+        return self._cards[index]
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards)
+
+
+class TableRows(Sequence):
+    """
+    The cards of a table at the given rows, in that order. Records are
+    only fetched from the table when indexed, so a ranking over a subset
+    of a mapped set builds just the rows it shows.
+    """
+
+    def __init__(self, table: Sequence[Card], rows: Sequence[int]):
+        self.table = table
+        self.rows = rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table[row] for row in self.rows[index]]
+        return self.table[self.rows[index]]
+
+    def __len__(self) -> int:
+        return len(self.rows)
@@ -10,32 +10,56 @@ Customize the application behavior here
 
 RATING_WEIGHTS = {
     # Mana curve analysis (base ±2.0)
-    "mana_curve_perfect_fit": 2.0,
-    "mana_curve_good_fit": 1.0,
-    "mana_curve_crowded": -1.5,
+    "mana_curve_perfect_fit": 2.0,   # well below the ideal count for the card's cmc
+    "mana_curve_good_fit": 1.0,      # just below the ideal count
+    "mana_curve_exact_fit": 0.0,     # exactly at the ideal count
+    "mana_curve_crowded": -1.5,      # above the ideal count
     
     # Color analysis (base ±1.5)
-    "color_perfect_fit": 1.5,
-    "color_good_fit": 0.5,
-    "color_conflict": -2.0,
+    "color_perfect_fit": 1.5,        # card colors within the deck's colors
+    "color_good_fit": 0.0,           # multicolor card sharing some deck colors
+    "color_open": 0.3,               # colored card while the deck has no colors yet
+    "color_conflict": -2.0,          # mono-colored card outside the deck's colors
+    "color_off_colors": -1.5,        # multicolor card sharing no deck colors
     "colorless_bonus": 0.5,
     
     # Balance analysis (base ±1.5)
     "creature_needed": 1.5,
     "spell_needed": 1.5,
-    "balance_penalty": -1.0,
+    "balance_neutral": 0.5,          # creature ratio within tolerance of the target
+    "balance_penalty": -1.0,         # creature when the deck has too many creatures
+    "spell_penalty": -0.5,           # spell when the deck has too few creatures
     
     # Power level (base 0-1.5)
     "removal_spell": 1.5,
     "card_draw": 1.0,
-    "good_value": 1.5,
-    "great_value": 0.5,
-    "poor_value": -1.0,
+    "protection_spell": 0.5,
+    "great_value": 1.5,              # 2+ power/toughness per mana
+    "good_value": 0.5,               # 1.5+ power/toughness per mana
+    "poor_value": -1.0,              # under 0.8 power/toughness per mana
+    "evasive_creature": 0.5,
     
     # Synergies (variable)
-    "keyword_synergy": 1.0,
+    "keyword_synergy": 1.0,          # per keyword shared with the deck
     "creature_type_synergy": 0.5,
-    "theme_synergy": 0.5,
+    "theme_synergy": 0.5,            # evasion with a draw or flying deck
+    "pair_synergy": 0.0,             # per synergy matrix entry with the deck, averaged over its cards (0 = off)
+    
+    # Bonus for filling an empty deck, scaled down as the deck grows
+    "deck_completion": 0.5,
+    
+    # Lookahead: per point the best remaining cards improve after a pick
+    "lookahead_follow_up": 0.5,
+    
+    # Pick order: share of a card's rating taken from its best archetype (0 = off)
+    "archetype_pick_blend": 0.0,
+    
+    # Whole-deck quality (DeckState.quality)
+    "quality_power": 1.0,            # per point of summed limited power
+    "quality_synergy": 1.0,          # per pair of cards sharing a keyword or creature type, per card
+    "quality_curve": -0.5,           # per nonland card off the ideal curve beyond the tolerance
+    "quality_off_color": -1.0,       # per card color outside the deck's two main colors
+    "quality_creature_balance": -0.5,  # per card off the creature ratio beyond the tolerance
 }
 
 # ==========================================
@@ -45,6 +69,9 @@ RATING_WEIGHTS = {
 # Target creature ratio (0.65 = 65% creatures)
 TARGET_CREATURE_RATIO = 0.65
 
+# How far the creature ratio may drift from the target before balance kicks in
+CREATURE_RATIO_TOLERANCE = 0.1
+
 # Target spell ratio (0.35 = 35% spells)
 TARGET_SPELL_RATIO = 0.35
 
@@ -83,10 +110,21 @@ USE_COLOR = True
 # Scryfall API base URL
 SCRYFALL_API_URL = "https://api.scryfall.com"
 
+# Parallel requests when fetching a set's search pages (1 = one page at a time)
+SCRYFALL_FETCH_WORKERS = 4
+
+# Minimum seconds between request starts; Scryfall asks for 50-100 ms
+SCRYFALL_REQUEST_INTERVAL = 0.1
+
+# Seconds to wait for a Scryfall response
+SCRYFALL_TIMEOUT = 30
+
 # Cache directory for set data
 CACHE_DIRECTORY = "cache"
 
 # Cache expiration time in seconds (set to 0 for no expiration)
+# After this the cached set catalog (cache/sets.json) is revalidated with
+# Scryfall in the background; it is still used meanwhile and when offline
 # 7 days = 604800 seconds
 CACHE_EXPIRATION = 604800
 
@@ -106,18 +144,24 @@ TRACKED_KEYWORDS = [
     "removal", "wrath", "board wipe", "pump", "cantrip", "value"
 ]
 
-# Synergy keywords (get big boost when detected together)
+# Synergy keywords: extra bonus when both the card and the deck have them
+# (on top of RATING_WEIGHTS["keyword_synergy"])
 SYNERGY_KEYWORDS = {
-    "flying": 1.0,
+    "draw": 0.5,
     "sacrifice": 1.0,
-    "token": 1.0,
-    "graveyard": 0.75,
-    "proliferate": 0.75,
-    "mill": 0.75,
-    "draw": 0.75,
-    "counterspell": 0.75,
 }
 
+# Keyword pairings that feed each other in the pairwise synergy matrix
+# (RATING_WEIGHTS["pair_synergy"]), e.g. token makers and sacrifice outlets
+SYNERGY_PAIRINGS = [
+    ("token", "sacrifice"),
+    ("sacrifice", "graveyard"),
+    ("draw", "discard"),
+    ("discard", "graveyard"),
+    ("mill", "graveyard"),
+    ("surveil", "graveyard"),
+]
+
 # ==========================================
 # CREATURE TYPE TRACKING
 # ==========================================
@@ -129,7 +173,7 @@ TRACKED_CREATURE_TYPES = [
     "warrior", "knight", "rogue", "scout", "soldier", "cat", "dog",
 ]
 
-# Minimum creature type count to boost synergy
+# Minimum creature type count to report a tribal theme
 CREATURE_TYPE_SYNERGY_THRESHOLD = 2
 
 # ==========================================
@@ -153,7 +197,7 @@ SET_SPECIFIC_RATINGS = {
 # RARITY WEIGHTS
 # ==========================================
 
-# Bonus for different rarities
+# Bonus for different rarities (used by the pick order before any card is picked)
 RARITY_WEIGHTS = {
     "common": 0.0,
     "uncommon": 0.2,
@@ -210,6 +254,13 @@ MAX_DECK_SIZE = 100
 # Number of lands to suggest
 SUGGESTED_LAND_COUNT = 8
 
+# Deck builder (sealed pools and finished drafts): nonland cards per build
+# (the rest of DEFAULT_DECK_SIZE are basic lands), most cards of a splash
+# color, and how many builds to return
+DECK_BUILDER_SPELLS = 23
+DECK_BUILDER_MAX_SPLASH = 3
+DECK_BUILDER_RESULTS = 3
+
 # ==========================================
 # QUALITY OF LIFE
 # ==========================================
@@ -230,6 +281,16 @@ WARN_ON_IMBALANCED = True
 # Performance optimization: cache analysis results
 CACHE_ANALYSIS_RESULTS = True
 
+# Maximum number of rated decks kept in the rating cache (LRU)
+RATING_CACHE_SIZE = 64
+
+# Lookahead ("what-if") re-rating of the top candidates: how many candidates
+# are simulated, how many of the best remaining cards measure the follow-up
+# options, and the default wall-clock budget in seconds (0 = no limit)
+LOOKAHEAD_CANDIDATES = 8
+LOOKAHEAD_FOLLOW_UPS = 10
+LOOKAHEAD_TIME_BUDGET = 1.0
+
 # Performance optimization: limit rating calculations
 # Set to 0 for no limit
 MAX_CARDS_TO_RATE = 0
@@ -0,0 +1,230 @@
+"""
+Deck builder for sealed pools and finished drafts
+"""
+import re
+import itertools
+import multiprocessing
+from typing import List, Dict, Any, Optional
+
+import config
+from card_rating_engine import CardRatingEngine
+from card_table import COLOR_BITS, color_mask
+
+# Every two-color pair, the starting point of each build
+COLOR_PAIRS = ["".join(pair) for pair in itertools.combinations("WUBRG", 2)]
+
+BASIC_LANDS = {"W": "Plains", "U": "Island", "B": "Swamp", "R": "Mountain", "G": "Forest"}
+
+# Local search stops after this many passes even if swaps keep improving
+MAX_SWAP_PASSES = 5
+
+_MANA_SYMBOL = re.compile(r"\{([^}]*)\}")
+_POOL_LINE = re.compile(r"^(\d+)x?\s+(.+)$")
+
+# Per-process engine set up once by _init_worker, so tasks only carry names
+_engine = None
+
+
+def build_for_colors(engine: CardRatingEngine, pool_cards: List[Dict[str, Any]], colors: str,
+                     spells: int, splash: str = "", max_splash: int = 0,
+                     start: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Best deck of `spells` nonland pool cards within `colors`, plus at most
+    max_splash cards touching the splash color. Greedy construction by
+    DeckState.quality(), then swap-based local search: each deck card in
+    turn is replaced by the remaining card that improves quality most,
+    until a pass makes no swap. `start` seeds the deck (e.g. a pair build
+    being splashed).
+    """
+    main_mask = color_mask(colors)
+    splash_mask = color_mask(splash)
+    def is_splash(card):
+        return bool(engine.color_mask_of(card["name"]) & splash_mask)
+
+    remaining = [card for card in pool_cards
+                 if not card["is_land"] and not engine.color_mask_of(card["name"]) & ~(main_mask | splash_mask)]
+    deck = engine.new_deck()
+    for name in start or []:
+        for i, card in enumerate(remaining):
+            if card["name"] == name:
+                deck.add(remaining.pop(i))
+                break
+    splashed = sum(is_splash(card) for card in deck.cards)
+
+    while len(deck) < spells:
+        best = _best_addition(deck, remaining, is_splash if splashed >= max_splash else None)
+        if best is None:
+            break
+        card = remaining.pop(best)
+        deck.add(card)
+        splashed += is_splash(card)
+
+    for _ in range(MAX_SWAP_PASSES):
+        swapped = False
+        # Rotate through the deck: take the oldest card out, put the best card back in
+        for _ in range(len(deck)):
+            current = deck.quality()
+            out = deck.pop(0)
+            splashed -= is_splash(out)
+            best = _best_addition(deck, remaining, is_splash if splashed >= max_splash else None, current)
+            if best is None:
+                card = out
+            else:
+                card = remaining.pop(best)
+                remaining.append(out)
+                swapped = True
+            deck.add(card)
+            splashed += is_splash(card)
+        if not swapped:
+            break
+
+    names = sorted(deck.names)
+    # A pool short of playables gives a short build rather than extra lands
+    land_count = max(0, config.DEFAULT_DECK_SIZE - spells)
+    return {
+        "colors": colors,
+        "splash": splash if splashed else "",
+        "spells": names,
+        "quality": deck.quality(),
+        "land_count": land_count,
+        "lands": suggest_basics(deck.cards, colors + splash, land_count),
+    }
+
+
+def _best_addition(deck, remaining: List[Dict[str, Any]], excluded=None,
+                   threshold: float = float("-inf")) -> Optional[int]:
+    """
+    Index of the remaining card whose addition gives the highest quality
+    above threshold (None if none does). excluded(card) skips cards.
+    Each card name is tried once.
+    """
+    best, best_quality = None, threshold + 1e-9
+    tried = set()
+    for i, card in enumerate(remaining):
+        name = card["name"]
+        if name in tried or (excluded is not None and excluded(card)):
+            continue
+        tried.add(name)
+        deck.add(card)
+        quality = deck.quality()
+        deck.pop()
+        if quality > best_quality:
+            best, best_quality = i, quality
+    return best
+
+
+def suggest_basics(cards: List[Dict[str, Any]], colors: str, land_count: int) -> Dict[str, int]:
+    """Split land_count basics across colors in proportion to the colored mana symbols"""
+    pips = dict.fromkeys(colors, 0.0)
+    for card in cards:
+        for symbol in _MANA_SYMBOL.findall(card.get("mana_cost") or ""):
+            symbol_colors = [c for c in symbol.split("/") if c in pips]
+            for color in symbol_colors:
+                pips[color] += 1.0 / len(symbol_colors)
+    total = sum(pips.values())
+    if not total:
+        pips = dict.fromkeys(colors, 1.0)
+        total = float(len(colors))
+    if not total:
+        return {}
+
+    # Largest remainder, so the counts add up to land_count
+    shares = {color: land_count * value / total for color, value in pips.items()}
+    counts = {color: int(share) for color, share in shares.items()}
+    leftover = land_count - sum(counts.values())
+    for color in sorted(shares, key=lambda c: counts[c] - shares[c])[:leftover]:
+        counts[color] += 1
+    return {BASIC_LANDS[color]: count for color, count in counts.items() if count}
+
+
+def parse_pool(lines: List[str]) -> List[str]:
+    """Card names from pool lines, expanding decklist counts ("2 Name" or "2x Name")"""
+    names = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = _POOL_LINE.match(line)
+        if match:
+            names.extend([match.group(2).strip()] * int(match.group(1)))
+        else:
+            names.append(line)
+    return names
+
+
+def _init_worker(set_cards):
+    """Build an engine once per worker process"""
+    global _engine
+    _engine = CardRatingEngine(set_cards)
+
+
+def _build_task(task, engine: Optional[CardRatingEngine] = None) -> Dict[str, Any]:
+    pool_names, colors, spells, splash, max_splash, start = task
+    engine = engine or _engine
+    pool_cards = [card for card in engine.resolve_cards(pool_names) if card is not None]
+    return build_for_colors(engine, pool_cards, colors, spells, splash, max_splash, start)
+
+
+class DeckBuilder:
+    """
+    Builds the best decks from a card pool: every two-color pair first,
+    then splashes of each remaining color on the best pairs. Builds can be
+    spread across a process pool.
+    """
+
+    def __init__(self, engine: CardRatingEngine, processes: Optional[int] = 1):
+        """processes > 1 (or None for one per core) searches color combinations in a process pool"""
+        self.engine = engine
+        self.pool = None
+        if processes != 1:
+            # Set cards go to each worker once, through the initializer
+            self.pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                             initargs=(engine.all_cards,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def build(self, pool_names: List[str], results: Optional[int] = None,
+              spells: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The best `results` builds of a pool (card names, duplicates allowed),
+        best first. Each build is a dict with colors, splash ("" for none),
+        spells (sorted card names), quality, land_count and lands (basic
+        land name -> count).
+        """
+        results = config.DECK_BUILDER_RESULTS if results is None else results
+        spells = config.DECK_BUILDER_SPELLS if spells is None else spells
+        max_splash = config.DECK_BUILDER_MAX_SPLASH
+        self.engine.refresh_config()
+        pool_names = list(pool_names)
+
+        builds = self._run([(pool_names, pair, spells, "", 0, None) for pair in COLOR_PAIRS])
+        builds.sort(key=lambda build: -build["quality"])
+
+        # Splashes start from the best pair builds and only swap cards in
+        pool_colors = self._pool_colors(pool_names)
+        tasks = [(pool_names, build["colors"], spells, splash, max_splash, build["spells"])
+                 for build in builds[:results] for splash in COLOR_BITS
+                 if splash not in build["colors"] and pool_colors & COLOR_BITS[splash]]
+        builds += self._run(tasks)
+
+        unique = {}
+        for build in sorted(builds, key=lambda build: -build["quality"]):
+            unique.setdefault(tuple(build["spells"]), build)
+        return list(unique.values())[:results]
+
+    def _pool_colors(self, pool_names: List[str]) -> int:
+        """Color mask of every nonland card in the pool"""
+        mask = 0
+        for card in self.engine.resolve_cards(pool_names):
+            if card is not None and not card["is_land"]:
+                mask |= self.engine.color_mask_of(card["name"])
+        return mask
+
+    def _run(self, tasks: List[tuple]) -> List[Dict[str, Any]]:
+        if self.pool is None:
+            return [_build_task(task, self.engine) for task in tasks]
+        return self.pool.map(_build_task, tasks)
@@ -0,0 +1,54 @@
+"""
+Compiled per-deck scoring context for the card rating engine
+"""
+from collections import Counter
+from typing import List, Dict, Any
+
+from card_table import mask_colors
+
+
+class DeckContext:
+    """
+    Score lookup tables compiled once for one deck analysis.
+    Mana curve fit only depends on a card's cmc bin, color fit on its color
+    mask and balance on whether it is a creature, so each is evaluated once
+    per bucket here and cards score by indexing the tables. A context is
+    immutable and can be passed to CardRatingEngine.rank_cards (or kept by
+    batch callers) instead of the deck it was compiled from.
+    """
+
+    def __init__(self, engine, deck_cards: List[Dict[str, Any]], analysis: Dict[str, Any]):
+        """Compile the tables for a deck; analysis is in _analyze_deck's shape"""
+        self.engine = engine
+        self.deck_cards = list(deck_cards)
+        self.analysis = analysis
+        self.signature = engine.deck_signature(self.deck_cards)
+        self.scoring_hash = engine._scoring_hash
+
+        # Indexed by cmc bin 0-6, 5-bit color mask and creature flag
+        self.curve_table = tuple(engine._rate_mana_curve_fit({"cmc": cmc_bin}, analysis)
+                                 for cmc_bin in range(7))
+        self.color_table = tuple(engine._rate_color_fit({"colors": mask_colors(mask)}, analysis)
+                                 for mask in range(32))
+        self.balance_table = tuple(engine._rate_deck_balance({"is_creature": flag}, analysis)
+                                   for flag in (False, True))
+        self.completion = engine.weights.deck_completion * ((40 - analysis["count"]) / 40.0)
+        self._pair_hits = None
+
+    def __len__(self) -> int:
+        return len(self.deck_cards)
+
+    def lookup(self, card_name: str) -> tuple:
+        """(mana_curve, color, balance) scores of a set card by table lookup"""
+        cmc_bin, mask, is_creature = self.engine._bucket_cache[card_name]
+        return self.curve_table[cmc_bin], self.color_table[mask], self.balance_table[is_creature]
+
+    def pair_hits(self, card_name: str) -> int:
+        """
+        Synergy matrix entries between a set card and the deck's cards.
+        The deck's row of hits is computed on first use.
+        """
+        if self._pair_hits is None:
+            matrix = self.engine.synergy_matrix()
+            self._pair_hits = matrix.matvec(Counter(matrix.positions[name] for name in self.signature))
+        return self._pair_hits[self.engine.synergy_matrix().positions[card_name]]
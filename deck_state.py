@@ -0,0 +1,275 @@
+"""
+Incrementally maintained deck analysis for the card rating engine
+"""
+from typing import List, Dict, Any, Optional, Union
+from collections import Counter
+
+from deck_context import DeckContext
+
+# Inputs of DeckState.quality(), each weighted by RATING_WEIGHTS["quality_<name>"]
+QUALITY_COMPONENTS = ("power", "synergy", "curve", "off_color", "creature_balance")
+
+# Per-card counters that copy() shares until one of the decks changes
+COUNTER_FIELDS = ("cmc_distribution", "mana_curve", "colors", "color_identity",
+                  "keywords", "creature_types", "creature_type_index", "curve_bins")
+
+
+class DeckState:
+    """
+    Mutable deck owned by a CardRatingEngine.
+    add() and remove() adjust the counters used by the rating engine in O(1),
+    so the deck analysis never has to be recomputed from the full card list.
+    The same counters give the whole-deck quality() score in O(1).
+    """
+
+    def __init__(self, engine):
+        """Create an empty deck bound to a rating engine"""
+        self.engine = engine
+        self.cards = []
+        self.creatures = 0
+        self.spells = 0
+        self.lands = 0
+        self.total_cmc = 0
+        self.cmc_distribution = Counter()
+        self.mana_curve = Counter()
+        self.colors = Counter()
+        self.color_identity = Counter()
+        self.keywords = Counter()
+        self.creature_types = Counter()
+        self.creature_type_index = Counter()
+        # Nonland cards per cmc bin 0-6, and pairs of cards sharing a keyword / creature type
+        self.curve_bins = Counter()
+        self.keyword_pairs = 0
+        self.type_pairs = 0
+        self._power_total = 0.0
+        self._power_hash = engine._scoring_hash
+        self._analysis = None
+        self._context = None
+        # Counters shared with a copy() until the next change
+        self._shared = False
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __contains__(self, card: Union[str, Dict[str, Any]]) -> bool:
+        name = card if isinstance(card, str) else card["name"]
+        return any(existing["name"] == name for existing in self.cards)
+
+    @property
+    def names(self) -> List[str]:
+        """Names of the cards in the deck, in pick order"""
+        return [card["name"] for card in self.cards]
+
+    @property
+    def analysis(self) -> Dict[str, Any]:
+        """Deck analysis in the same shape as CardRatingEngine._analyze_deck"""
+        if self._analysis is None:
+            count = len(self.cards)
+            analysis = {
+                "count": count,
+                "creatures": self.creatures,
+                "spells": self.spells,
+                "lands": self.lands,
+                "cmc_distribution": Counter(self.cmc_distribution),
+                "colors": Counter(self.colors),
+                "color_identity": set(self.color_identity),
+                "keywords": Counter(self.keywords),
+                "creature_types": Counter(self.creature_types),
+                "creature_type_index": Counter(self.creature_type_index),
+                "mana_curve": dict(self.mana_curve),
+                "avg_cmc": self.total_cmc / count if count else 0,
+                "synergies": [],
+            }
+            analysis["synergies"] = self.engine._detect_synergies(self.cards, analysis)
+            self._analysis = analysis
+        return self._analysis
+
+    @property
+    def context(self):
+        """Compiled DeckContext for the current cards, rebuilt after each change"""
+        if self._context is None or self._context.scoring_hash != self.engine._scoring_hash:
+            self._context = DeckContext(self.engine, self.cards, self.analysis)
+        return self._context
+
+    def add(self, card: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Add a card (name or card object) to the deck.
+        Returns the resolved card, or None if the name could not be matched.
+        """
+        if isinstance(card, str):
+            card = self.engine.resolve_card(card)
+            if card is None:
+                return None
+
+        self.cards.append(card)
+        self._update(card, 1)
+        return card
+
+    def remove(self, card: Union[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Remove the first copy of a card (name or card object) from the deck"""
+        name = card if isinstance(card, str) else card["name"]
+        for idx, existing in enumerate(self.cards):
+            if existing["name"] == name:
+                return self.pop(idx)
+        return None
+
+    def pop(self, index: int = -1) -> Dict[str, Any]:
+        """Remove and return the card at a deck position"""
+        card = self.cards.pop(index)
+        self._update(card, -1)
+        return card
+
+    def clear(self):
+        """Remove every card from the deck"""
+        self.__init__(self.engine)
+
+    def copy(self) -> "DeckState":
+        """
+        Independent copy of this deck bound to the same engine.
+        Copy-on-write: the counters (and the compiled analysis and context)
+        are shared until either deck changes, so what-if copies are cheap.
+        """
+        other = DeckState(self.engine)
+        other.cards = list(self.cards)
+        other.creatures = self.creatures
+        other.spells = self.spells
+        other.lands = self.lands
+        other.total_cmc = self.total_cmc
+        other.keyword_pairs = self.keyword_pairs
+        other.type_pairs = self.type_pairs
+        other._power_total = self._power_total
+        other._power_hash = self._power_hash
+        for field in COUNTER_FIELDS:
+            setattr(other, field, getattr(self, field))
+        other._analysis = self._analysis
+        other._context = self._context
+        self._shared = other._shared = True
+        return other
+
+    @property
+    def power_total(self) -> float:
+        """Summed limited power of the deck's cards"""
+        if self._power_hash != self.engine._scoring_hash:
+            # Power weights changed: resum once, then keep updating incrementally
+            self._power_total = sum(self.engine._rate_limited_power(card) for card in self.cards)
+            self._power_hash = self.engine._scoring_hash
+        return self._power_total
+
+    def quality_components(self) -> Dict[str, float]:
+        """
+        Unweighted inputs of quality(): summed power, synergy density
+        (card pairs sharing a keyword or creature type, per card), cards off
+        the ideal curve and off the creature ratio beyond their tolerances,
+        and card colors outside the two main colors.
+        """
+        return dict(zip(QUALITY_COMPONENTS, self._quality_terms()))
+
+    def quality(self) -> float:
+        """
+        Whole-deck quality: the quality_components() weighted by the
+        RATING_WEIGHTS quality_* settings. Higher is better. Every input is
+        kept up to date by add() and remove(), so this is O(1) per call.
+        """
+        weights = self.engine.weights
+        power, synergy, curve, off_color, creature_balance = self._quality_terms()
+        return (weights.quality_power * power
+                + weights.quality_synergy * synergy
+                + weights.quality_curve * curve
+                + weights.quality_off_color * off_color
+                + weights.quality_creature_balance * creature_balance)
+
+    def _quality_terms(self) -> tuple:
+        """quality_components() values, in QUALITY_COMPONENTS order"""
+        weights = self.engine.weights
+        count = len(self.cards)
+        curve_bins = self.curve_bins
+        tolerance = weights.curve_tolerance
+        curve = 0.0
+        for cmc_bin, ideal in enumerate(weights.ideal_curve):
+            off = abs(curve_bins.get(cmc_bin, 0) - ideal) - tolerance
+            if off > 0:
+                curve += off
+        main_colors = sorted(self.colors.values(), reverse=True)
+        playables = self.creatures + self.spells
+        creature_off = abs(self.creatures - weights.creature_ratio * playables)
+        return (
+            self.power_total,
+            (self.keyword_pairs + self.type_pairs) / count if count else 0.0,
+            curve,
+            float(sum(main_colors[2:])),
+            max(0.0, creature_off - weights.creature_ratio_tolerance * playables),
+        )
+
+    def _update(self, card: Dict[str, Any], delta: int):
+        """Apply one card's contribution to the counters (delta is +1 or -1)"""
+        self._analysis = None
+        self._context = None
+        if self._shared:
+            for field in COUNTER_FIELDS:
+                setattr(self, field, Counter(getattr(self, field)))
+            self._shared = False
+
+        (is_creature, is_spell, is_land, cmc, cmc_int, mana_bin, curve_bin,
+         colors, identity, keywords, ctypes) = self._contribution(card)
+        if is_creature:
+            self.creatures += delta
+        elif is_spell:
+            self.spells += delta
+        if is_land:
+            self.lands += delta
+
+        self.total_cmc += delta * cmc
+        _bump(self.cmc_distribution, cmc_int, delta)
+        _bump(self.mana_curve, mana_bin, delta)
+        if curve_bin is not None:
+            _bump(self.curve_bins, curve_bin, delta)
+        if self._power_hash == self.engine._scoring_hash:
+            self._power_total += delta * self.engine._rate_limited_power(card)
+
+        for color in colors:
+            _bump(self.colors, color, delta)
+        for color in identity:
+            _bump(self.color_identity, color, delta)
+
+        # A card sharing a key with n others adds (or removes) n pairs
+        for keyword in keywords:
+            count = _bump(self.keywords, keyword, delta)
+            self.keyword_pairs += count - 1 if delta > 0 else -count
+        for ctype in ctypes:
+            _bump(self.creature_types, ctype, delta)
+            if is_creature:
+                count = _bump(self.creature_type_index, ctype, delta)
+                self.type_pairs += count - 1 if delta > 0 else -count
+
+    def _contribution(self, card: Dict[str, Any]) -> tuple:
+        """What one card adds to the counters, cached on the engine by card name"""
+        cache = self.engine._contribution_cache
+        contribution = cache.get(card["name"])
+        if contribution is None:
+            cmc = card.get("cmc", 0)
+            cmc_int = int(cmc)
+            contribution = (
+                card["is_creature"],
+                card["is_instant"] or card["is_sorcery"],
+                card["is_land"],
+                cmc,
+                cmc_int,
+                min(cmc_int, 6) if cmc_int <= 5 else "6+",
+                None if card["is_land"] else min(cmc_int, 6),
+                tuple(card.get("colors", [])),
+                tuple(card.get("color_identity", [])),
+                tuple(self.engine._keyword_cache.get(card["name"], ())),
+                tuple(self.engine._creature_type_cache.get(card["name"], ())),
+            )
+            cache[card["name"]] = contribution
+        return contribution
+
+
+def _bump(counter: Counter, key, delta: int) -> int:
+    """Adjust a refcount, dropping keys that reach zero; returns the new count"""
+    count = counter[key] + delta
+    if count:
+        counter[key] = count
+    else:
+        del counter[key]
+    return count
@@ -9,7 +9,9 @@ import threading
 import json
 from datetime import datetime
 from scryfall_api import ScryfallAPI
-from card_rating_engine import CardRatingEngine
+from set_pipeline import stream_set
+from card_filter import CardFilter
+from deck_builder import DeckBuilder, parse_pool
 
 
 class MTGDraftRaterGUI:
@@ -28,7 +30,7 @@ class MTGDraftRaterGUI:
         self.current_set = None
         self.set_cards = []
         self.rating_engine = None
-        self.selected_cards = []
+        self.deck = None
         self.all_sets = []
         self.current_ratings = []
         
@@ -156,7 +158,16 @@ class MTGDraftRaterGUI:
         search_entry = ttk.Entry(control_frame, textvariable=self.card_search_var, width=20)
         search_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        # Cards excluded by these (and the search text) are not scored by Rate Cards
+        self.deck_colors_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="My colors", variable=self.deck_colors_var).pack(side=tk.LEFT, padx=5)
+        self.hide_picked_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Hide picked", variable=self.hide_picked_var).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(control_frame, text="Rate Cards", command=self._rate_cards_clicked).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Rate Pack", command=self._rate_pack_clicked).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Build Deck", command=self._build_deck_clicked).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Archetype", command=self._archetype_clicked).pack(side=tk.LEFT, padx=5)
         
         # Results display with tree view for better card listing
         tree_frame = ttk.Frame(rec_frame)
@@ -262,8 +273,11 @@ class MTGDraftRaterGUI:
         """Handle set selection"""
         pass
     
-    def _load_set_clicked(self):
-        """Load the selected set"""
+    def _load_set_clicked(self, deck_names=None):
+        """
+        Load the selected set. deck_names, when given, become the deck once
+        the whole set has loaded (used by _load_deck).
+        """
         if not self.set_combo_var.get():
             messagebox.showwarning("Warning", "Please select a set first")
             return
@@ -283,35 +297,43 @@ class MTGDraftRaterGUI:
         self.set_status_var.set(f"Loading {selected_set['name']}...")
         self.root.update()
         
+        def show_page(engine, cards):
+            # Cards become searchable as soon as their page has been parsed
+            if engine is not self.rating_engine:
+                # A new set: the deck and ratings of the previous one no longer apply
+                self.deck = engine.new_deck()
+                self.current_card_ratings = {}
+                self._update_deck_display()
+            self.rating_engine = engine
+            self.set_cards = engine.all_cards  # compact Card records
+            self.all_card_list = self.set_cards
+            self._update_card_list()
+            self.set_status_var.set(f"Loading {selected_set['name']}... {len(self.set_cards)} cards so far")
+        
         def load():
-            cards = ScryfallAPI.get_set_cards(selected_set['code'])
+            # Parse pages as they arrive, keeping the first print of each name
+            engine = stream_set(selected_set['code'], unique_names=True, on_page=show_page)
             
-            if cards:
-                # Parse cards and deduplicate by name
-                parsed_cards = []
-                seen_cards = set()
-                for card in cards:
-                    try:
-                        parsed = ScryfallAPI.parse_card_data(card)
-                        card_name = parsed.get("name", "")
-                        if card_name not in seen_cards:
-                            seen_cards.add(card_name)
-                            parsed_cards.append(parsed)
-                    except:
-                        pass
-                
-                self.set_cards = parsed_cards
+            if engine is not None:
                 self.current_set = selected_set['name']
-                self.rating_engine = CardRatingEngine(parsed_cards)
-                self.selected_cards = []
-                self.all_card_list = parsed_cards
-                self.current_card_ratings = {}
-                self.deck_listbox.delete(0, tk.END)
+                self.rating_engine = engine
+                self.set_cards = self.rating_engine.all_cards
+                if deck_names is not None:
+                    self.deck = self.rating_engine.new_deck(deck_names)
+                # Keep the cards picked while the set was streaming in
+                elif self.deck is None or self.deck.engine is not engine:
+                    self.deck = self.rating_engine.new_deck()
+                self.all_card_list = self.set_cards
+                # Show the deck-independent pick order until the first card is picked
+                if not self.deck:
+                    self.current_card_ratings = self.rating_engine.pick_order().rating_map()
                 self._update_deck_display()
                 self._update_card_list()
+                if deck_names is not None:
+                    self._update_stats()
                 
-                self.set_status_var.set(f"✓ Loaded {len(parsed_cards)} cards from {self.current_set}")
-                self.card_info_var.set(f"{len(parsed_cards)} cards available")
+                self.set_status_var.set(f"✓ Loaded {len(self.set_cards)} cards from {self.current_set}")
+                self.card_info_var.set(f"{len(self.set_cards)} cards available")
             else:
                 messagebox.showerror("Error", f"Could not load cards for {selected_set['code']}")
                 self.set_status_var.set("Failed to load set")
@@ -330,7 +352,7 @@ class MTGDraftRaterGUI:
             messagebox.showwarning("Warning", "Please enter a card name")
             return
         
-        if len(self.selected_cards) >= 40:
+        if len(self.deck) >= 40:
             messagebox.showwarning("Warning", "Deck is full (40 cards)")
             return
         
@@ -339,8 +361,8 @@ class MTGDraftRaterGUI:
         
         if card_name.lower() in card_lookup:
             actual_name = card_lookup[card_name.lower()]
-            if actual_name not in self.selected_cards:
-                self.selected_cards.append(actual_name)
+            if actual_name not in self.deck:
+                self.deck.add(actual_name)
                 self.card_entry_var.set("")
                 self._update_deck_display()
                 self._update_stats()
@@ -352,8 +374,8 @@ class MTGDraftRaterGUI:
                        if card_name.lower() in card["name"].lower()]
             
             if len(matching) == 1:
-                if matching[0] not in self.selected_cards:
-                    self.selected_cards.append(matching[0])
+                if matching[0] not in self.deck:
+                    self.deck.add(matching[0])
                     self.card_entry_var.set("")
                     self._update_deck_display()
                     self._update_stats()
@@ -376,8 +398,8 @@ class MTGDraftRaterGUI:
                 def select_card():
                     if listbox.curselection():
                         card = matching[listbox.curselection()[0]]
-                        if card not in self.selected_cards:
-                            self.selected_cards.append(card)
+                        if card not in self.deck:
+                            self.deck.add(card)
                             self.card_entry_var.set("")
                             self._update_deck_display()
                             self._update_stats()
@@ -392,24 +414,25 @@ class MTGDraftRaterGUI:
         selection = self.deck_listbox.curselection()
         if selection:
             idx = selection[0]
-            self.selected_cards.pop(idx)
+            self.deck.pop(idx)
             self._update_deck_display()
             self._update_stats()
     
     def _clear_deck(self):
         """Clear entire deck"""
-        if messagebox.askyesno("Confirm", "Clear all cards from deck?"):
-            self.selected_cards = []
+        if self.deck and messagebox.askyesno("Confirm", "Clear all cards from deck?"):
+            self.deck.clear()
             self._update_deck_display()
             self._update_stats()
     
     def _update_deck_display(self):
         """Update deck listbox display"""
         self.deck_listbox.delete(0, tk.END)
-        for i, card in enumerate(self.selected_cards, 1):
+        names = self.deck.names if self.deck else []
+        for i, card in enumerate(names, 1):
             self.deck_listbox.insert(tk.END, f"{i:2}. {card}")
         
-        self.deck_size_var.set(f"Deck: {len(self.selected_cards)}/40")
+        self.deck_size_var.set(f"Deck: {len(names)}/40")
     
     def _rate_cards_clicked(self):
         """Rate cards based on current deck"""
@@ -417,25 +440,166 @@ class MTGDraftRaterGUI:
             messagebox.showwarning("Warning", "Please load a set first")
             return
         
-        if not self.selected_cards:
-            messagebox.showwarning("Warning", "Add some cards first to get recommendations")
-            return
-        
         self.card_info_var.set("Rating cards...")
         self.root.update()
         
+        card_filter = CardFilter(deck_colors=self.deck_colors_var.get(), exclude_deck=self.hide_picked_var.get(),
+                                 text=self.card_search_var.get().strip())
+        
         def rate():
-            ratings = self.rating_engine.rate_cards(self.selected_cards)
-            self.current_card_ratings = {name: rating for name, rating, _, _ in ratings}
+            if self.deck:
+                ratings = self.rating_engine.rank_cards(self.deck, card_filter=card_filter)
+            else:
+                ratings = self.rating_engine.pick_order(card_filter=card_filter)
+            self.current_card_ratings = ratings.rating_map()
             self._update_card_list()
             
             # Count top recommendations
-            top_count = len([r for r in ratings if r[1] >= 7])
+            top_count = len([r for r in ratings.ratings if r >= 7])
             self.card_info_var.set(f"✓ Ratings updated! {top_count} excellent cards found")
         
         thread = threading.Thread(target=rate, daemon=True)
         thread.start()
     
+    def _archetype_clicked(self):
+        """Show the best cards of a color archetype from the precomputed archetype table"""
+        if not self.rating_engine:
+            messagebox.showwarning("Warning", "Please load a set first")
+            return
+        
+        colors = simpledialog.askstring("Archetype", "Colors (e.g. WU, or R for mono red):")
+        if not colors:
+            return
+        table = self.rating_engine.archetype_table()
+        try:
+            best = table.best(colors.strip(), len(table))
+            signposts = table.signposts(colors.strip())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        # Off-color cards are left unrated and listed after the archetype's cards
+        self.current_card_ratings = dict(best)
+        self._update_card_list()
+        if signposts:
+            self.card_info_var.set(f"{colors.upper()} signposts: {', '.join(name for name, _ in signposts)}")
+        else:
+            self.card_info_var.set(f"✓ Showing the best {colors.upper()} cards")
+    
+    def _rate_pack_clicked(self):
+        """Rate only the cards of the current pack"""
+        if not self.rating_engine:
+            messagebox.showwarning("Warning", "Please load a set first")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Rate Pack")
+        dialog.geometry("600x500")
+        
+        ttk.Label(dialog, text="Cards in the pack (one per line):").pack(padx=10, pady=(10, 5), anchor=tk.W)
+        pack_text = scrolledtext.ScrolledText(dialog, height=8)
+        pack_text.pack(fill=tk.X, padx=10)
+        
+        results = ttk.Treeview(dialog, columns=("Rating", "Why"), height=12)
+        results.heading('#0', text='Card Name')
+        results.heading('Rating', text='Rating')
+        results.heading('Why', text='Why')
+        results.column('#0', width=180)
+        results.column('Rating', width=50, anchor='center')
+        results.column('Why', width=320)
+        
+        status_var = tk.StringVar()
+        
+        def rate():
+            names = [line.strip() for line in pack_text.get("1.0", tk.END).splitlines() if line.strip()]
+            for item in results.get_children():
+                results.delete(item)
+            rows = self.rating_engine.rate_pack(self.deck, names)
+            for name, rating, explanation, card in rows:
+                results.insert('', tk.END, text=name, values=(f"{rating:.1f}", explanation))
+            missing = len(names) - len(rows)
+            status_var.set(f"{len(rows)} cards rated" + (f", {missing} not found" if missing else ""))
+        
+        def pick():
+            selection = results.selection()
+            if not selection:
+                return
+            name = results.item(selection[0], 'text')
+            if len(self.deck) < 40 and self.deck.add(name):
+                self._update_deck_display()
+                self._update_stats()
+                dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(button_frame, text="Rate", command=rate).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Pick Selected", command=pick).pack(side=tk.LEFT, padx=2)
+        ttk.Label(button_frame, textvariable=status_var, foreground="blue").pack(side=tk.LEFT, padx=10)
+        
+        results.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        results.bind('<Double-1>', lambda e: pick())
+    
+    def _build_deck_clicked(self):
+        """Build the best decks from a sealed pool or a finished draft"""
+        if not self.rating_engine:
+            messagebox.showwarning("Warning", "Please load a set first")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Build Deck")
+        dialog.geometry("600x600")
+        
+        ttk.Label(dialog, text="Card pool (one per line, e.g. '2 Card Name'):").pack(padx=10, pady=(10, 5), anchor=tk.W)
+        pool_text = scrolledtext.ScrolledText(dialog, height=8)
+        pool_text.pack(fill=tk.X, padx=10)
+        pool_text.insert(tk.END, "\n".join(self.deck.names))
+        
+        results = ttk.Treeview(dialog, columns=("Quality", "Lands"), height=16)
+        results.heading('#0', text='Build')
+        results.heading('Quality', text='Quality')
+        results.heading('Lands', text='Lands')
+        results.column('#0', width=250)
+        results.column('Quality', width=60, anchor='center')
+        results.column('Lands', width=220)
+        
+        status_var = tk.StringVar()
+        builds = []
+        
+        def build():
+            pool_names = parse_pool(pool_text.get("1.0", tk.END).splitlines())
+            status_var.set(f"Building from {len(pool_names)} cards...")
+            dialog.update()
+            builds[:] = DeckBuilder(self.rating_engine).build(pool_names)
+            for item in results.get_children():
+                results.delete(item)
+            for n, deck_build in enumerate(builds):
+                splash = f" splashing {deck_build['splash']}" if deck_build["splash"] else ""
+                lands = ", ".join(f"{count} {land}" for land, count in deck_build["lands"].items())
+                parent = results.insert('', tk.END, iid=str(n), text=f"{deck_build['colors']}{splash}",
+                                        values=(f"{deck_build['quality']:.1f}", lands), open=(n == 0))
+                for name in deck_build["spells"]:
+                    results.insert(parent, tk.END, text=name, values=("", ""))
+            status_var.set(f"{len(builds)} builds")
+        
+        def use():
+            selection = results.selection()
+            if not selection:
+                return
+            item = selection[0]
+            index = int(results.parent(item) or item)
+            self.deck = self.rating_engine.new_deck(builds[index]["spells"])
+            self._update_deck_display()
+            self._update_stats()
+            dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(button_frame, text="Build", command=build).pack(side=tk.LEFT, padx=2)
+        ttk.Button(button_frame, text="Use Selected Build", command=use).pack(side=tk.LEFT, padx=2)
+        ttk.Label(button_frame, textvariable=status_var, foreground="blue").pack(side=tk.LEFT, padx=10)
+        
+        results.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+    
     def _update_card_list(self, *args):
         """Update card list display with search and ratings"""
         search_term = self.card_search_var.get().lower()
@@ -465,8 +629,8 @@ class MTGDraftRaterGUI:
         else:
             filtered_cards = self.all_card_list
         
-        # Sort: rated cards first, then by name
-        filtered_cards.sort(key=lambda c: (-self.current_card_ratings.get(c.get("name", ""), -1), c.get("name", "")))
+        # Sort: rated cards first, then by name (sorted copy - the engine's card order must not change)
+        filtered_cards = sorted(filtered_cards, key=lambda c: (-self.current_card_ratings.get(c.get("name", ""), -1), c.get("name", "")))
         
         # Add to tree with minimal processing
         for card in filtered_cards:
@@ -512,12 +676,15 @@ class MTGDraftRaterGUI:
         item = selection[0]
         card_name = self.card_tree.item(item, 'text')
         
-        if len(self.selected_cards) >= 40:
+        if self.deck is None:
+            return
+        
+        if len(self.deck) >= 40:
             messagebox.showwarning("Warning", "Deck is full (40 cards)")
             return
         
-        if card_name not in self.selected_cards:
-            self.selected_cards.append(card_name)
+        if card_name not in self.deck:
+            self.deck.add(card_name)
             self._update_deck_display()
             self._update_stats()
         else:
@@ -525,22 +692,20 @@ class MTGDraftRaterGUI:
     
     def _update_stats(self):
         """Update deck statistics"""
-        if not self.rating_engine or not self.selected_cards:
+        if not self.rating_engine or not self.deck:
             self.stats_text.config(state=tk.NORMAL)
             self.stats_text.delete(1.0, tk.END)
             self.stats_text.config(state=tk.DISABLED)
             return
         
-        deck_cards = self.rating_engine._parse_selected_cards(self.selected_cards)
-        if not deck_cards:
-            return
-        
-        analysis = self.rating_engine._analyze_deck(deck_cards)
+        # Deck analysis is maintained incrementally as cards are added/removed
+        analysis = self.deck.analysis
         
         stats = f"Deck Size: {analysis['count']}/40  |  "
         stats += f"Creatures: {analysis['creatures']} ({analysis['creatures']*100//max(1, analysis['count'])}%)  |  "
         stats += f"Spells: {analysis['spells']}  |  "
         stats += f"Avg CMC: {analysis['avg_cmc']:.2f}  |  "
+        stats += f"Quality: {self.rating_engine.deck_quality(self.deck):.1f}  |  "
         
         if analysis['color_identity']:
             colors = ', '.join(sorted(list(analysis['color_identity'])))
@@ -556,7 +721,7 @@ class MTGDraftRaterGUI:
     
     def _save_deck(self):
         """Save the current deck"""
-        if not self.selected_cards:
+        if not self.deck:
             messagebox.showwarning("Warning", "No deck to save")
             return
         
@@ -571,7 +736,7 @@ class MTGDraftRaterGUI:
             
             deck_data = {
                 "set": self.current_set,
-                "cards": self.selected_cards,
+                "cards": self.deck.names,
                 "date": datetime.now().isoformat()
             }
             
@@ -625,18 +790,8 @@ class MTGDraftRaterGUI:
                     
                     if matching_set:
                         self.set_combo_var.set(f"{matching_set['name']} ({matching_set['code']})")
-                        self._load_set_clicked()
-                        
-                        # Schedule card loading after set loads
-                        def load_cards():
-                            import time
-                            time.sleep(1)  # Wait for set to load
-                            self.selected_cards = deck_data.get("cards", [])
-                            self._update_deck_display()
-                            self._update_stats()
-                        
-                        thread = threading.Thread(target=load_cards, daemon=True)
-                        thread.start()
+                        # The deck is built once the set has finished loading
+                        self._load_set_clicked(deck_names=deck_data.get("cards", []))
                         
                         messagebox.showinfo("Success", "Deck loaded!")
                     else:
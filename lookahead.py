@@ -0,0 +1,189 @@
+"""
+Two-ply "what-if" lookahead for pick recommendations
+"""
+import time
+import heapq
+import multiprocessing
+from typing import List, Dict, Optional, Union
+
+import config
+from card_rating_engine import CardRatingEngine
+from deck_state import DeckState
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional - heap selection is used without it
+    np = None
+
+# Per-process evaluator set up once by _init_worker, so tasks only carry names
+_evaluator = None
+
+
+class _Evaluator:
+    """
+    Measures the follow-up options of a deck: the mean unclamped score of
+    the best remaining set cards (one row per card name, cards already in
+    the deck excluded). Clamped ratings would hide the difference once
+    the best remaining cards all rate 10.
+    """
+
+    def __init__(self, engine: CardRatingEngine):
+        self.engine = engine
+        first_rows = engine.first_rows()
+        self.names = list(first_rows)
+        self.position = {name: pos for pos, name in enumerate(self.names)}
+        self.rows = list(first_rows.values())
+        if engine.columnar:
+            self.rows = np.array(self.rows, dtype=np.intp)
+
+    def totals(self, state: DeckState):
+        """Unclamped scores per unique card name; scores come from the engine's delta path"""
+        totals = self.engine.score_rows(state)["totals"]
+        if self.engine.columnar:
+            return totals[self.rows]
+        return [totals[row] for row in self.rows]
+
+    def taken(self, state: DeckState) -> List[int]:
+        """Positions of the deck's card names"""
+        return [self.position[card["name"]] for card in state.cards if card["name"] in self.position]
+
+    def follow_up(self, totals, taken: List[int], follow_ups: int) -> float:
+        """Mean of the follow_ups best totals, skipping the taken positions"""
+        if self.engine.columnar:
+            values = totals.copy()
+            values[taken] = -np.inf
+            count = min(follow_ups, len(values) - len(set(taken)))
+            if count <= 0:
+                return 0.0
+            return float(np.partition(values, -count)[-count:].mean())
+        taken = set(taken)
+        best = heapq.nlargest(follow_ups, (value for pos, value in enumerate(totals) if pos not in taken))
+        return sum(best) / len(best) if best else 0.0
+
+    def evaluate(self, state: DeckState, candidates: List[str], follow_ups: int,
+                 deadline: Optional[float] = None) -> Dict[str, float]:
+        """
+        Change in follow-up quality from picking each candidate, in order,
+        until the deadline (time.time()) passes. Each pick is simulated on a
+        copy-on-write copy of the deck and undone again, so every what-if
+        deck is one card away from a cached one and rescored incrementally.
+        """
+        taken = self.taken(state)
+        base = self.follow_up(self.totals(state), taken, follow_ups)
+        what_if = state.copy()
+        deltas = {}
+        for name in candidates:
+            if deadline is not None and time.time() >= deadline:
+                break
+            card = what_if.add(name)
+            if card is None:
+                continue
+            picked = taken + [self.position[card["name"]]]
+            deltas[name] = self.follow_up(self.totals(what_if), picked, follow_ups) - base
+            what_if.pop()
+        return deltas
+
+
+def _init_worker(set_cards):
+    """Build an engine once per worker process"""
+    global _evaluator
+    _evaluator = _Evaluator(CardRatingEngine(set_cards))
+
+
+def _evaluate_chunk(task) -> Dict[str, float]:
+    deck_names, candidates, follow_ups, deadline = task
+    return _evaluator.evaluate(_evaluator.engine.new_deck(deck_names), candidates, follow_ups, deadline)
+
+
+class LookaheadRater:
+    """
+    Re-rates the top candidates of a deck by simulating each pick and
+    measuring how the best remaining cards change, so picks that open up
+    good follow-ups move up. Candidates can be spread across a process
+    pool; a time budget makes the search anytime.
+    """
+
+    def __init__(self, engine: CardRatingEngine, processes: Optional[int] = 1):
+        """processes > 1 (or None for one per core) evaluates candidates in a process pool"""
+        self.engine = engine
+        self._evaluator = _Evaluator(engine)
+        self.pool = None
+        if processes != 1:
+            # Set cards go to each worker once, through the initializer
+            self.processes = processes or multiprocessing.cpu_count()
+            self.pool = multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                             initargs=(engine.all_cards,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def rate(self, selected_cards: Union[List[str], DeckState], top_k: Optional[int] = None,
+             follow_ups: Optional[int] = None, time_budget: Optional[float] = None) -> List[tuple]:
+        """
+        Two-ply ratings for the top_k candidates (distinct names, one-ply
+        rating order). A candidate's rating is its one-ply score plus
+        RATING_WEIGHTS["lookahead_follow_up"] times the change in the mean
+        of the follow_ups best remaining cards after picking it.
+        Evaluated candidates are ordered by their unclamped two-ply score.
+        When time_budget seconds run out, the candidates evaluated so far
+        come first, followed by the rest with their one-ply ratings.
+        Returns list of tuples: (card_name, rating, explanation, card)
+        """
+        engine = self.engine
+        top_k = config.LOOKAHEAD_CANDIDATES if top_k is None else top_k
+        follow_ups = config.LOOKAHEAD_FOLLOW_UPS if follow_ups is None else follow_ups
+        if time_budget is None:
+            time_budget = config.LOOKAHEAD_TIME_BUDGET
+        deadline = time.time() + time_budget if time_budget else None
+
+        state = selected_cards if isinstance(selected_cards, DeckState) else engine.new_deck(selected_cards)
+        scored = engine.score_rows(state)
+        totals, ratings = scored["totals"], scored["ratings"]
+        # Ties (e.g. at 10) broken by the unclamped score
+        rows = sorted(self._evaluator.rows, key=lambda i: (-ratings[i], -totals[i]))[:top_k]
+        candidates = [engine.all_cards[i]["name"] for i in rows]
+
+        if self.pool is None:
+            deltas = self._evaluator.evaluate(state, candidates, follow_ups, deadline)
+        else:
+            deltas = self._evaluate_parallel(state.names, candidates, follow_ups, deadline)
+
+        weight = engine.weights.lookahead_follow_up
+        evaluated, pending = [], []
+        for i, name in zip(rows, candidates):
+            card = engine.all_cards[i]
+            explanation = scored["explain"](i)
+            if name not in deltas:
+                pending.append((name, ratings[i], explanation, card))
+                continue
+            bonus = weight * deltas[name]
+            score = float(totals[i]) + bonus
+            rating = round(max(1.0, min(10.0, score)), 1)
+            if bonus >= 0.05:
+                explanation += f", better follow-ups ({bonus:+.1f})"
+            elif bonus <= -0.05:
+                explanation += f", weaker follow-ups ({bonus:+.1f})"
+            evaluated.append((score, (name, rating, explanation, card)))
+
+        # Unclamped order, so candidates rated 10 are still told apart
+        evaluated.sort(key=lambda pair: -pair[0])
+        return [row for _, row in evaluated] + pending
+
+    def _evaluate_parallel(self, deck_names: List[str], candidates: List[str], follow_ups: int,
+                           deadline: Optional[float]) -> Dict[str, float]:
+        """Deal candidates round-robin to the workers, so each starts on the strongest ones"""
+        tasks = [(deck_names, candidates[start::self.processes], follow_ups, deadline)
+                 for start in range(min(self.processes, len(candidates)))]
+        deltas = {}
+        results = self.pool.imap_unordered(_evaluate_chunk, tasks)
+        for _ in tasks:
+            try:
+                # Workers stop at the deadline themselves; allow a moment to report back
+                timeout = None if deadline is None else max(0.0, deadline - time.time()) + 0.1
+                deltas.update(results.next(timeout))
+            except multiprocessing.TimeoutError:
+                break
+        return deltas
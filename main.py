@@ -3,10 +3,19 @@ Main MTG Draft Deck Rating Application
 """
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from colorama import Fore, Style, init
 from scryfall_api import ScryfallAPI
 from card_rating_engine import CardRatingEngine
+from set_pipeline import stream_set
+from set_cache import set_cache_path, load_set_cache
+from card_store import open_card_store
+from card_filter import CardFilter
+from lookahead import LookaheadRater
+from deck_builder import DeckBuilder, parse_pool
+from archetypes import archetype_cache_path
+from synergy_matrix import synergy_cache_path
+from ranking import Ranking
 
 # Initialize colorama for colored terminal output
 init(autoreset=True)
@@ -16,10 +25,13 @@ class MTGDraftRater:
     
     def __init__(self):
         self.current_set = None
+        self.current_set_code = None
         self.set_cards = []
         self.rating_engine = None
-        self.selected_cards = []
+        self.deck = None
         self.cache_dir = "cache"
+        # Memory-mapped store of every cached set, opened (or rebuilt) on first set load
+        self.card_store = None
         
         # Create cache directory if it doesn't exist
         if not os.path.exists(self.cache_dir):
@@ -34,12 +46,14 @@ class MTGDraftRater:
             print("1. Select a set to draft from")
             print("2. Add/update selected cards")
             print("3. Rate remaining cards")
-            print("4. View deck statistics")
-            print("5. Save deck")
-            print("6. Load deck")
-            print("7. Exit")
+            print("4. Rate a pack")
+            print("5. View deck statistics")
+            print("6. Save deck")
+            print("7. Load deck")
+            print("8. Build a deck from a pool")
+            print("9. Exit")
             
-            choice = input("\nEnter your choice (1-7): ").strip()
+            choice = input("\nEnter your choice (1-9): ").strip()
             
             if choice == "1":
                 self._select_set()
@@ -48,12 +62,16 @@ class MTGDraftRater:
             elif choice == "3":
                 self._rate_cards()
             elif choice == "4":
-                self._view_statistics()
+                self._rate_pack()
             elif choice == "5":
-                self._save_deck()
+                self._view_statistics()
             elif choice == "6":
-                self._load_deck()
+                self._save_deck()
             elif choice == "7":
+                self._load_deck()
+            elif choice == "8":
+                self._build_deck()
+            elif choice == "9":
                 print(f"\n{Fore.GREEN}Thanks for using MTG Draft Rater!{Style.RESET_ALL}")
                 break
             else:
@@ -73,7 +91,7 @@ class MTGDraftRater:
     
     def _select_set(self):
         """Select a MTG set to draft from"""
-        print(f"\n{Fore.CYAN}Fetching available MTG sets...{Style.RESET_ALL}")
+        print(f"\n{Fore.CYAN}Loading available MTG sets...{Style.RESET_ALL}")
         
         sets = ScryfallAPI.get_set_codes()
         if not sets:
@@ -119,52 +137,55 @@ class MTGDraftRater:
         """Load cards from a selected set"""
         set_code = set_info['code']
         
-        # Check cache first
-        cache_file = os.path.join(self.cache_dir, f"{set_code}.json")
-        if os.path.exists(cache_file):
+        # Check the card store first, then the set's own cache (JSON caches
+        # of earlier versions are converted)
+        cache_file = set_cache_path(self.cache_dir, set_code)
+        if self.card_store is None:
+            self.card_store = open_card_store(self.cache_dir)
+        cards = self.card_store.open_set(set_code) if self.card_store else None
+        if cards is None:
+            cards = load_set_cache(cache_file)
+        if cards is not None:
             print(f"{Fore.CYAN}Loading {set_info['name']} from cache...{Style.RESET_ALL}")
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cards_data = json.load(f)
-                    self.set_cards = cards_data
-            except Exception as e:
-                print(f"{Fore.YELLOW}Cache load failed: {e}. Fetching from Scryfall...{Style.RESET_ALL}")
-                self._fetch_set(set_code, set_info, cache_file)
+            engine = CardRatingEngine(cards)
         else:
-            self._fetch_set(set_code, set_info, cache_file)
+            engine = self._fetch_set(set_code, set_info, cache_file)
+            if engine is None:
+                # Offline: a cache written by an older parser beats no cards at all
+                cards = load_set_cache(cache_file, check_parser=False)
+                if cards is None:
+                    return
+                print(f"{Fore.YELLOW}Using cached {set_info['name']} cards from an older version.{Style.RESET_ALL}")
+                engine = CardRatingEngine(cards)
         
         # Initialize rating engine
         self.current_set = set_info['name']
-        self.rating_engine = CardRatingEngine(self.set_cards)
-        self.selected_cards = []
+        self.current_set_code = set_code
+        self.rating_engine = engine
+        self.set_cards = self.rating_engine.all_cards  # compact Card records
+        self.deck = self.rating_engine.new_deck()
+        # The synergy matrix and per-archetype ratings are kept next to the set cache
+        self.rating_engine.load_synergy_matrix(synergy_cache_path(cache_file))
+        self.rating_engine.load_archetypes(archetype_cache_path(cache_file))
         
         print(f"\n{Fore.GREEN}✓ Loaded {len(self.set_cards)} cards from {self.current_set}{Style.RESET_ALL}")
         print(f"Ready to build your deck! Start by adding cards.")
     
-    def _fetch_set(self, set_code: str, set_info: Dict[str, str], cache_file: str):
-        """Fetch set from Scryfall and cache it"""
+    def _fetch_set(self, set_code: str, set_info: Dict[str, str], cache_file: str) -> Optional[CardRatingEngine]:
+        """Stream a set from Scryfall into a rating engine, caching it page by page"""
         print(f"{Fore.CYAN}Fetching {set_info['name']} cards from Scryfall...{Style.RESET_ALL}")
         
-        raw_cards = ScryfallAPI.get_set_cards(set_code)
-        if not raw_cards:
-            print(f"{Fore.RED}Error: Could not fetch cards for {set_code}{Style.RESET_ALL}")
-            return
+        def report(card, e):
+            print(f"{Fore.YELLOW}Warning: Could not parse card {card.get('name', 'Unknown')}: {e}{Style.RESET_ALL}")
         
-        # Parse cards
-        self.set_cards = []
-        for card in raw_cards:
-            try:
-                parsed = ScryfallAPI.parse_card_data(card)
-                self.set_cards.append(parsed)
-            except Exception as e:
-                print(f"{Fore.YELLOW}Warning: Could not parse card {card.get('name', 'Unknown')}: {e}{Style.RESET_ALL}")
+        def progress(engine, cards):
+            print(f"  {len(engine.all_cards)} cards received")
         
-        # Cache the data
-        try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.set_cards, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"{Fore.YELLOW}Warning: Could not cache set data: {e}{Style.RESET_ALL}")
+        # Each page is parsed and indexed as it arrives
+        engine = stream_set(set_code, cache_file=cache_file, on_page=progress, on_error=report)
+        if engine is None:
+            print(f"{Fore.RED}Error: Could not fetch cards for {set_code}{Style.RESET_ALL}")
+        return engine
     
     def _add_cards(self):
         """Add cards to the deck"""
@@ -172,9 +193,9 @@ class MTGDraftRater:
             print(f"{Fore.RED}Please select a set first.{Style.RESET_ALL}")
             return
         
-        print(f"\n{Fore.CYAN}Currently selected cards ({len(self.selected_cards)}/40):{Style.RESET_ALL}")
-        if self.selected_cards:
-            for i, card_name in enumerate(self.selected_cards, 1):
+        print(f"\n{Fore.CYAN}Currently selected cards ({len(self.deck)}/40):{Style.RESET_ALL}")
+        if self.deck:
+            for i, card_name in enumerate(self.deck.names, 1):
                 print(f"  {i:2}. {card_name}")
         else:
             print("  (none)")
@@ -191,14 +212,14 @@ class MTGDraftRater:
             if user_input.lower() == "done":
                 break
             elif user_input.lower() == "clear":
-                self.selected_cards = []
+                self.deck.clear()
                 print(f"{Fore.GREEN}Deck cleared.{Style.RESET_ALL}")
             elif user_input.lower().startswith("remove"):
                 try:
                     idx = int(user_input.split()[1]) - 1
-                    if 0 <= idx < len(self.selected_cards):
-                        removed = self.selected_cards.pop(idx)
-                        print(f"{Fore.GREEN}✓ Removed {removed}{Style.RESET_ALL}")
+                    if 0 <= idx < len(self.deck):
+                        removed = self.deck.pop(idx)
+                        print(f"{Fore.GREEN}✓ Removed {removed['name']}{Style.RESET_ALL}")
                 except (ValueError, IndexError):
                     print(f"{Fore.RED}Invalid command.{Style.RESET_ALL}")
             elif user_input.lower() == "add":
@@ -208,7 +229,7 @@ class MTGDraftRater:
     
     def _add_single_card(self):
         """Add a single card to the deck"""
-        if len(self.selected_cards) >= 40:
+        if len(self.deck) >= 40:
             print(f"{Fore.YELLOW}Deck is full (40 cards).{Style.RESET_ALL}")
             return
         
@@ -217,23 +238,25 @@ class MTGDraftRater:
             return
         
         # Fuzzy match the card
-        card_lookup = {card["name"].lower(): card["name"] for card in self.set_cards}
+        # Names only, so no card records are built for the lookup
+        set_names = self.rating_engine.card_names
+        card_lookup = {name.lower(): name for name in set_names}
         
         if card_name.lower() in card_lookup:
             actual_name = card_lookup[card_name.lower()]
-            if actual_name not in self.selected_cards:
-                self.selected_cards.append(actual_name)
+            if actual_name not in self.deck:
+                self.deck.add(actual_name)
                 print(f"{Fore.GREEN}✓ Added {actual_name}{Style.RESET_ALL}")
             else:
                 print(f"{Fore.YELLOW}This card is already in your deck.{Style.RESET_ALL}")
         else:
             # Try fuzzy matching
-            matching = [card["name"] for card in self.set_cards 
-                       if card_name.lower() in card["name"].lower()]
+            matching = [name for name in set_names 
+                       if card_name.lower() in name.lower()]
             
             if len(matching) == 1:
-                if matching[0] not in self.selected_cards:
-                    self.selected_cards.append(matching[0])
+                if matching[0] not in self.deck:
+                    self.deck.add(matching[0])
                     print(f"{Fore.GREEN}✓ Added {matching[0]}{Style.RESET_ALL}")
                 else:
                     print(f"{Fore.YELLOW}This card is already in your deck.{Style.RESET_ALL}")
@@ -246,8 +269,8 @@ class MTGDraftRater:
                     choice = int(input("Select card (number): "))
                     if 1 <= choice <= len(matching):
                         card = matching[choice - 1]
-                        if card not in self.selected_cards:
-                            self.selected_cards.append(card)
+                        if card not in self.deck:
+                            self.deck.add(card)
                             print(f"{Fore.GREEN}✓ Added {card}{Style.RESET_ALL}")
                         else:
                             print(f"{Fore.YELLOW}This card is already in your deck.{Style.RESET_ALL}")
@@ -262,13 +285,13 @@ class MTGDraftRater:
             print(f"{Fore.RED}Please select a set first.{Style.RESET_ALL}")
             return
         
-        if not self.selected_cards:
-            print(f"{Fore.YELLOW}Add some cards first to get recommendations.{Style.RESET_ALL}")
-            return
-        
-        print(f"\n{Fore.CYAN}Analyzing your deck and rating cards...{Style.RESET_ALL}")
-        
-        ratings = self.rating_engine.rate_cards(self.selected_cards)
+        if not self.deck:
+            # Nothing picked yet - the deck-independent pick order is precomputed
+            print(f"\n{Fore.CYAN}Your deck is empty - showing the set's pick order.{Style.RESET_ALL}")
+            ratings = self.rating_engine.pick_order(page_size=20)
+        else:
+            print(f"\n{Fore.CYAN}Analyzing your deck and rating cards...{Style.RESET_ALL}")
+            ratings = self.rating_engine.rank_cards(self.deck, page_size=20)
         
         if not ratings:
             print(f"{Fore.RED}Error: Could not rate cards.{Style.RESET_ALL}")
@@ -277,7 +300,7 @@ class MTGDraftRater:
         # Display top rated cards
         print(f"\n{Fore.YELLOW}Top 20 recommendations for your deck:{Style.RESET_ALL}\n")
         
-        for rank, (name, rating, explanation, card) in enumerate(ratings[:20], 1):
+        for rank, (name, rating, explanation, card) in enumerate(ratings.next_page(), 1):
             color_code = self._get_rating_color(rating)
             mana_str = card.get("mana_cost", "").replace("{", "[").replace("}", "]") or "0"
             cmc = card.get("cmc", 0)
@@ -289,27 +312,62 @@ class MTGDraftRater:
         
         # Interactive browsing
         while True:
-            print(f"\n{Fore.CYAN}Options: 'add N' (add card N), 'more' (show more), 'details N' (see card details), 'done'{Style.RESET_ALL}")
+            print(f"\n{Fore.CYAN}Options: 'add N' (add card N), 'more' (show more), 'details N' (see card details), "
+                  f"'filter SPEC' (e.g. filter deck-colors cmc<=3 type=creature new), "
+                  f"'lookahead' (re-rate the top picks by their follow-ups), "
+                  f"'archetype XX' (best cards for colors XX, e.g. archetype wu), 'done'{Style.RESET_ALL}")
             user_input = input("Command: ").strip().lower()
             
             if user_input == "done":
                 break
             elif user_input == "more":
-                print(f"\n{Fore.YELLOW}Next 20 recommendations:{Style.RESET_ALL}\n")
-                for rank, (name, rating, explanation, card) in enumerate(ratings[20:40], 21):
-                    color_code = self._get_rating_color(rating)
-                    mana_str = card.get("mana_cost", "").replace("{", "[").replace("}", "]") or "0"
-                    print(f"{Fore.LIGHTBLACK_EX}{rank:2}.{Style.RESET_ALL} {color_code}{rating:4.1f}/10{Style.RESET_ALL} "
-                          f"{name:25} {mana_str:15}")
-                    print(f"      {Fore.LIGHTBLACK_EX}→ {explanation}{Style.RESET_ALL}")
+                first_rank = ratings.position + 1
+                page = ratings.next_page()
+                if not page:
+                    print(f"{Fore.YELLOW}No more cards to show.{Style.RESET_ALL}")
+                    continue
+                print(f"\n{Fore.YELLOW}Next {len(page)} recommendations:{Style.RESET_ALL}\n")
+                self._print_ratings(page, first_rank)
+            elif user_input.startswith("filter"):
+                # Only the cards passing the filter are scored
+                try:
+                    card_filter = CardFilter.parse(user_input[len("filter"):])
+                except ValueError as e:
+                    print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+                    continue
+                if self.deck:
+                    ratings = self.rating_engine.rank_cards(self.deck, page_size=20, card_filter=card_filter)
+                else:
+                    ratings = self.rating_engine.pick_order(page_size=20, card_filter=card_filter)
+                page = ratings.next_page()
+                if not page:
+                    print(f"{Fore.YELLOW}No cards match that filter.{Style.RESET_ALL}")
+                    continue
+                print(f"\n{Fore.YELLOW}{len(ratings)} matching cards:{Style.RESET_ALL}\n")
+                self._print_ratings(page, 1)
+            elif user_input == "lookahead":
+                # Simulates each of the top picks; stops at LOOKAHEAD_TIME_BUDGET
+                rows = LookaheadRater(self.rating_engine).rate(self.deck)
+                ratings = Ranking([row[3] for row in rows], [row[1] for row in rows],
+                                  lambda i: rows[i][2], page_size=20)
+                print(f"\n{Fore.YELLOW}Top picks with lookahead:{Style.RESET_ALL}\n")
+                self._print_ratings(ratings.next_page(), 1)
+            elif user_input.startswith("archetype"):
+                try:
+                    ratings = self._archetype_ratings(user_input[len("archetype"):].strip())
+                except ValueError as e:
+                    print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+                    continue
+                print(f"\n{Fore.YELLOW}Best cards for the archetype:{Style.RESET_ALL}\n")
+                self._print_ratings(ratings.next_page(), 1)
             elif user_input.startswith("add"):
                 try:
                     idx = int(user_input.split()[1]) - 1
                     if 0 <= idx < len(ratings):
-                        card_name = ratings[idx][0]
-                        if card_name not in self.selected_cards and len(self.selected_cards) < 40:
-                            self.selected_cards.append(card_name)
-                            print(f"{Fore.GREEN}✓ Added {card_name}. Deck: {len(self.selected_cards)}/40{Style.RESET_ALL}")
+                        card_name, _, _, card = ratings[idx]
+                        if card_name not in self.deck and len(self.deck) < 40:
+                            self.deck.add(card)
+                            print(f"{Fore.GREEN}✓ Added {card_name}. Deck: {len(self.deck)}/40{Style.RESET_ALL}")
                         else:
                             print(f"{Fore.YELLOW}Card already in deck or deck is full.{Style.RESET_ALL}")
                 except (ValueError, IndexError):
@@ -324,6 +382,105 @@ class MTGDraftRater:
             else:
                 print(f"{Fore.RED}Unknown command.{Style.RESET_ALL}")
     
+    def _archetype_ratings(self, colors: str) -> Ranking:
+        """The best on-color cards of an archetype (signposts marked), from the precomputed table"""
+        table = self.rating_engine.archetype_table()
+        colors = "".join(sorted(colors.upper(), key="WUBRG".find))
+        signposts = {name for name, _ in table.signposts(colors)}
+        rows = [(name, rating, f"{'Signpost' if name in signposts else 'Best card'} of {colors}")
+                for name, rating in table.best(colors, len(table))]
+        cards = [self.rating_engine.resolve_card(name) for name, _, _ in rows]
+        return Ranking(cards, [row[1] for row in rows], lambda i: rows[i][2], page_size=20)
+    
+    def _print_ratings(self, rows: List[tuple], first_rank: int):
+        """Print rating rows numbered from first_rank"""
+        for rank, (name, rating, explanation, card) in enumerate(rows, first_rank):
+            color_code = self._get_rating_color(rating)
+            mana_str = card.get("mana_cost", "").replace("{", "[").replace("}", "]") or "0"
+            print(f"{Fore.LIGHTBLACK_EX}{rank:2}.{Style.RESET_ALL} {color_code}{rating:4.1f}/10{Style.RESET_ALL} "
+                  f"{name:25} {mana_str:15}")
+            print(f"      {Fore.LIGHTBLACK_EX}→ {explanation}{Style.RESET_ALL}")
+    
+    def _rate_pack(self):
+        """Rate only the cards in the pack in front of you"""
+        if not self.rating_engine:
+            print(f"{Fore.RED}Please select a set first.{Style.RESET_ALL}")
+            return
+        
+        print(f"\n{Fore.CYAN}Enter the cards in the pack, one per line (blank line to finish):{Style.RESET_ALL}")
+        pack_names = []
+        while True:
+            line = input("  > ").strip()
+            if not line:
+                break
+            pack_names.append(line)
+        if not pack_names:
+            return
+        
+        rows = self.rating_engine.rate_pack(self.deck, pack_names)
+        if len(rows) < len(pack_names):
+            print(f"{Fore.YELLOW}{len(pack_names) - len(rows)} card(s) could not be matched.{Style.RESET_ALL}")
+        if not rows:
+            return
+        
+        print(f"\n{Fore.YELLOW}Pack ratings for your deck:{Style.RESET_ALL}\n")
+        self._print_ratings(rows, 1)
+        
+        user_input = input(f"\n{Fore.CYAN}Enter N to pick card N, or press Enter to skip: {Style.RESET_ALL}").strip()
+        if not user_input:
+            return
+        try:
+            name, _, _, card = rows[int(user_input) - 1]
+        except (ValueError, IndexError):
+            print(f"{Fore.RED}Invalid selection.{Style.RESET_ALL}")
+            return
+        if len(self.deck) < 40:
+            self.deck.add(card)
+            print(f"{Fore.GREEN}✓ Picked {name}. Deck: {len(self.deck)}/40{Style.RESET_ALL}")
+        else:
+            print(f"{Fore.YELLOW}Deck is full (40 cards).{Style.RESET_ALL}")
+    
+    def _build_deck(self):
+        """Build the best decks from a sealed pool or a finished draft"""
+        if not self.rating_engine:
+            print(f"{Fore.RED}Please select a set first.{Style.RESET_ALL}")
+            return
+        
+        path = input("Pool file (one card per line, e.g. '2 Card Name'; Enter to use your picks): ").strip()
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    pool_names = parse_pool(f.readlines())
+            except OSError as e:
+                print(f"{Fore.RED}Error reading pool: {e}{Style.RESET_ALL}")
+                return
+        else:
+            pool_names = self.deck.names
+        if not pool_names:
+            print(f"{Fore.YELLOW}The pool is empty.{Style.RESET_ALL}")
+            return
+        
+        print(f"{Fore.YELLOW}Building decks from {len(pool_names)} cards...{Style.RESET_ALL}")
+        builds = DeckBuilder(self.rating_engine).build(pool_names)
+        for n, build in enumerate(builds, 1):
+            splash = f" splashing {build['splash']}" if build["splash"] else ""
+            lands = ", ".join(f"{count} {land}" for land, count in build["lands"].items())
+            print(f"\n{Fore.CYAN}{n}. {build['colors']}{splash}{Style.RESET_ALL} - quality {build['quality']:.1f} - "
+                  f"{len(build['spells'])} spells + {lands}")
+            for name in build["spells"]:
+                print(f"     {name}")
+        
+        user_input = input(f"\n{Fore.CYAN}Enter N to use build N as your deck, or press Enter to skip: {Style.RESET_ALL}").strip()
+        if not user_input:
+            return
+        try:
+            build = builds[int(user_input) - 1]
+        except (ValueError, IndexError):
+            print(f"{Fore.RED}Invalid selection.{Style.RESET_ALL}")
+            return
+        self.deck = self.rating_engine.new_deck(build["spells"])
+        print(f"{Fore.GREEN}✓ Deck replaced with build {user_input} ({len(self.deck)} spells).{Style.RESET_ALL}")
+    
     def _show_card_details(self, card: Dict[str, Any]):
         """Display detailed card information"""
         print(f"\n{Fore.CYAN}{'=' * 60}{Style.RESET_ALL}")
@@ -345,17 +502,12 @@ class MTGDraftRater:
     
     def _view_statistics(self):
         """Display deck statistics"""
-        if not self.selected_cards or not self.rating_engine:
+        if not self.deck or not self.rating_engine:
             print(f"{Fore.RED}No deck to analyze.{Style.RESET_ALL}")
             return
         
-        # Get deck analysis
-        deck_cards = self.rating_engine._parse_selected_cards(self.selected_cards)
-        if not deck_cards:
-            print(f"{Fore.RED}Could not analyze deck.{Style.RESET_ALL}")
-            return
-        
-        analysis = self.rating_engine._analyze_deck(deck_cards)
+        # Deck analysis is maintained incrementally as cards are added/removed
+        analysis = self.deck.analysis
         
         print(f"\n{Fore.CYAN}{'=' * 60}")
         print(f"DECK STATISTICS - {self.current_set}")
@@ -365,6 +517,7 @@ class MTGDraftRater:
         print(f"Creatures: {Fore.YELLOW}{analysis['creatures']}{Style.RESET_ALL} ({analysis['creatures']*100//max(1, analysis['count'])}%)")
         print(f"Spells: {Fore.YELLOW}{analysis['spells']}{Style.RESET_ALL}")
         print(f"Average CMC: {Fore.YELLOW}{analysis['avg_cmc']:.2f}{Style.RESET_ALL}")
+        print(f"Deck Quality: {Fore.YELLOW}{self.rating_engine.deck_quality(self.deck):.1f}{Style.RESET_ALL}")
         
         print(f"\n{Fore.CYAN}Mana Curve:{Style.RESET_ALL}")
         for cmc in range(7):
@@ -386,7 +539,7 @@ class MTGDraftRater:
     
     def _save_deck(self):
         """Save the current deck to a file"""
-        if not self.selected_cards:
+        if not self.deck:
             print(f"{Fore.YELLOW}No deck to save.{Style.RESET_ALL}")
             return
         
@@ -398,7 +551,8 @@ class MTGDraftRater:
         
         deck_data = {
             "set": self.current_set,
-            "cards": self.selected_cards
+            "set_code": self.current_set_code,
+            "cards": self.deck.names
         }
         
         try:
@@ -433,14 +587,19 @@ class MTGDraftRater:
                 set_name = deck_data.get("set")
                 print(f"{Fore.CYAN}Loading {set_name}...{Style.RESET_ALL}")
                 
-                # Fetch set if needed
-                sets = ScryfallAPI.get_set_codes()
-                matching_set = next((s for s in sets if s['name'] == set_name), None)
+                # Decks saved with their set code need no catalog lookup
+                if deck_data.get("set_code"):
+                    matching_set = {"code": deck_data["set_code"], "name": set_name}
+                else:
+                    sets = ScryfallAPI.get_set_codes()
+                    matching_set = next((s for s in sets if s['name'] == set_name), None)
                 
                 if matching_set:
                     self._load_set(matching_set)
-                    self.selected_cards = deck_data.get("cards", [])
-                    print(f"{Fore.GREEN}✓ Deck loaded: {len(self.selected_cards)} cards{Style.RESET_ALL}")
+                    if self.current_set_code != matching_set['code']:
+                        return
+                    self.deck = self.rating_engine.new_deck(deck_data.get("cards", []))
+                    print(f"{Fore.GREEN}✓ Deck loaded: {len(self.deck)} cards{Style.RESET_ALL}")
                 else:
                     print(f"{Fore.RED}Could not find set {set_name}.{Style.RESET_ALL}")
         except (ValueError, json.JSONDecodeError):
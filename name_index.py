@@ -0,0 +1,169 @@
+"""
+Indexed fuzzy matching of card names
+"""
+from typing import List, Dict, Iterable, Optional
+from collections import Counter, defaultdict
+import math
+
+import config
+
+
+class CardNameIndex:
+    """
+    Trigram index over (lowercase) card names, built once per engine.
+    Substring and edit-distance lookups only verify the names the index
+    cannot rule out, using a bounded Levenshtein distance that stops as
+    soon as the limit is exceeded.
+    """
+
+    def __init__(self, names: Iterable[str], max_distance: int = config.MAX_MATCH_DISTANCE,
+                 min_substring_match: float = config.MIN_SUBSTRING_MATCH):
+        """
+        names are indexed in iteration order, which is also the order used
+        to break ties between equally good matches.
+        """
+        self.max_distance = max_distance
+        self.min_substring_match = min_substring_match
+        self.names = []
+        self._ids = {}
+        self._by_length = defaultdict(list)
+        self._postings = defaultdict(list)
+        self.add(names)
+
+    def add(self, names: Iterable[str]):
+        """Index more names (already indexed ones are skipped), e.g. as a set streams in"""
+        for name in names:
+            if name in self._ids:
+                continue
+            name_id = len(self.names)
+            self.names.append(name)
+            self._ids[name] = name_id
+            self._by_length[len(name)].append(name_id)
+            for gram, count in _trigrams(name).items():
+                self._postings[gram].append((name_id, count))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def match(self, query: str) -> Optional[str]:
+        """
+        Best indexed name for a query: an exact match, else the first name
+        that contains (or is contained in) the query and covers at least
+        MIN_SUBSTRING_MATCH of the longer string, else the closest name
+        within MAX_MATCH_DISTANCE edits.
+        """
+        query = query.strip().lower()
+        if query in self._ids:
+            return query
+
+        name_id = self._substring_match(query)
+        if name_id is None:
+            name_id = self._edit_distance_match(query)
+        return self.names[name_id] if name_id is not None else None
+
+    def match_many(self, queries: Iterable[str]) -> List[Optional[str]]:
+        """Resolve a whole list of queries, matching each distinct query once"""
+        resolved = {}
+        results = []
+        for query in queries:
+            if query not in resolved:
+                resolved[query] = self.match(query)
+            results.append(resolved[query])
+        return results
+
+    def _substring_match(self, query: str) -> Optional[int]:
+        """Lowest id whose name contains, or is contained in, the query"""
+        ratio = self.min_substring_match
+        if not query or ratio <= 0:
+            return None
+        best = None
+
+        # Names containing the query: every query trigram must occur in them
+        longest = int(len(query) / ratio + 1e-9)
+        for name_id in self._candidates_containing(query, longest):
+            if best is not None and name_id >= best:
+                continue
+            if query in self.names[name_id]:
+                best = name_id
+
+        # Names contained in the query are substrings of it
+        shortest = max(1, math.ceil(ratio * len(query) - 1e-9))
+        for length in range(shortest, len(query)):
+            for start in range(len(query) - length + 1):
+                name_id = self._ids.get(query[start:start + length])
+                if name_id is not None and (best is None or name_id < best):
+                    best = name_id
+        return best
+
+    def _candidates_containing(self, query: str, longest: int) -> Iterable[int]:
+        """Ids of names no longer than longest that may contain the query"""
+        grams = [query[i:i + 3] for i in range(len(query) - 2)]
+        if not grams:
+            return [name_id for length in range(len(query), longest + 1)
+                    for name_id in self._by_length.get(length, [])]
+
+        candidates = None
+        for gram in set(grams):
+            ids = {name_id for name_id, _ in self._postings.get(gram, [])}
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        return [name_id for name_id in candidates if len(self.names[name_id]) <= longest]
+
+    def _edit_distance_match(self, query: str) -> Optional[int]:
+        """Lowest id among the names closest to the query within max_distance edits"""
+        limit = self.max_distance
+        if limit < 0:
+            return None
+
+        # q-gram lemma: each edit destroys at most 3 of the padded trigrams
+        shared = Counter()
+        for gram, count in _trigrams(query).items():
+            for name_id, name_count in self._postings.get(gram, []):
+                shared[name_id] += min(count, name_count)
+
+        best, best_distance = None, limit + 1
+        for length in range(max(0, len(query) - limit), len(query) + limit + 1):
+            required = max(length, len(query)) + 2 - 3 * limit
+            for name_id in self._by_length.get(length, []):
+                if required > 0 and shared[name_id] < required:
+                    continue
+                distance = bounded_levenshtein(query, self.names[name_id], best_distance)
+                if distance < best_distance or (distance == best_distance and best is not None
+                                                 and name_id < best):
+                    best, best_distance = name_id, distance
+        return best if best_distance <= limit else None
+
+
+def bounded_levenshtein(s1: str, s2: str, limit: int) -> int:
+    """
+    Levenshtein distance between two strings, or limit + 1 as soon as the
+    distance is known to exceed limit.
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if len(s1) - len(s2) > limit:
+        return limit + 1
+    if not s2:
+        return len(s1)
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        row_min = i + 1
+        for j, c2 in enumerate(s2):
+            cost = min(previous_row[j + 1] + 1, current_row[j] + 1, previous_row[j] + (c1 != c2))
+            current_row.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return limit + 1
+        previous_row = current_row
+
+    return min(previous_row[-1], limit + 1)
+
+
+def _trigrams(text: str) -> Dict[str, int]:
+    """Trigram counts of a string padded with two spaces on each side"""
+    padded = f"  {text}  "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
@@ -0,0 +1,125 @@
+"""
+Lazily paged card rankings produced by the card rating engine
+"""
+from typing import List, Dict, Any, Callable, Optional, Sequence
+import heapq
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional - heap selection is used without it
+    np = None
+
+
+class Ranking:
+    """
+    Cards of a set ordered by rating, materialized one page at a time.
+    Only the rows that are actually requested are selected from the scores
+    and get their explanation string built. Order matches a stable
+    descending sort by rating, as returned by CardRatingEngine.rate_cards.
+    """
+
+    def __init__(self, cards: Sequence[Dict[str, Any]], ratings: List[float],
+                 explain: Callable[[int], str], page_size: int = 20,
+                 names: Optional[Sequence[str]] = None):
+        """
+        cards and ratings are parallel sequences; explain(i) builds the
+        explanation for the card at index i. names, when given, are the
+        card names in the same order, so rating_map needs no card records.
+        """
+        self.cards = cards
+        self.names = names
+        self.ratings = ratings
+        self.page_size = page_size
+        self._explain = explain
+        self._order = []
+        self._rows = {}
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def __getitem__(self, rank: int) -> tuple:
+        """Row at a 0-based rank: (card_name, rating, explanation, card)"""
+        if rank < 0:
+            rank += len(self)
+        if not 0 <= rank < len(self):
+            raise IndexError("ranking index out of range")
+        self._select(rank + 1)
+        return self._row(self._order[rank])
+
+    def __iter__(self):
+        for rank in range(len(self)):
+            yield self[rank]
+
+    def top(self, count: int) -> List[tuple]:
+        """The highest rated rows"""
+        return self.rows(0, count)
+
+    def rows(self, start: int, stop: int) -> List[tuple]:
+        """Rows for ranks start..stop-1"""
+        stop = min(stop, len(self))
+        self._select(stop)
+        return [self._row(i) for i in self._order[start:stop]]
+
+    def page(self, number: int) -> List[tuple]:
+        """Rows of a 0-based page"""
+        return self.rows(number * self.page_size, (number + 1) * self.page_size)
+
+    def next_page(self) -> List[tuple]:
+        """Rows following the last page returned by next_page"""
+        start = self._cursor
+        self._cursor = min(start + self.page_size, len(self))
+        return self.rows(start, self._cursor)
+
+    @property
+    def position(self) -> int:
+        """Number of rows handed out by next_page so far"""
+        return self._cursor
+
+    def rating_map(self) -> Dict[str, float]:
+        """Rating for every card name, without building explanations"""
+        if self.names is not None:
+            return dict(zip(self.names, self.ratings))
+        return {card["name"]: rating for card, rating in zip(self.cards, self.ratings)}
+
+    def _row(self, index: int) -> tuple:
+        """Build (and remember) the display row for a card index"""
+        row = self._rows.get(index)
+        if row is None:
+            card = self.cards[index]
+            row = (card["name"], self.ratings[index], self._explain(index), card)
+            self._rows[index] = row
+        return row
+
+    def _select(self, count: int):
+        """Make sure the first count ranks are ordered"""
+        total = len(self.ratings)
+        count = min(count, total)
+        if count <= len(self._order):
+            return
+
+        # Grow geometrically so paging through stays linear overall
+        count = min(total, max(count, 2 * len(self._order)))
+        if count == total:
+            self._order = _stable_order(self.ratings)
+        elif np is not None:
+            self._order = _partial_order_numpy(self.ratings, count)
+        else:
+            ratings = self.ratings
+            self._order = heapq.nsmallest(count, range(total), key=lambda i: (-ratings[i], i))
+
+
+def _stable_order(ratings: Sequence[float]) -> List[int]:
+    """Indices sorted by descending rating, ties in index order"""
+    if np is not None:
+        return np.argsort(-np.asarray(ratings), kind="stable").tolist()
+    return sorted(range(len(ratings)), key=lambda i: -ratings[i])
+
+
+def _partial_order_numpy(ratings: Sequence[float], count: int) -> List[int]:
+    """First count indices of _stable_order without sorting the whole set"""
+    keys = -np.asarray(ratings)
+    threshold = np.partition(keys, count - 1)[count - 1]
+    candidates = np.flatnonzero(keys <= threshold)
+    ranked = candidates[np.argsort(keys[candidates], kind="stable")]
+    return ranked[:count].tolist()
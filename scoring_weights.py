@@ -0,0 +1,121 @@
+"""
+Scoring constants compiled from config.py for the card rating engine
+"""
+import hashlib
+import importlib
+import os
+
+import config
+
+# Values used when a key is missing from config.RATING_WEIGHTS
+DEFAULT_RATING_WEIGHTS = {
+    "mana_curve_perfect_fit": 2.0,
+    "mana_curve_good_fit": 1.0,
+    "mana_curve_exact_fit": 0.0,
+    "mana_curve_crowded": -1.5,
+    "color_perfect_fit": 1.5,
+    "color_good_fit": 0.0,
+    "color_open": 0.3,
+    "color_conflict": -2.0,
+    "color_off_colors": -1.5,
+    "colorless_bonus": 0.5,
+    "creature_needed": 1.5,
+    "spell_needed": 1.5,
+    "balance_neutral": 0.5,
+    "balance_penalty": -1.0,
+    "spell_penalty": -0.5,
+    "removal_spell": 1.5,
+    "card_draw": 1.0,
+    "protection_spell": 0.5,
+    "great_value": 1.5,
+    "good_value": 0.5,
+    "poor_value": -1.0,
+    "evasive_creature": 0.5,
+    "keyword_synergy": 1.0,
+    "creature_type_synergy": 0.5,
+    "theme_synergy": 0.5,
+    "pair_synergy": 0.0,
+    "deck_completion": 0.5,
+    "lookahead_follow_up": 0.5,
+    "archetype_pick_blend": 0.0,
+    "quality_power": 1.0,
+    "quality_synergy": 1.0,
+    "quality_curve": -0.5,
+    "quality_off_color": -1.0,
+    "quality_creature_balance": -0.5,
+}
+
+
+class ScoringWeights:
+    """
+    Flat snapshot of the scoring settings in config.py.
+    Built once per engine (and again when the config changes), so scoring
+    only does attribute lookups instead of reading nested config dicts.
+    """
+
+    def __init__(self):
+        weights = dict(DEFAULT_RATING_WEIGHTS)
+        weights.update(config.RATING_WEIGHTS)
+        for key, value in weights.items():
+            setattr(self, key, float(value))
+
+        # Ideal card count per cmc bin 0-6
+        self.ideal_curve = tuple(float(config.IDEAL_MANA_CURVE.get(cmc_bin, 1.5)) for cmc_bin in range(7))
+        self.curve_tolerance = config.MANA_CURVE_TOLERANCE
+        self.creature_ratio = config.TARGET_CREATURE_RATIO
+        self.creature_ratio_tolerance = config.CREATURE_RATIO_TOLERANCE
+        self.type_theme_threshold = config.CREATURE_TYPE_SYNERGY_THRESHOLD
+        self.synergy_keywords = tuple(config.SYNERGY_KEYWORDS.items())
+        self.synergy_pairings = tuple(tuple(pair) for pair in config.SYNERGY_PAIRINGS)
+        self.rarity = dict(config.RARITY_WEIGHTS)
+
+    @staticmethod
+    def settings() -> tuple:
+        """The config values that affect scoring, for change detection"""
+        return (
+            config.RATING_WEIGHTS,
+            config.IDEAL_MANA_CURVE,
+            config.MANA_CURVE_TOLERANCE,
+            config.TARGET_CREATURE_RATIO,
+            config.CREATURE_RATIO_TOLERANCE,
+            config.SYNERGY_KEYWORDS,
+            config.SYNERGY_PAIRINGS,
+            config.RARITY_WEIGHTS,
+            config.CREATURE_TYPE_SYNERGY_THRESHOLD,
+        )
+
+
+def settings_fingerprint() -> str:
+    """Stable digest of the scoring settings, for tables persisted across runs"""
+    return hashlib.sha1(repr(ScoringWeights.settings()).encode("utf-8")).hexdigest()
+
+
+def _config_mtime():
+    """Modification time of config.py, or None if it cannot be read"""
+    try:
+        return os.stat(config.__file__).st_mtime_ns
+    except OSError:
+        return None
+
+
+_loaded_mtime = _config_mtime()
+
+
+def reload_config_if_changed() -> bool:
+    """
+    Re-import config.py when the file changed on disk since it was loaded.
+    Returns True if the module was reloaded.
+    """
+    global _loaded_mtime
+    mtime = _config_mtime()
+    if mtime is None or mtime == _loaded_mtime:
+        return False
+
+    _loaded_mtime = mtime
+    try:
+        importlib.reload(config)
+    except Exception as e:
+        # Keep the previous settings if the edited file does not load
+        print(f"Warning: could not reload config.py: {e}")
+        return False
+    return True
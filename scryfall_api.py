@@ -2,64 +2,252 @@
 MTG Set data fetcher using the Scryfall API
 """
 import requests
-from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterator, Optional
 import json
+import hashlib
+import os
+import re
+import threading
+import time
+
+import config
+
+# Serializes request starts across fetch threads (see _throttle)
+_request_lock = threading.Lock()
+_next_request = 0.0
+
+
+def _throttle():
+    """Wait until config.SCRYFALL_REQUEST_INTERVAL has passed since the previous request started"""
+    global _next_request
+    with _request_lock:
+        now = time.monotonic()
+        start = max(now, _next_request)
+        _next_request = start + config.SCRYFALL_REQUEST_INTERVAL
+    if start > now:
+        time.sleep(start - now)
+
+# Guards the on-disk set catalog and its background revalidation (see ScryfallAPI.get_set_codes)
+_catalog_lock = threading.Lock()
+_catalog_refresh = None
+
+
+def set_catalog_path() -> str:
+    """On-disk copy of the /sets catalog"""
+    return os.path.join(config.CACHE_DIRECTORY, "sets.json")
+
+
+def _catalog_stale(catalog: Dict[str, Any]) -> bool:
+    """Whether a cached catalog is older than config.CACHE_EXPIRATION (0 = never expires)"""
+    return bool(config.CACHE_EXPIRATION) and time.time() - catalog.get("fetched", 0) >= config.CACHE_EXPIRATION
+
 
 class ScryfallAPI:
     """Interface with Scryfall API to fetch MTG data"""
     
     BASE_URL = "https://api.scryfall.com"
     
+    # Shared keep-alive session, created on first use
+    _session = None
+    _session_lock = threading.Lock()
+    
+    @staticmethod
+    def session() -> requests.Session:
+        """Pooled keep-alive session shared by all requests, sized for the page fetch workers"""
+        with ScryfallAPI._session_lock:
+            if ScryfallAPI._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, config.SCRYFALL_FETCH_WORKERS))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept": "application/json", "User-Agent": "MTGDraftRater/1.0"})
+                ScryfallAPI._session = session
+            return ScryfallAPI._session
+    
+    @staticmethod
+    def _get(url: str, params: Optional[Dict[str, Any]] = None,
+             headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET through the shared session, respecting the request interval; raises on an error status"""
+        _throttle()
+        response = ScryfallAPI.session().get(url, params=params, headers=headers, timeout=config.SCRYFALL_TIMEOUT)
+        response.raise_for_status()
+        return response
+    
+    @staticmethod
+    def _get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """GET a JSON document through the shared session, respecting the request interval"""
+        return ScryfallAPI._get(url, params).json()
+    
     @staticmethod
-    def get_set_codes() -> List[Dict[str, str]]:
-        """Fetch all available MTG sets"""
+    def get_set_codes(refresh: bool = False, wait: bool = False) -> List[Dict[str, str]]:
+        """
+        Fetch all available MTG sets, served from the on-disk catalog
+        (set_catalog_path()) when there is one. A catalog older than
+        config.CACHE_EXPIRATION is still returned at once and revalidated
+        in the background with a conditional request (ETag /
+        Last-Modified), so only the first call ever waits on the network.
+        wait=True revalidates a stale catalog before returning and
+        refresh=True revalidates it regardless of age. When Scryfall
+        cannot be reached the cached catalog is used as it is.
+        """
+        catalog = ScryfallAPI._read_catalog()
+        if catalog is None or refresh or (wait and _catalog_stale(catalog)):
+            catalog = ScryfallAPI._revalidate_catalog(catalog)
+        elif _catalog_stale(catalog):
+            ScryfallAPI._revalidate_catalog_async(catalog)
+        return catalog["sets"] if catalog else []
+    
+    @staticmethod
+    def _read_catalog() -> Optional[Dict[str, Any]]:
+        """The cached catalog, or None if it is missing or unreadable"""
         try:
-            response = requests.get(f"{ScryfallAPI.BASE_URL}/sets")
-            response.raise_for_status()
-            sets_data = response.json()
-            
-            # Return list of sets with code and name
-            return [{"code": s["code"].upper(), "name": s["name"]} for s in sets_data["data"]]
-        except requests.RequestException as e:
-            print(f"Error fetching sets: {e}")
-            return []
+            with open(set_catalog_path(), 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+            if isinstance(catalog.get("sets"), list):
+                return catalog
+        except (OSError, ValueError, AttributeError):
+            pass
+        return None
     
     @staticmethod
-    def get_set_cards(set_code: str) -> List[Dict[str, Any]]:
-        """Fetch all cards from a specific set"""
-        cards = []
-        page = 1
-        
+    def _revalidate_catalog(catalog: Optional[Dict[str, Any]], quiet: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the /sets catalog, conditionally if there is a cached one, and
+        store it. Returns the new or still-valid catalog, or the cached one
+        (possibly None) if the request fails.
+        """
+        headers = {}
+        if catalog and catalog.get("etag"):
+            headers["If-None-Match"] = catalog["etag"]
+        if catalog and catalog.get("last_modified"):
+            headers["If-Modified-Since"] = catalog["last_modified"]
         try:
-            while True:
-                url = f"{ScryfallAPI.BASE_URL}/cards/search"
-                params = {
-                    "q": f"set:{set_code.lower()}",
-                    "page": page,
-                    "unique": "prints"  # Get only one print version of each card
+            response = ScryfallAPI._get(f"{ScryfallAPI.BASE_URL}/sets", headers=headers)
+            if catalog and response.status_code == 304:
+                catalog = dict(catalog, fetched=time.time())
+            else:
+                sets_data = response.json()
+                catalog = {
+                    "fetched": time.time(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    # Return list of sets with code and name
+                    "sets": [{"code": s["code"].upper(), "name": s["name"]} for s in sets_data["data"]],
                 }
-                
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                if "data" in data:
-                    cards.extend(data["data"])
-                
-                # Check if there are more pages
-                if not data.get("has_more", False):
-                    break
-                
-                page += 1
-                
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            if not quiet:
+                print(f"Error fetching sets: {e}")
+            return catalog
+        
+        try:
+            with _catalog_lock:
+                path = set_catalog_path()
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path + ".part", 'w', encoding='utf-8') as f:
+                    json.dump(catalog, f, ensure_ascii=False)
+                os.replace(path + ".part", path)
+        except OSError as e:
+            if not quiet:
+                print(f"Warning: could not cache set catalog: {e}")
+        return catalog
+    
+    @staticmethod
+    def _revalidate_catalog_async(catalog: Dict[str, Any]) -> threading.Thread:
+        """Revalidate a stale catalog on a background thread (one at a time)"""
+        global _catalog_refresh
+        with _catalog_lock:
+            if _catalog_refresh is None or not _catalog_refresh.is_alive():
+                _catalog_refresh = threading.Thread(target=ScryfallAPI._revalidate_catalog,
+                                                    args=(catalog, True), daemon=True)
+                _catalog_refresh.start()
+            return _catalog_refresh
+    
+    @staticmethod
+    def get_set_cards(set_code: str, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch all cards from a specific set, in search page order (see
+        iter_set_pages). On an error the cards of the pages before the
+        failing one are returned.
+        """
+        cards = []
+        try:
+            for page in ScryfallAPI.iter_set_pages(set_code, workers):
+                cards.extend(page)
         except requests.RequestException as e:
             print(f"Error fetching cards for set {set_code}: {e}")
         
         return cards
     
     @staticmethod
-    def parse_card_data(card: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract relevant card data for analysis"""
+    def iter_set_pages(set_code: str, workers: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield the raw cards of each search page of a set, in page order, as
+        soon as that page has arrived; the response documents are not kept.
+        Once the first page reports total_cards, the remaining pages are
+        fetched concurrently by up to `workers` threads (default
+        config.SCRYFALL_FETCH_WORKERS; 1 fetches one page at a time), still
+        spaced by SCRYFALL_REQUEST_INTERVAL. Raises requests.RequestException
+        on the first page that fails.
+        """
+        workers = config.SCRYFALL_FETCH_WORKERS if workers is None else workers
+        url = f"{ScryfallAPI.BASE_URL}/cards/search"
+        
+        def fetch(page: int) -> tuple:
+            params = {
+                "q": f"set:{set_code.lower()}",
+                "page": page,
+                "unique": "prints"  # Get only one print version of each card
+            }
+            data = ScryfallAPI._get_json(url, params)
+            return data.get("data", []), data.get("has_more", False), data.get("total_cards")
+        
+        page = 1
+        cards, has_more, total = fetch(page)
+        page_size = len(cards)
+        yield cards
+        
+        if has_more and workers > 1 and total and page_size > 0:
+            pages = list(range(2, -(-total // page_size) + 1))
+            if pages:
+                with ThreadPoolExecutor(max_workers=min(workers, len(pages))) as executor:
+                    # map yields pages in order; a failed page raises when reached
+                    for page, (cards, has_more, _) in zip(pages, executor.map(fetch, pages)):
+                        yield cards
+        
+        # Sequential mode, and any pages beyond the reported total
+        while has_more:
+            page += 1
+            cards, has_more, _ = fetch(page)
+            yield cards
+    
+    @staticmethod
+    def parse_cards(cards: List[Dict[str, Any]],
+                    on_error: Optional[Callable[[Dict[str, Any], Exception], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Parse a whole page of raw cards.
+        Keywords for the page are extracted in one batch. Cards that fail to
+        parse are skipped and reported through on_error(card, exception).
+        """
+        texts = [(card.get("oracle_text") or "").lower() for card in cards]
+        keywords = keyword_matcher().find_many(texts)
+        
+        parsed = []
+        for card, card_keywords in zip(cards, keywords):
+            try:
+                parsed.append(ScryfallAPI.parse_card_data(card, card_keywords))
+            except Exception as e:
+                if on_error:
+                    on_error(card, e)
+        return parsed
+    
+    @staticmethod
+    def parse_card_data(card: Dict[str, Any], keywords: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Extract relevant card data for analysis.
+        keywords may be passed in when they were already extracted in a batch.
+        """
         
         # Parse mana cost
         mana_cost = card.get("mana_cost", "")
@@ -107,26 +295,117 @@ class ScryfallAPI:
             "color_identity": color_identity,
             "rarity": rarity,
             "oracle_text_lower": oracle_text,
-            "keywords": extract_keywords(oracle_text),
+            "keywords": keywords if keywords is not None else extract_keywords(oracle_text),
             "image_url": card.get("image_uris", {}).get("normal", "") if card.get("image_uris") else "",
             "scryfall_uri": card.get("scryfall_uri", "")
         }
 
+class KeywordMatcher:
+    """
+    Finds every tracked keyword occurring in a text in a single regex pass.
+    The vocabulary is compiled once into a trie-shaped alternation that
+    matches the longest keyword at a position; shorter keywords contained in
+    a match, and keywords overlapping its end, are resolved from tables
+    precomputed over the vocabulary. Results are identical to testing
+    `keyword in text` for each keyword, in vocabulary order.
+    """
+    
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(dict.fromkeys(kw.lower() for kw in keywords if kw))
+        self._ids = {kw: i for i, kw in enumerate(self.keywords)}
+        self._pattern = re.compile(_trie_pattern(self.keywords))
+        
+        # Keywords found inside each keyword (including itself)
+        self._contained = {kw: [self._ids[other] for other in self.keywords if other in kw]
+                           for kw in self.keywords}
+        # Offsets in each keyword where another keyword could start and run past its end
+        self._overlaps = {}
+        for kw in self.keywords:
+            offsets = [i for i in range(1, len(kw))
+                       if any(other.startswith(kw[i:]) and len(other) > len(kw) - i
+                              for other in self.keywords)]
+            if offsets:
+                self._overlaps[kw] = offsets
+    
+    def find(self, text: str) -> List[str]:
+        """Tracked keywords occurring in a (lowercase) text"""
+        if not text:
+            return []
+        
+        found = set()
+        pending = []
+        for match in self._pattern.finditer(text):
+            self._collect(match, found, pending)
+        
+        checked = set()
+        while pending:
+            pos = pending.pop()
+            if pos in checked:
+                continue
+            checked.add(pos)
+            match = self._pattern.match(text, pos)
+            if match:
+                self._collect(match, found, pending)
+        
+        return [self.keywords[kw_id] for kw_id in sorted(found)]
+    
+    def find_many(self, texts: List[str]) -> List[List[str]]:
+        """Keywords for a batch of texts; repeated texts (reprints, tokens) are matched once"""
+        results = {}
+        for text in texts:
+            if text not in results:
+                results[text] = self.find(text)
+        return [list(results[text]) for text in texts]
+    
+    def _collect(self, match, found: set, pending: list):
+        keyword = match.group()
+        found.update(self._contained[keyword])
+        for offset in self._overlaps.get(keyword, ()):
+            pending.append(match.start() + offset)
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex alternation shaped like a prefix trie, preferring the longest word"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + pattern + ")?" if "" in node else pattern
+    
+    return build(trie) or "(?!)"
+
+
+# Keyword vocabulary is driven by config.TRACKED_KEYWORDS; the matcher for
+# the current vocabulary is built on first use and after a config reload
+_keyword_matcher = (None, None)
+
+
+def keyword_matcher() -> KeywordMatcher:
+    """Matcher for the keywords currently in config.TRACKED_KEYWORDS"""
+    global _keyword_matcher
+    keywords = tuple(config.TRACKED_KEYWORDS)
+    if _keyword_matcher[0] != keywords:
+        _keyword_matcher = (keywords, KeywordMatcher(keywords))
+    return _keyword_matcher[1]
+
+
 def extract_keywords(oracle_text: str) -> List[str]:
     """Extract relevant keywords from oracle text"""
-    keywords = []
-    common_keywords = [
-        "flying", "lifelink", "vigilance", "haste", "deathtouch", "double strike",
-        "trample", "shroud", "indestructible", "regenerate", "menace", "hexproof",
-        "flash", "prowess", "drain", "ramp", "tutor", "draw", "discard",
-        "mill", "etb", "enter the battlefield", "sacrifice", "token", "scry",
-        "surveil", "adapt", "mutate", "kicker", "spell mastery", "aftermath",
-        "flashback", "madness", "delve", "revolt", "enrage", "proliferate",
-        "graveyard", "recurring", "protection", "evasion", "bounce", "counterspell"
-    ]
-    
-    for keyword in common_keywords:
-        if keyword in oracle_text:
-            keywords.append(keyword)
-    
-    return keywords
+    return keyword_matcher().find(oracle_text)
+
+
+# Bump when parse_card_data's output changes, so set caches written by an older parser are refetched
+PARSER_VERSION = 1
+
+
+def parser_checksum() -> bytes:
+    """SHA-1 of what parsed cards depend on: PARSER_VERSION and the tracked keyword vocabulary"""
+    return hashlib.sha1(repr((PARSER_VERSION, tuple(config.TRACKED_KEYWORDS))).encode("utf-8")).digest()
@@ -0,0 +1,131 @@
+"""
+Local stand-in for the Scryfall API serving canned pages, for offline tests
+and benchmarks
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+def canned_cards(count: int, set_code: str = "tst") -> List[Dict[str, Any]]:
+    """Raw Scryfall-style card objects"""
+    return [{
+        "name": f"Stub Card {i}",
+        "set": set_code,
+        "type_line": "Creature — Human Soldier" if i % 2 else "Instant",
+        "oracle_text": "Flying" if i % 3 == 0 else "Draw a card.",
+        "mana_cost": "{1}{W}",
+        "cmc": 2.0,
+        "power": "2" if i % 2 else None,
+        "toughness": "2" if i % 2 else None,
+        "colors": ["W"],
+        "color_identity": ["W"],
+        "rarity": "common",
+    } for i in range(count)]
+
+
+class StubScryfall:
+    """
+    Serves /sets and /cards/search pages from memory on a local port, with
+    a configurable delay per response. Keeps HTTP/1.1 connections alive and
+    records every request, so tests can check page order, connection reuse
+    and request spacing. /sets carries an ETag and Last-Modified and
+    answers matching conditional requests with 304 Not Modified. Use as a
+    context manager; point ScryfallAPI.BASE_URL at url.
+    """
+
+    def __init__(self, cards: List[Dict[str, Any]], page_size: int = 175, latency: float = 0.0,
+                 sets: Optional[List[Dict[str, str]]] = None, fail_page: Optional[int] = None):
+        self.cards = cards
+        self.page_size = page_size
+        self.latency = latency
+        self.sets = sets if sets is not None else [{"code": "tst", "name": "Stub Set"}]
+        self.fail_page = fail_page
+        self.sets_etag = '"sets-1"'
+        self.sets_last_modified = "Mon, 05 Oct 2026 12:00:00 GMT"
+        # (time.monotonic(), path, page, client address) per request
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        """Distinct client connections seen"""
+        return len({address for _, _, _, address in self.requests})
+
+    def __enter__(self) -> "StubScryfall":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        page = int(query.get("page", ["1"])[0])
+        with self._lock:
+            self.requests.append((time.monotonic(), url.path, page, handler.client_address))
+        time.sleep(self.latency)
+
+        if url.path == "/sets":
+            if (handler.headers.get("If-None-Match") == self.sets_etag
+                    or handler.headers.get("If-Modified-Since") == self.sets_last_modified):
+                handler.send_response(304)
+                handler.send_header("ETag", self.sets_etag)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            self._send(handler, 200, {"object": "list", "data": self.sets},
+                       {"ETag": self.sets_etag, "Last-Modified": self.sets_last_modified})
+        elif url.path == "/cards/search":
+            start = (page - 1) * self.page_size
+            if page == self.fail_page or start >= len(self.cards):
+                self._send(handler, 404, {"object": "error", "status": 404})
+                return
+            self._send(handler, 200, {
+                "object": "list",
+                "total_cards": len(self.cards),
+                "has_more": start + self.page_size < len(self.cards),
+                "data": self.cards[start:start + self.page_size],
+            })
+        else:
+            self._send(handler, 404, {"object": "error", "status": 404})
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any],
+              headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(body)
@@ -0,0 +1,234 @@
+"""
+Binary set cache: a versioned header followed by a set's cards as
+zlib-compressed columns, read straight into a CardTable
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import array
+import struct
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, Tuple
+
+import config
+
+from card_table import Card, CardTable, KEYWORDS, keyword_id
+from scryfall_api import keyword_matcher, parser_checksum
+
+MAGIC = b"MTGCARDS"
+
+# Bump when the body layout changes; files of other versions are refetched
+SET_CACHE_VERSION = 1
+
+SET_CACHE_SUFFIX = ".cards"
+
+# magic, version, source timestamp, card count, parser checksum,
+# compressed body size, body size, CRC-32 of the compressed body
+_HEADER = struct.Struct("<8sHdI20sIII")
+
+# Body prefix: string count, string table size in bytes, keyword id count
+_COUNTS = struct.Struct("<III")
+
+# Separates the strings of the string table (Scryfall text never contains it)
+_SEPARATOR = "\x00"
+
+# Card slots stored as indexes into the string table (0 is None)
+_STRING_SLOTS = ("name", "set_code", "type_line", "oracle_text", "mana_cost",
+                 "power", "toughness", "rarity", "image_url", "scryfall_uri")
+
+
+class SetCacheHeader(NamedTuple):
+    """Fixed-size header at the start of a set cache file"""
+    version: int
+    source_timestamp: float
+    card_count: int
+    parser_checksum: bytes
+
+
+class SetCacheError(ValueError):
+    """A set cache file that is not in the current format or is damaged"""
+
+
+def set_cache_path(cache_dir: str, set_code: str) -> str:
+    """Cache file of a set (cache/TLA.cards)"""
+    return os.path.join(cache_dir, f"{set_code}{SET_CACHE_SUFFIX}")
+
+
+def legacy_cache_path(path: str) -> str:
+    """JSON cache the earlier versions wrote for the same set (cache/TLA.json)"""
+    root, _ = os.path.splitext(path)
+    return root + ".json"
+
+
+def write_set_cache(path: str, cards: Iterable, source_timestamp: Optional[float] = None):
+    """
+    Write cards (Card records or parse_card_data style dicts) to a set
+    cache file. source_timestamp is when the cards were fetched from
+    Scryfall (default now). The file is written under a temporary name
+    and moved into place, so readers never see a partial file.
+    """
+    cards = [Card.from_dict(card) for card in cards]
+    strings = {None: 0}
+
+    def index(value) -> int:
+        pos = strings.get(value)
+        if pos is None:
+            pos = strings[value] = len(strings)
+        return pos
+
+    columns = [array.array("I", [index(getattr(card, slot)) for card in cards]) for slot in _STRING_SLOTS]
+    keyword_starts, keyword_strings = array.array("I", [0]), array.array("I")
+    for card in cards:
+        keyword_strings.extend(index(KEYWORDS[kw_id]) for kw_id in card.keyword_ids)
+        keyword_starts.append(len(keyword_strings))
+
+    texts = ["" if value is None else value for value in strings]
+    if any(_SEPARATOR in text for text in texts):
+        raise ValueError("card text contains a NUL character")
+    text = _SEPARATOR.join(texts).encode("utf-8")
+
+    sections = [*columns, array.array("d", [card.cmc for card in cards]), keyword_starts, keyword_strings]
+    if sys.byteorder == "big":
+        for section in sections:
+            section.byteswap()
+    body = b"".join([_COUNTS.pack(len(texts), len(text), len(keyword_strings)), text]
+                    + [section.tobytes() for section in sections]
+                    + [bytes(card.flags for card in cards),
+                       bytes(card.color_bits for card in cards),
+                       bytes(card.identity_bits for card in cards)])
+    compressed = zlib.compress(body, 9)
+    header = _HEADER.pack(MAGIC, SET_CACHE_VERSION,
+                          time.time() if source_timestamp is None else source_timestamp,
+                          len(cards), parser_checksum(), len(compressed), len(body), zlib.crc32(compressed))
+
+    temp_path = path + ".part"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(compressed)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_set_cache_header(data: bytes) -> SetCacheHeader:
+    """Check and unpack the header at the start of a set cache file"""
+    if len(data) < _HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise SetCacheError("not a set cache file")
+    _, version, timestamp, count, checksum, _, _, _ = _HEADER.unpack_from(data)
+    if version != SET_CACHE_VERSION:
+        raise SetCacheError(f"set cache version {version}, expected {SET_CACHE_VERSION}")
+    return SetCacheHeader(version, timestamp, count, checksum)
+
+
+def read_set_cache(path: str) -> Tuple[SetCacheHeader, CardTable]:
+    """
+    Header and cards of a set cache file. Raises OSError if it cannot be
+    read and SetCacheError if it is in another format or damaged.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = read_set_cache_header(data)
+    compressed_size, body_size, crc = _HEADER.unpack_from(data)[5:]
+    compressed = data[_HEADER.size:_HEADER.size + compressed_size]
+    if len(compressed) != compressed_size or zlib.crc32(compressed) != crc:
+        raise SetCacheError("set cache is truncated or damaged")
+    body = zlib.decompress(compressed)
+    if len(body) != body_size:
+        raise SetCacheError("set cache is truncated or damaged")
+    return header, CardTable(_decode_cards(memoryview(body), header.card_count))
+
+
+def _decode_cards(body: memoryview, count: int) -> List[Card]:
+    """Card records from an uncompressed body"""
+    string_count, text_size, keyword_count = _COUNTS.unpack_from(body)
+    pos = _COUNTS.size
+
+    def take(typecode: str, length: int) -> array.array:
+        nonlocal pos
+        column = array.array(typecode)
+        end = pos + length * column.itemsize
+        column.frombytes(body[pos:end])
+        if sys.byteorder == "big":
+            column.byteswap()
+        pos = end
+        return column
+
+    strings = str(body[pos:pos + text_size], "utf-8").split(_SEPARATOR)
+    pos += text_size
+    if len(strings) != string_count:
+        raise SetCacheError("set cache string table does not match its header")
+    strings[0] = None
+
+    lookup = strings.__getitem__
+    columns = {slot: list(map(lookup, take("I", count))) for slot in _STRING_SLOTS}
+    columns["cmc"] = take("d", count)
+    starts = take("I", count + 1)
+    keyword_strings = take("I", keyword_count)
+    ids = {i: keyword_id(strings[i]) for i in set(keyword_strings)}
+    columns["keyword_ids"] = [tuple(map(ids.__getitem__, keyword_strings[start:end])) if end > start else ()
+                              for start, end in zip(starts, starts[1:])]
+    for slot in ("flags", "color_bits", "identity_bits"):
+        columns[slot] = body[pos:pos + count].tolist()
+        pos += count
+    if pos != len(body):
+        raise SetCacheError("set cache body does not match its header")
+
+    return [Card.from_slots(values) for values in zip(*(columns[slot] for slot in Card.__slots__))]
+
+
+def load_set_cache(path: str, check_parser: bool = True) -> Optional[CardTable]:
+    """
+    Cards of a set from its cache file, or None if there is no usable
+    cache. A cache written by another parser version (see
+    scryfall_api.PARSER_VERSION) counts as missing unless check_parser
+    is False. When only the JSON cache of earlier versions exists it is
+    converted to the binary format, stamped with the JSON file's time;
+    its keywords are extracted again, since an older parser may have
+    tracked other ones.
+    """
+    try:
+        header, cards = read_set_cache(path)
+        if check_parser and header.parser_checksum != parser_checksum():
+            return None
+        return cards
+    except FileNotFoundError:
+        pass
+    except (OSError, SetCacheError, ValueError) as e:
+        print(f"Warning: could not read set cache {path}: {e}")
+        return None
+
+    legacy_path = legacy_cache_path(path)
+    try:
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            legacy_cards = json.load(f)
+        texts = [card.get("oracle_text_lower") or (card.get("oracle_text") or "").lower() for card in legacy_cards]
+        cards = CardTable.from_dicts(dict(card, keywords=keywords)
+                                     for card, keywords in zip(legacy_cards, keyword_matcher().find_many(texts)))
+        fetched = os.path.getmtime(legacy_path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print(f"Warning: could not read set cache {legacy_path}: {e}")
+        return None
+    try:
+        write_set_cache(path, cards, fetched)
+    except OSError as e:
+        print(f"Warning: could not convert {legacy_path}: {e}")
+    return cards
+
+
+def load_cached_set(set_code: str = "TLA") -> List[Dict[str, Any]]:
+    """
+    Parsed cards of a set from the cache directory next to this module,
+    for tools that run without fetching (benchmark.py, tune_weights.py).
+    Raises FileNotFoundError if the set has no usable cache.
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.CACHE_DIRECTORY)
+    cards = load_set_cache(set_cache_path(cache_dir, set_code))
+    if cards is None:
+        raise FileNotFoundError(f"no cached cards for set {set_code} in {cache_dir}")
+    return cards.to_dicts()
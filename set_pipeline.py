@@ -0,0 +1,56 @@
+"""
+Streaming set loader: search pages are parsed and indexed by the rating
+engine as they arrive
+"""
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+import requests
+
+from card_rating_engine import CardRatingEngine
+from scryfall_api import ScryfallAPI
+from set_cache import write_set_cache
+
+
+def stream_set(set_code: str, cache_file: Optional[str] = None,
+               on_page: Optional[Callable[[CardRatingEngine, List[Dict[str, Any]]], None]] = None,
+               on_error: Optional[Callable[[Dict[str, Any], Exception], None]] = None,
+               workers: Optional[int] = None, unique_names: bool = False) -> Optional[CardRatingEngine]:
+    """
+    Fetch a set page by page into a rating engine. Each page is parsed as
+    soon as it arrives, appended to the engine (created on the first page)
+    and then dropped, so the raw search results are never held all at
+    once. on_page(engine, parsed_cards) runs after each page, e.g. to show
+    the cards loaded so far. unique_names keeps only the first print of
+    each card name. Once every page is in, the engine's cards are written
+    to cache_file (see set_cache).
+    Returns the engine, or None if no page could be fetched. If a page
+    fails, the engine keeps the pages before it and no cache is written.
+    """
+    engine = None
+    seen = set()
+    fetched = time.time()
+    try:
+        for raw_cards in ScryfallAPI.iter_set_pages(set_code, workers):
+            cards = ScryfallAPI.parse_cards(raw_cards, on_error=on_error)
+            del raw_cards
+            if unique_names:
+                cards = [card for card in cards if not (card["name"] in seen or seen.add(card["name"]))]
+
+            if engine is None:
+                engine = CardRatingEngine(cards)
+            else:
+                engine.add_cards(cards)
+            if on_page:
+                on_page(engine, cards)
+    except requests.RequestException as e:
+        print(f"Error fetching cards for set {set_code}: {e}")
+        return engine
+
+    if cache_file and engine is not None:
+        try:
+            write_set_cache(cache_file, engine.all_cards, fetched)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not cache set data: {e}")
+    return engine
+
@@ -0,0 +1,183 @@
+"""
+Sparse card x card synergy matrix of a set
+"""
+import os
+import sys
+import json
+import array
+import base64
+import hashlib
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional - the pairs are counted row by row without it
+    np = None
+
+# Bump when the pair rules or the file layout change, so cached matrices are rebuilt
+SYNERGY_MATRIX_VERSION = 2
+
+
+def synergy_cache_path(set_cache_file: str) -> str:
+    """Synergy matrix file stored next to a set cache file (cache/TLA.json -> cache/TLA.synergy.json)"""
+    root, _ = os.path.splitext(set_cache_file)
+    return root + ".synergy.json"
+
+
+class SynergyMatrix:
+    """
+    Pairwise synergy of a set's cards (one row per card name) in CSR form.
+    Entry (i, j) counts the keywords cards i and j share, the creature
+    types two creatures share, and the configured keyword pairings
+    (config.SYNERGY_PAIRINGS) between them. The matrix is symmetric and
+    has no diagonal: a card does not pair with itself (or its copies).
+    A card's synergy with a deck is then one row of S @ deck, where the
+    deck is a vector of card counts.
+    """
+
+    def __init__(self, names: List[str], indptr: array.array, indices: array.array,
+                 data: array.array, fingerprint: str):
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.fingerprint = fingerprint
+        self.positions = {name: pos for pos, name in enumerate(names)}
+
+    @classmethod
+    def compute(cls, engine, pairings: Tuple[Tuple[str, str], ...]) -> "SynergyMatrix":
+        """Build the matrix from the engine's keyword and creature type caches"""
+        names = list(engine._name_rows)
+        keyword_members = defaultdict(list)
+        type_members = defaultdict(list)
+        for pos, name in enumerate(names):
+            for keyword in engine._keyword_cache[name]:
+                keyword_members[keyword].append(pos)
+            if engine._bucket_cache[name][2]:
+                for ctype in set(engine._creature_type_cache[name]):
+                    type_members[ctype].append(pos)
+
+        groups = list(keyword_members.values()) + list(type_members.values())
+        pairs = [(keyword_members[first], keyword_members[second]) for first, second in pairings
+                 if first in keyword_members and second in keyword_members]
+        if np is not None:
+            indptr, indices, data = _count_pairs_numpy(len(names), groups, pairs)
+        else:
+            indptr, indices, data = _count_pairs(len(names), groups, pairs)
+        return cls(names, indptr, indices, data, matrix_fingerprint(pairings, engine.card_digest()))
+
+    @classmethod
+    def load(cls, path: str, engine, pairings: Tuple[Tuple[str, str], ...]) -> Optional["SynergyMatrix"]:
+        """
+        Matrix from a cache file, or None if it is missing, unreadable, or was
+        built for other cards (names or content) or pairings.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            columns = []
+            for key, typecode in (("indptr", "i"), ("indices", "i"), ("data", "B")):
+                column = array.array(typecode)
+                column.frombytes(base64.b64decode(data[key]))
+                if data["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                columns.append(column)
+            matrix = cls(data["names"], *columns, data["fingerprint"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if (matrix.fingerprint != matrix_fingerprint(pairings, engine.card_digest())
+                or matrix.names != list(engine._name_rows)
+                or len(matrix.indptr) != len(matrix.names) + 1 or len(matrix.indices) != len(matrix.data)):
+            return None
+        return matrix
+
+    def save(self, path: str):
+        """Write the CSR arrays as JSON with each array base64 encoded"""
+        data = {
+            "fingerprint": self.fingerprint,
+            "byteorder": sys.byteorder,
+            "names": self.names,
+            "indptr": base64.b64encode(self.indptr.tobytes()).decode("ascii"),
+            "indices": base64.b64encode(self.indices.tobytes()).decode("ascii"),
+            "data": base64.b64encode(self.data.tobytes()).decode("ascii"),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def nnz(self) -> int:
+        """Number of stored entries"""
+        return len(self.data)
+
+    def row(self, pos: int) -> Tuple[array.array, array.array]:
+        """Column positions and values of one row"""
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def matvec(self, counts: Dict[int, int]) -> List[int]:
+        """S @ deck for a deck given as {row position: copies}; only the deck's rows are read"""
+        hits = [0] * len(self.names)
+        for pos, count in counts.items():
+            for j, value in zip(*self.row(pos)):
+                hits[j] += value * count
+        return hits
+
+
+def _count_pairs(size: int, groups: List[List[int]], pairs: List[Tuple[List[int], List[int]]]) -> tuple:
+    """
+    CSR arrays of the pair counts: each group adds one to every pair of
+    its distinct members, each (first, second) pair of member lists one
+    to (i, j) and (j, i) for i in first and j in second
+    """
+    rows = [defaultdict(int) for _ in range(size)]
+    for members in groups:
+        for i in members:
+            row = rows[i]
+            for j in members:
+                row[j] += 1
+    for first, second in pairs:
+        for i in first:
+            for j in second:
+                rows[i][j] += 1
+                rows[j][i] += 1
+
+    indptr, indices, data = array.array("i", [0]), array.array("i"), array.array("B")
+    for i, row in enumerate(rows):
+        row.pop(i, None)
+        for j in sorted(row):
+            indices.append(j)
+            data.append(min(row[j], 255))
+        indptr.append(len(indices))
+    return indptr, indices, data
+
+
+def _count_pairs_numpy(size: int, groups: List[List[int]], pairs: List[Tuple[List[int], List[int]]]) -> tuple:
+    """
+    _count_pairs with numpy: every group and pair of member lists becomes
+    a block of flat i * size + j keys (an outer sum), and counting the
+    distinct keys in sorted order yields the CSR arrays directly
+    """
+    blocks = [np.zeros(0, dtype=np.int64)]
+    for members in groups:
+        members = np.array(members, dtype=np.int64)
+        blocks.append((members[:, None] * size + members).ravel())
+    for first, second in pairs:
+        first, second = np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+        blocks.append((first[:, None] * size + second).ravel())
+        blocks.append((second[:, None] * size + first).ravel())
+    keys = np.concatenate(blocks)
+    keys = keys[keys // size != keys % size]
+    keys, counts = np.unique(keys, return_counts=True)
+    indptr = np.searchsorted(keys, np.arange(size + 1, dtype=np.int64) * size)
+    return (array.array("i", indptr.tolist()), array.array("i", (keys % size).tolist()),
+            array.array("B", np.minimum(counts, 255).tolist()))
+
+
+def matrix_fingerprint(pairings: Tuple[Tuple[str, str], ...], card_digest: str) -> str:
+    """Version, pairings and card content (CardRatingEngine.card_digest) a matrix was built with"""
+    digest = hashlib.sha1(repr(tuple(map(tuple, pairings))).encode("utf-8")).hexdigest()
+    return f"{SYNERGY_MATRIX_VERSION}:{digest}:{card_digest}"
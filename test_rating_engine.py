@@ -0,0 +1,578 @@
+"""
+Unit tests for the card rating engine, run against the cached TLA set
+"""
+import json
+import os
+import random
+
+import pytest
+
+import config
+
+from card_rating_engine import CardRatingEngine, np
+from card_table import CardTable
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "TLA.json")
+
+
+@pytest.fixture(scope="module")
+def set_cards():
+    """All parsed cards from the cached TLA set"""
+    with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def sample_decks(set_cards):
+    """Random decks of various sizes drawn from the set"""
+    rng = random.Random(7)
+    names = [card["name"] for card in set_cards]
+    return [rng.sample(names, size) for size in (1, 2, 5, 12, 23, 40, 60)]
+
+
+@pytest.mark.skipif(np is None, reason="numpy not installed")
+def test_columnar_matches_per_card(set_cards, sample_decks):
+    columnar = CardRatingEngine(set_cards)
+    per_card = CardRatingEngine(set_cards, columnar=False)
+    
+    for deck in sample_decks:
+        expected = per_card.rate_cards(deck)
+        actual = columnar.rate_cards(deck)
+        assert [r[:3] for r in actual] == [r[:3] for r in expected]
+
+
+def test_empty_deck_returns_no_ratings(set_cards):
+    engine = CardRatingEngine(set_cards)
+    assert engine.rate_cards([]) == []
+
+
+def test_deck_state_matches_full_analysis(set_cards, sample_decks):
+    engine = CardRatingEngine(set_cards)
+    deck = engine.new_deck()
+    for name in sample_decks[-1]:
+        deck.add(name)
+    for name in sample_decks[-1][::3]:
+        deck.remove(name)
+    
+    expected = engine._analyze_deck(engine._parse_selected_cards(deck.names))
+    actual = deck.analysis
+    for field in ("count", "creatures", "spells", "lands", "cmc_distribution", "colors",
+                  "color_identity", "keywords", "creature_types", "creature_type_index", "mana_curve"):
+        assert actual[field] == expected[field], field
+    assert actual["avg_cmc"] == pytest.approx(expected["avg_cmc"])
+    assert sorted(actual["synergies"]) == sorted(expected["synergies"])
+    assert engine.rate_cards(deck) == engine.rate_cards(deck.names)
+
+
+def test_pick_order_uses_static_scores(set_cards):
+    engine = CardRatingEngine(set_cards)
+    pick_order = engine.pick_order(page_size=10)
+    assert len(pick_order) == len(set_cards)
+    
+    ratings = [row[1] for row in pick_order]
+    assert ratings == sorted(ratings, reverse=True)
+    for name, rating, _, card in pick_order.top(10):
+        expected = 5.0 + engine._rate_limited_power(card) + config.RARITY_WEIGHTS[card["rarity"]]
+        assert rating == round(min(10.0, expected), 1)
+
+
+def test_deck_context_tables_match_scalar_rules(set_cards, sample_decks):
+    engine = CardRatingEngine(set_cards)
+    context = engine.compile_deck(sample_decks[4])
+    analysis = context.analysis
+    
+    for card in set_cards:
+        assert context.lookup(card["name"]) == (
+            engine._rate_mana_curve_fit(card, analysis),
+            engine._rate_color_fit(card, analysis),
+            engine._rate_deck_balance(card, analysis),
+        )
+    assert engine.compile_deck(context) is context
+    assert engine.rate_cards(context) == engine.rate_cards(sample_decks[4])
+
+
+def test_config_changes_recompile_live_engines(set_cards, sample_decks, monkeypatch):
+    engine = CardRatingEngine(set_cards)
+    per_card = CardRatingEngine(set_cards, columnar=False)
+    deck = engine.new_deck(sample_decks[4])
+    before = engine.rate_cards(deck)
+    
+    weights = dict(config.RATING_WEIGHTS, keyword_synergy=0.3, removal_spell=2.7, deck_completion=0.0)
+    monkeypatch.setattr(config, "RATING_WEIGHTS", weights)
+    monkeypatch.setattr(config, "SYNERGY_KEYWORDS", {"flying": 0.35, "draw": 0.45})
+    
+    after = engine.rate_cards(deck)
+    assert engine.weights.removal_spell == 2.7
+    assert after != before
+    if engine.columnar:
+        for names in sample_decks:
+            assert engine.rate_cards(names) == per_card.rate_cards(names)
+
+
+def test_rate_pack_scores_only_the_pack(set_cards, sample_decks):
+    engine = CardRatingEngine(set_cards)
+    deck = engine.new_deck(sample_decks[3])
+    pack = sample_decks[2] + ["Katara, Bendng Prodigy", "zzzz qqqq"]
+    
+    rows = engine.rate_pack(deck, pack)
+    assert len(rows) == len(pack) - 1
+    assert [row[1] for row in rows] == sorted((row[1] for row in rows), reverse=True)
+    
+    full = {row[0]: row[:3] for row in engine.rate_cards(deck)}
+    for row in rows:
+        assert row[:3] == full[row[0]]
+    
+    first_pick = engine.rate_pack([], pack)
+    static = {row[0]: row[1] for row in engine.pick_order()}
+    assert all(row[1] == static[row[0]] for row in first_pick)
+
+
+@pytest.mark.parametrize("columnar", [True, False])
+def test_card_filter_scores_only_matching_cards(set_cards, sample_decks, columnar):
+    from card_filter import CardFilter
+    
+    engine = CardRatingEngine(set_cards, columnar=columnar)
+    deck = engine.new_deck(sample_decks[1])
+    identity = deck.analysis["color_identity"]
+    card_filter = CardFilter.parse("deck-colors cmc<=3 type=creature,instant new")
+    
+    def passes(card):
+        return (set(card["colors"]) <= identity and card["cmc"] <= 3
+                and (card["is_creature"] or card["is_instant"]) and card["name"] not in deck)
+    
+    expected = [row[:3] for row in engine.rate_cards(deck) if passes(row[3])]
+    actual = engine.rate_cards(deck, card_filter=card_filter)
+    assert 0 < len(actual) < len(set_cards) // 2
+    assert [row[:3] for row in actual] == expected
+    assert engine.rate_cards(deck, card_filter=CardFilter(text="zzzz qqqq")) == []
+    
+    rares = [row[:3] for row in engine.pick_order(page_size=1000, card_filter=CardFilter(rarities=["rare"]))]
+    assert rares == [row[:3] for row in engine.pick_order(page_size=1000) if row[3]["rarity"] == "rare"]
+
+
+def test_ranking_pages_match_full_sort(set_cards, sample_decks):
+    engine = CardRatingEngine(set_cards)
+    deck = sample_decks[3]
+    expected = engine.rate_cards(deck)
+    
+    ranking = engine.rank_cards(deck, page_size=20)
+    assert ranking.next_page() == expected[:20]
+    assert ranking.next_page() == expected[20:40]
+    assert ranking[100] == expected[100]
+    assert list(ranking) == expected
+    
+    # The public per-row scores the lookahead and deck builder read
+    scored = engine.score_rows(deck)
+    assert list(scored["ratings"]) == list(ranking.ratings)
+    assert len(scored["totals"]) == len(scored["ratings"])
+    name, rating, explanation, card = expected[0]
+    row = engine.first_rows()[name]
+    assert (scored["ratings"][row], scored["explain"](row)) == (rating, explanation)
+
+
+def test_rating_cache_hits_and_neighbour_derivation(set_cards, sample_decks):
+    engine = CardRatingEngine(set_cards)
+    uncached = CardRatingEngine(set_cards)
+    uncached.rating_cache_size = 0
+    
+    deck = engine.new_deck()
+    for name in sample_decks[4]:
+        deck.add(name)
+        assert engine.rate_cards(deck) == uncached.rate_cards(deck.names)
+    assert engine.cache_stats()["misses"] == len(sample_decks[4])
+    
+    # Re-rating the same multiset in another order is a cache hit
+    engine.rate_cards(list(reversed(deck.names)))
+    assert engine.cache_hits == 1
+    if engine.columnar:
+        assert engine.cache_derived == len(sample_decks[4]) - 1
+
+
+def test_delta_rerating_matches_full_rescore(set_cards):
+    engine = CardRatingEngine(set_cards)
+    reference = CardRatingEngine(set_cards, columnar=False)
+    rng = random.Random(3)
+    names = [card["name"] for card in set_cards]
+    
+    deck = engine.new_deck()
+    for _ in range(120):
+        if len(deck) > 1 and rng.random() < 0.3:
+            deck.pop(rng.randrange(len(deck)))
+        else:
+            deck.add(rng.choice(names))
+        assert engine.rate_cards(deck) == reference.rate_cards(deck.names)
+
+
+def test_name_index_resolves_typos_and_partial_names(set_cards):
+    engine = CardRatingEngine(set_cards)
+    cards = engine.resolve_cards(["Katara, Bendng Prodigy", "katara, bending", "zzzz qqqq"])
+    assert cards[0]["name"] == "Katara, Bending Prodigy"
+    assert cards[1]["name"] == "Katara, Bending Prodigy"
+    assert cards[2] is None
+
+
+def test_card_records_keep_dict_access(set_cards):
+    from card_table import Card
+    
+    for original in set_cards[:50]:
+        card = Card.from_dict(original)
+        for key, value in original.items():
+            if key in ("colors", "color_identity"):
+                assert sorted(card[key]) == sorted(value)
+            else:
+                assert card[key] == value, key
+        assert card.get("missing", "default") == "default"
+
+
+def test_keyword_matcher_matches_substring_semantics(set_cards, monkeypatch):
+    from scryfall_api import KeywordMatcher, extract_keywords, parser_checksum
+
+    vocab = config.TRACKED_KEYWORDS
+    texts = [card["oracle_text_lower"] for card in set_cards]
+    texts += ["", "wrathboard wipe", "drawdraw", "flashbackflash", "etbenter the battlefield"]
+    for text in texts:
+        assert extract_keywords(text) == [kw for kw in vocab if kw in text]
+
+    matcher = KeywordMatcher(["ab", "bc", "abcd", "c"])
+    assert matcher.find("xabcx") == ["ab", "bc", "c"]
+    assert matcher.find_many(["abcd", "abcd"]) == [["ab", "bc", "abcd", "c"]] * 2
+    
+    # A reloaded vocabulary changes the parser checksum and the matcher alike
+    checksum = parser_checksum()
+    assert extract_keywords("gains zephyrstride") == []
+    monkeypatch.setattr(config, "TRACKED_KEYWORDS", vocab + ["zephyrstride"])
+    assert parser_checksum() != checksum
+    assert extract_keywords("gains zephyrstride") == ["zephyrstride"]
+
+
+def test_weight_tuner_replays_picks(set_cards, monkeypatch):
+    import tune_weights
+    
+    monkeypatch.setattr(config, "RATING_WEIGHTS", dict(config.RATING_WEIGHTS))
+    situations = tune_weights.generate_picks(set_cards, 60, noise=0.0)
+    tune_weights._init_worker(set_cards, situations)
+    
+    result = tune_weights.evaluate({})
+    assert result["situations"] == 60
+    assert result["top1"] >= 0.9
+    assert result["top1"] <= result["top3"]
+    assert result["mean_rank"] >= 1.0
+
+
+@pytest.mark.parametrize("columnar", [True, False])
+def test_lookahead_rates_top_candidates(set_cards, sample_decks, columnar):
+    import lookahead
+    
+    engine = CardRatingEngine(set_cards, columnar=columnar)
+    deck = engine.new_deck(sample_decks[3])
+    names = list(deck.names)
+    rows = lookahead.LookaheadRater(engine).rate(deck, top_k=6, time_budget=0)
+    assert len({row[0] for row in rows}) == 6
+    assert deck.names == names
+    
+    # The what-if copy must not leak into the deck it was made from
+    what_if = deck.copy()
+    what_if.add(rows[0][0])
+    assert deck.analysis == engine.new_deck(names).analysis
+    
+    # Worker chunks give the same follow-up changes as the serial evaluator
+    candidates = [row[0] for row in rows]
+    serial = lookahead._Evaluator(engine).evaluate(deck, candidates, 10)
+    lookahead._init_worker(set_cards)
+    assert lookahead._evaluate_chunk((names, candidates, 10, None)) == pytest.approx(serial)
+    
+    # Out of time: every candidate keeps its one-ply rating
+    one_ply = {row[0]: row[1:3] for row in engine.rate_cards(deck)}
+    pending = lookahead.LookaheadRater(engine).rate(deck, top_k=6, time_budget=1e-9)
+    assert sorted(row[0] for row in pending) == sorted(candidates)
+    assert all(one_ply[row[0]] == row[1:3] for row in pending)
+
+
+def test_deck_quality_is_maintained_incrementally(set_cards, monkeypatch):
+    engine = CardRatingEngine(set_cards)
+    rng = random.Random(11)
+    names = [card["name"] for card in set_cards]
+    deck = engine.new_deck()
+    for _ in range(200):
+        if len(deck) > 5 and rng.random() < 0.4:
+            deck.pop(rng.randrange(len(deck)))
+        else:
+            deck.add(rng.choice(names))
+        fresh = engine.new_deck(deck.names)
+        assert deck.quality_components() == pytest.approx(fresh.quality_components())
+    assert engine.deck_quality(deck.names) == pytest.approx(deck.quality())
+    
+    # Copies share counters until one of them changes
+    what_if = deck.copy()
+    before = deck.quality()
+    what_if.add(names[0])
+    assert deck.quality() == before
+    
+    # Power is resummed once the scoring weights change
+    monkeypatch.setattr(config, "RATING_WEIGHTS", dict(config.RATING_WEIGHTS, removal_spell=4.0))
+    engine.refresh_config()
+    assert deck.power_total == pytest.approx(engine.new_deck(deck.names).power_total)
+
+
+def test_deck_builder_builds_within_colors(set_cards):
+    import deck_builder
+    from card_table import color_mask
+    
+    engine = CardRatingEngine(set_cards)
+    rng = random.Random(1)
+    pool = rng.sample([card["name"] for card in set_cards], 90)
+    builds = deck_builder.DeckBuilder(engine).build(pool, results=3)
+    assert len(builds) == 3
+    assert [b["quality"] for b in builds] == sorted((b["quality"] for b in builds), reverse=True)
+    
+    for build in builds:
+        cards = [engine.resolve_card(name) for name in build["spells"]]
+        assert len(cards) == config.DECK_BUILDER_SPELLS
+        assert sum(build["lands"].values()) == build["land_count"] == 40 - len(cards)
+        main = color_mask(build["colors"])
+        off_color = [card for card in cards if color_mask(card["colors"]) & ~main]
+        assert len(off_color) <= (config.DECK_BUILDER_MAX_SPLASH if build["splash"] else 0)
+        assert engine.deck_quality(build["spells"]) == pytest.approx(build["quality"])
+    
+    # Worker processes run the same search
+    deck_builder._init_worker(set_cards)
+    task = (pool, builds[0]["colors"], config.DECK_BUILDER_SPELLS, "", 0, None)
+    assert deck_builder._build_task(task) == deck_builder._build_task(task, engine)
+    
+    assert deck_builder.parse_pool(["2 Foo", "3x Bar Baz", "", "Qux"]) == ["Foo", "Foo"] + ["Bar Baz"] * 3 + ["Qux"]
+
+
+def test_archetype_table_is_cached_with_the_set(set_cards, tmp_path, monkeypatch):
+    from archetypes import ARCHETYPES, ArchetypeTable
+    
+    engine = CardRatingEngine(set_cards)
+    table = engine.archetype_table()
+    assert len(table.scores) == len(table) * len(ARCHETYPES)
+    if engine.columnar:
+        assert ArchetypeTable.compute(CardRatingEngine(set_cards, columnar=False)).scores == table.scores
+    
+    # Best cards are castable in the archetype; signposts are exactly its colors
+    for name, rating in table.best("uw", 20):
+        assert set(engine.resolve_card(name)["colors"]) <= {"W", "U"}
+        assert rating == table.rating(name, "WU")
+    assert all(set(engine.resolve_card(name)["colors"]) == {"W", "U"} for name, _ in table.signposts("WU"))
+    with pytest.raises(ValueError):
+        table.best("WX")
+    
+    path = str(tmp_path / "TLA.archetypes.json")
+    assert engine.load_archetypes(path).scores == table.scores
+    assert os.path.exists(path)
+    assert ArchetypeTable.load(path, engine).scores == table.scores
+    
+    # Same names, other card content (e.g. after a parser change): not reused
+    edited = [dict(card, keywords=card["keywords"] + ["flying"]) if i == 5 else card
+              for i, card in enumerate(set_cards)]
+    assert ArchetypeTable.load(path, CardRatingEngine(edited)) is None
+    
+    # Tables built under other scoring settings are recomputed, not reused
+    monkeypatch.setattr(config, "RATING_WEIGHTS", dict(config.RATING_WEIGHTS, color_conflict=-4.0))
+    assert ArchetypeTable.load(path, engine) is None
+    assert engine.archetype_table().scores != table.scores
+    assert ArchetypeTable.load(path, engine) is not None
+    
+    # Blending archetype ratings into the pick order
+    static = engine.pick_order().rating_map()
+    monkeypatch.setattr(config, "RATING_WEIGHTS", dict(config.RATING_WEIGHTS, archetype_pick_blend=1.0))
+    blended = engine.pick_order().rating_map()
+    best = engine.archetype_table()
+    assert blended != static
+    assert all(blended[name] == best.best_rating(name) for name in blended)
+
+
+def test_synergy_matrix_pairs_cards_with_the_deck(set_cards, sample_decks, tmp_path, monkeypatch):
+    from collections import Counter
+    import synergy_matrix
+    from synergy_matrix import SynergyMatrix
+    
+    # Pair synergy is opt-in; the default weight leaves ratings unchanged
+    assert config.RATING_WEIGHTS["pair_synergy"] == 0.0
+    monkeypatch.setattr(config, "RATING_WEIGHTS", dict(config.RATING_WEIGHTS, pair_synergy=0.5))
+    engine = CardRatingEngine(set_cards)
+    matrix = engine.synergy_matrix()
+    dense = [[0] * len(matrix) for _ in range(len(matrix))]
+    for i in range(len(matrix)):
+        for j, value in zip(*matrix.row(i)):
+            dense[i][j] = value
+    assert all(dense[i][j] == dense[j][i] for i in range(len(matrix)) for j in range(i))
+    assert not any(dense[i][i] for i in range(len(matrix)))
+    if np is not None:
+        with monkeypatch.context() as patch:
+            patch.setattr(synergy_matrix, "np", None)
+            rows = SynergyMatrix.compute(engine, engine.weights.synergy_pairings)
+        assert (rows.indptr, rows.indices, rows.data) == (matrix.indptr, matrix.indices, matrix.data)
+        per_card = CardRatingEngine(set_cards, columnar=False)
+        for deck in sample_decks:
+            assert engine.rate_cards(deck) == per_card.rate_cards(deck)
+    
+    # Token makers pair with sacrifice outlets on top of their shared keywords
+    token = matrix.positions[next(name for name, kws in engine._keyword_cache.items() if kws == {"token"})]
+    sacrifice = matrix.positions[next(name for name, kws in engine._keyword_cache.items() if kws == {"sacrifice"})]
+    assert dense[token][sacrifice] == 1
+    
+    deck = Counter(matrix.positions[name] for name in engine.new_deck(sample_decks[4]).names)
+    hits = matrix.matvec(deck)
+    assert hits == [sum(row[j] * count for j, count in deck.items()) for row in dense]
+    
+    # The pair term is the weighted mean over the deck
+    context = engine.compile_deck(sample_decks[4])
+    name = matrix.names[token]
+    expected = engine.weights.pair_synergy * hits[token] / len(context)
+    assert engine._rate_pair_synergy(engine.resolve_card(name), context) == expected
+    
+    path = str(tmp_path / "TLA.synergy.json")
+    engine.load_synergy_matrix(path)
+    loaded = SynergyMatrix.load(path, engine, engine.weights.synergy_pairings)
+    assert (loaded.indptr, loaded.indices, loaded.data) == (matrix.indptr, matrix.indices, matrix.data)
+    assert SynergyMatrix.load(path, engine, (("flying", "draw"),)) is None
+    # Same names, other keywords (e.g. after a TRACKED_KEYWORDS change): not reused
+    edited = [dict(card, keywords=card["keywords"] + ["flying"]) if i == 5 else card
+              for i, card in enumerate(set_cards)]
+    assert SynergyMatrix.load(path, CardRatingEngine(edited), engine.weights.synergy_pairings) is None
+    
+    # Changing the pairings rebuilds the matrix
+    monkeypatch.setattr(config, "SYNERGY_PAIRINGS", [])
+    engine.refresh_config()
+    assert engine.synergy_matrix().nnz < matrix.nnz
+
+
+@pytest.mark.parametrize("columnar", [True, False])
+def test_add_cards_matches_building_at_once(set_cards, sample_decks, columnar):
+    if columnar and np is None:
+        pytest.skip("numpy not installed")
+    engine = CardRatingEngine(set_cards[:100], columnar=columnar)
+    engine.add_cards(set_cards[100:150])
+    # Small pages, so prints of one name land on different pages
+    for start in range(150, len(set_cards), 7):
+        engine.add_cards(set_cards[start:start + 7])
+    # A later print of an early card that differs replaces its per-name data
+    reprint = dict(set_cards[5], keywords=["flying", "lifelink"], rarity="mythic")
+    engine.new_deck([reprint["name"]])
+    engine.add_cards([reprint])
+    expected = CardRatingEngine(set_cards + [reprint], columnar=columnar)
+    assert engine.new_deck([reprint["name"]]).analysis == expected.new_deck([reprint["name"]]).analysis
+    
+    assert len(engine.all_cards) == len(set_cards) + 1
+    assert engine.card_names == [card["name"] for card in set_cards + [reprint]]
+    if columnar:
+        # Columns extended page by page equal the columns built at once
+        assert np.array_equal(engine._col_power_score, expected._col_power_score)
+        for name in ("_col_cmc", "_col_flags", "_col_colors", "_col_rarity", "_col_has_evasion"):
+            assert np.array_equal(getattr(engine, name), getattr(expected, name))
+        for keyword in expected._keyword_index:
+            assert np.array_equal(engine._has_keyword(keyword), expected._has_keyword(keyword))
+        for ctype in expected._type_index:
+            assert np.array_equal(engine._type_hits([ctype]), expected._type_hits([ctype]))
+    assert engine.resolve_card(set_cards[-1]["name"])["name"] == set_cards[-1]["name"]
+    for deck in sample_decks[2:5]:
+        assert [r[:3] for r in engine.rate_cards(deck)] == [r[:3] for r in expected.rate_cards(deck)]
+    assert engine.pick_order().rating_map() == expected.pick_order().rating_map()
+
+
+def test_binary_set_cache_round_trips_and_migrates_json(set_cards, tmp_path, monkeypatch):
+    import scryfall_api
+    from set_cache import load_set_cache, read_set_cache, write_set_cache, SetCacheError
+    
+    expected = CardTable.from_dicts(set_cards).to_dicts()
+    path = str(tmp_path / "TLA.cards")
+    write_set_cache(path, set_cards, 1700000000.0)
+    header, cards = read_set_cache(path)
+    assert (header.source_timestamp, header.card_count) == (1700000000.0, len(set_cards))
+    assert cards.to_dicts() == expected
+    assert os.path.getsize(path) * 10 < os.path.getsize(CACHE_FILE)
+    
+    # The engine scores loaded records exactly like parsed dicts
+    deck = [card["name"] for card in set_cards[::30]]
+    assert [r[:3] for r in CardRatingEngine(cards).rate_cards(deck)] == \
+        [r[:3] for r in CardRatingEngine(set_cards).rate_cards(deck)]
+    
+    # A cache written by another parser version counts as missing unless asked for
+    monkeypatch.setattr(scryfall_api, "PARSER_VERSION", scryfall_api.PARSER_VERSION + 1)
+    assert load_set_cache(path) is None
+    assert len(load_set_cache(path, check_parser=False)) == len(set_cards)
+    monkeypatch.undo()
+    
+    with open(path, 'r+b') as f:
+        f.seek(-10, os.SEEK_END)
+        f.write(b"0123456789")
+    with pytest.raises(SetCacheError):
+        read_set_cache(path)
+    assert load_set_cache(path) is None
+    
+    # A JSON cache from earlier versions is converted on first load, with
+    # its keywords extracted again by the current parser
+    legacy = tmp_path / "OLD.json"
+    legacy.write_text(json.dumps(set_cards[:50]), encoding='utf-8')
+    migrated = str(tmp_path / "OLD.cards")
+    reparsed = [dict(card, keywords=scryfall_api.extract_keywords(card["oracle_text"].lower()))
+                for card in expected[:50]]
+    assert reparsed != expected[:50]
+    assert load_set_cache(migrated).to_dicts() == reparsed
+    assert read_set_cache(migrated)[0].source_timestamp == os.path.getmtime(legacy)
+    assert load_set_cache(str(tmp_path / "NONE.cards")) is None
+
+
+def test_card_store_maps_every_cached_set_lazily(set_cards, tmp_path, monkeypatch):
+    import pickle
+    from card_filter import CardFilter
+    from card_store import CardStore, open_card_store, card_store_path
+    from set_cache import write_set_cache
+    
+    write_set_cache(str(tmp_path / "TLA.cards"), set_cards, 1700000000.0)
+    write_set_cache(str(tmp_path / "SUB.cards"), set_cards[:60], 1700000001.0)
+    store = open_card_store(str(tmp_path))
+    assert sorted(store.sets) == ["SUB", "TLA"]
+    assert store.open_set("SUB").to_dicts() == CardTable.from_dicts(set_cards[:60]).to_dicts()
+    assert store.open_set("NONE") is None
+    
+    # Building the engine reads columns only; ranking builds the records it shows
+    cards = store.open_set("TLA")
+    deck = [card["name"] for card in set_cards[::30]]
+    for columnar in (True, False):
+        engine = CardRatingEngine(cards, columnar=columnar)
+        expected = CardRatingEngine(set_cards, columnar=columnar)
+        assert engine.card_digest() == expected.card_digest()
+        if columnar:
+            assert cards.materialized == 0
+            top = [r[:3] for r in engine.rank_cards(deck, page_size=10).page(0)]
+            assert cards.materialized <= len(deck) + 10
+            assert top == [r[:3] for r in expected.rank_cards(deck, page_size=10).page(0)]
+        
+        # The pick order and archetype table read columns and caches, too
+        fresh = store.open_set("TLA")
+        picks = CardRatingEngine(fresh, columnar=columnar)
+        assert picks.pick_order().rating_map() == expected.pick_order().rating_map()
+        assert picks.archetype_table().scores == expected.archetype_table().scores
+        assert fresh.materialized == 0
+        rares = CardFilter(rarities=["rare"])
+        assert ([r[:3] for r in picks.pick_order(page_size=10, card_filter=rares).page(0)]
+                == [r[:3] for r in expected.pick_order(page_size=10, card_filter=rares).page(0)])
+        assert fresh.materialized <= 10
+        assert [r[:3] for r in engine.rate_cards(deck)] == [r[:3] for r in expected.rate_cards(deck)]
+        assert engine.resolve_card("aang hero") == expected.resolve_card("aang hero")
+    assert cards.to_dicts() == CardTable.from_dicts(set_cards).to_dicts()
+    assert pickle.loads(pickle.dumps(cards))[5] == cards[5]
+    with pytest.raises(TypeError):
+        cards.extend(set_cards[:1])
+    
+    # A set cache added (or refetched) later rebuilds the store on next open,
+    # unmapping the stale store before its file is replaced
+    with open_card_store(str(tmp_path)) as current:
+        assert current.sets.keys() == store.sets.keys()
+    assert current._mmap.closed
+    closed = []
+    close = CardStore.close
+    
+    def recording_close(self):
+        closed.append(self.path)
+        close(self)
+    
+    monkeypatch.setattr(CardStore, "close", recording_close)
+    write_set_cache(str(tmp_path / "NEW.cards"), set_cards[60:90], 1700000002.0)
+    assert len(open_card_store(str(tmp_path)).open_set("NEW")) == 30
+    assert len(closed) == 1
+    assert os.path.exists(card_store_path(str(tmp_path)))
@@ -0,0 +1,142 @@
+"""
+Unit tests for the Scryfall client, run against a local stand-in server
+"""
+import os
+import time
+
+import pytest
+
+import config
+
+from card_rating_engine import CardRatingEngine
+from card_table import CardTable
+import scryfall_api
+from scryfall_api import ScryfallAPI
+from set_cache import read_set_cache
+from set_pipeline import stream_set
+from scryfall_stub import StubScryfall, canned_cards
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Fresh shared session, an empty cache directory and no request spacing unless a test sets one"""
+    monkeypatch.setattr(ScryfallAPI, "_session", None)
+    monkeypatch.setattr(config, "SCRYFALL_REQUEST_INTERVAL", 0.0)
+    monkeypatch.setattr(config, "CACHE_DIRECTORY", str(tmp_path / "cache"))
+    return ScryfallAPI
+
+
+def test_concurrent_fetch_returns_pages_in_order(api, monkeypatch):
+    cards = canned_cards(1000)
+    with StubScryfall(cards, page_size=100) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        sequential = api.get_set_cards("TST", workers=1)
+        assert stub.connections == 1
+
+        concurrent = api.get_set_cards("TST", workers=4)
+        assert concurrent == sequential == cards
+        # Pooled keep-alive connections: one per worker at most, plus the first
+        assert stub.connections <= 1 + 4
+        assert [page for _, _, page, _ in stub.requests].count(10) == 2
+
+        assert api.get_set_codes() == [{"code": "TST", "name": "Stub Set"}]
+
+
+def test_concurrent_fetch_overlaps_page_latency(api, monkeypatch):
+    with StubScryfall(canned_cards(600), page_size=100, latency=0.1) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        start = time.perf_counter()
+        api.get_set_cards("TST", workers=1)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        api.get_set_cards("TST", workers=5)
+        concurrent = time.perf_counter() - start
+    # 6 pages one after another versus the first page plus one round of 5
+    assert concurrent < 0.6 * sequential
+
+
+def test_request_interval_spaces_concurrent_requests(api, monkeypatch):
+    monkeypatch.setattr(config, "SCRYFALL_REQUEST_INTERVAL", 0.05)
+    with StubScryfall(canned_cards(500), page_size=100) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        assert len(api.get_set_cards("TST", workers=4)) == 500
+        starts = sorted(when for when, _, _, _ in stub.requests)
+    # Request starts are spaced on the client; a thread scheduled late can
+    # shorten one gap as seen by the server, but not the overall span
+    assert starts[-1] - starts[0] >= 0.9 * 0.05 * (len(starts) - 1)
+
+
+def test_failed_page_keeps_the_pages_before_it(api, monkeypatch, capsys):
+    cards = canned_cards(500)
+    with StubScryfall(cards, page_size=100, fail_page=4) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        assert api.get_set_cards("TST", workers=4) == cards[:300]
+    assert "Error fetching cards" in capsys.readouterr().out
+
+
+def test_stream_set_matches_fetch_then_parse(api, monkeypatch, tmp_path):
+    cards = canned_cards(450)
+    cache_file = str(tmp_path / "TST.cards")
+    sizes = []
+    with StubScryfall(cards, page_size=100) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        engine = stream_set("TST", cache_file=cache_file,
+                            on_page=lambda engine, page: sizes.append((len(engine.all_cards), len(page))))
+    parsed = api.parse_cards(cards)
+    assert sizes == [(100, 100), (200, 100), (300, 100), (400, 100), (450, 50)]
+    assert [card["name"] for card in engine.all_cards] == [card["name"] for card in parsed]
+    deck = [card["name"] for card in parsed[::40]]
+    expected = CardRatingEngine(parsed).rate_cards(deck)
+    assert [r[:3] for r in engine.rate_cards(deck)] == [r[:3] for r in expected]
+    assert read_set_cache(cache_file)[1].to_dicts() == CardTable.from_dicts(parsed).to_dicts()
+    assert os.listdir(tmp_path) == ["TST.cards"]
+
+
+def test_stream_set_failed_page_writes_no_cache(api, monkeypatch, tmp_path, capsys):
+    cache_file = str(tmp_path / "TST.cards")
+    with StubScryfall(canned_cards(500), page_size=100, fail_page=3) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        engine = stream_set("TST", cache_file=cache_file, workers=1)
+    assert len(engine.all_cards) == 200
+    assert os.listdir(tmp_path) == []
+    assert "Error fetching cards" in capsys.readouterr().out
+
+
+def test_set_catalog_is_cached_and_works_offline(api, monkeypatch):
+    with StubScryfall([]) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        assert api.get_set_codes() == [{"code": "TST", "name": "Stub Set"}]
+        assert api.get_set_codes() == [{"code": "TST", "name": "Stub Set"}]
+        assert len(stub.requests) == 1
+    
+    # The stub is gone: a fresh or stale catalog is still served from disk
+    assert api.get_set_codes() == [{"code": "TST", "name": "Stub Set"}]
+    monkeypatch.setattr(config, "CACHE_EXPIRATION", 1e-9)
+    assert api.get_set_codes(wait=True) == [{"code": "TST", "name": "Stub Set"}]
+
+
+def test_stale_set_catalog_is_revalidated(api, monkeypatch):
+    with StubScryfall([]) as stub:
+        monkeypatch.setattr(api, "BASE_URL", stub.url)
+        api.get_set_codes()
+        fetched = api._read_catalog()["fetched"]
+        
+        # Expiry disabled: never revalidated
+        monkeypatch.setattr(config, "CACHE_EXPIRATION", 0)
+        api.get_set_codes()
+        assert len(stub.requests) == 1
+        
+        # Unchanged catalog: a 304 only renews the fetch time
+        monkeypatch.setattr(config, "CACHE_EXPIRATION", 1e-9)
+        assert api.get_set_codes(wait=True) == [{"code": "TST", "name": "Stub Set"}]
+        assert api._read_catalog()["fetched"] > fetched
+        
+        # A new set: the stale catalog is returned at once and replaced in the background
+        stub.sets = stub.sets + [{"code": "new", "name": "New Set"}]
+        stub.sets_etag, stub.sets_last_modified = '"sets-2"', "Sun, 18 Oct 2026 12:00:00 GMT"
+        assert len(api.get_set_codes()) == 1
+        scryfall_api._catalog_refresh.join()
+        monkeypatch.setattr(config, "CACHE_EXPIRATION", 0)
+        assert api.get_set_codes()[-1] == {"code": "NEW", "name": "New Set"}
+    assert len(stub.requests) == 3
@@ -0,0 +1,213 @@
+"""
+Offline tuning of the scoring weights against recorded draft picks
+Run with: python tune_weights.py PICKS.jsonl [--set TLA] [--search coordinate]
+
+Each line of the picks file is one pick situation:
+    {"deck": ["Card A", ...], "pack": ["Card B", "Card C", ...], "pick": "Card C"}
+Use --synthetic N instead of a file to generate situations from the cached set.
+"""
+import json
+import time
+import random
+import argparse
+import itertools
+import multiprocessing
+from typing import List, Dict, Any, Optional
+
+import config
+from card_rating_engine import CardRatingEngine
+from set_cache import load_cached_set
+
+# Weights tried by the searches unless --keys is given
+DEFAULT_TUNED_KEYS = (
+    "mana_curve_perfect_fit", "mana_curve_crowded", "color_perfect_fit", "color_conflict",
+    "creature_needed", "spell_needed", "removal_spell", "card_draw", "great_value",
+    "keyword_synergy", "creature_type_synergy",
+)
+
+# Per-process state set up once by _init_worker, so tasks only carry weights
+_engine = None
+_situations = None
+
+
+def load_picks(path: str) -> List[Dict[str, Any]]:
+    """Read pick situations from a JSON lines file"""
+    picks = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                picks.append(json.loads(line))
+    return picks
+
+
+def generate_picks(set_cards: List[Dict[str, Any]], count: int, seed: int = 0,
+                   noise: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Synthetic pick situations: random decks and 14-card packs, with the
+    pick made by the current weights plus gaussian noise.
+    """
+    rng = random.Random(seed)
+    engine = CardRatingEngine(set_cards)
+    names = sorted({card["name"] for card in set_cards})
+    picks = []
+    for _ in range(count):
+        deck = rng.sample(names, rng.randint(0, 22))
+        pack = rng.sample(names, 14)
+        context = engine.compile_deck(deck)
+        scores = {name: score + rng.gauss(0, noise)
+                  for name, score in _score_pack(engine, context, pack).items()}
+        picks.append({"deck": deck, "pack": pack, "pick": max(pack, key=scores.get)})
+    return picks
+
+
+def _score_pack(engine: CardRatingEngine, context, pack: List[str]) -> Dict[str, float]:
+    """Unrounded rating of each pack card for a compiled deck"""
+    scores = {}
+    for name in pack:
+        card = engine.resolve_card(name)
+        if card is not None:
+            scores[name] = engine._score_card(card, context)[-1]
+    return scores
+
+
+def _init_worker(set_cards, situations):
+    """Build the engine and compile every deck once per worker process"""
+    global _engine, _situations
+    _engine = CardRatingEngine(set_cards)
+    _situations = [(_engine.compile_deck(s["deck"]), s["pack"], s["pick"]) for s in situations]
+
+
+def evaluate(weights: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Replay every situation with the given RATING_WEIGHTS overrides.
+    Pack cards are ordered by rating (ties keep pack order) and the human
+    pick's 1-based position is recorded.
+    """
+    config.RATING_WEIGHTS = dict(config.RATING_WEIGHTS, **weights)
+    _engine.refresh_config()
+
+    ranks = []
+    for context, pack, pick in _situations:
+        scores = _score_pack(_engine, _engine.compile_deck(context), pack)
+        if pick not in scores:
+            continue
+        ordered = sorted(scores, key=lambda name: -round(scores[name], 1))
+        ranks.append(ordered.index(pick) + 1)
+
+    count = max(1, len(ranks))
+    return {
+        "weights": weights,
+        "top1": sum(rank == 1 for rank in ranks) / count,
+        "top3": sum(rank <= 3 for rank in ranks) / count,
+        "mean_rank": sum(ranks) / count,
+        "situations": len(ranks),
+    }
+
+
+def _objective(result: Dict[str, Any]) -> tuple:
+    return result["top1"], result["top3"], -result["mean_rank"]
+
+
+class WeightTuner:
+    """Evaluates candidate weight sets across a process pool"""
+
+    def __init__(self, set_cards: List[Dict[str, Any]], situations: List[Dict[str, Any]],
+                 processes: Optional[int] = None):
+        # Cards and situations go to each worker once, through the initializer
+        self.pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                         initargs=(set_cards, situations))
+        self.evaluations = 0
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate_many(self, candidates: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+        """Evaluate weight sets in parallel, preserving order"""
+        self.evaluations += len(candidates)
+        return self.pool.map(evaluate, candidates)
+
+    def grid_search(self, base: Dict[str, float], keys: List[str], steps: List[float]) -> Dict[str, Any]:
+        """Every combination of base value + step for the given keys"""
+        candidates = [dict(base, **{key: base[key] + step for key, step in zip(keys, combo)})
+                      for combo in itertools.product(steps, repeat=len(keys))]
+        return max(self.evaluate_many(candidates), key=_objective)
+
+    def random_search(self, base: Dict[str, float], keys: List[str], samples: int,
+                      spread: float = 1.0, seed: int = 0) -> Dict[str, Any]:
+        """Uniform perturbations of the base weights within +-spread"""
+        rng = random.Random(seed)
+        candidates = [dict(base)] + [
+            dict(base, **{key: round(base[key] + rng.uniform(-spread, spread), 2) for key in keys})
+            for _ in range(samples)
+        ]
+        return max(self.evaluate_many(candidates), key=_objective)
+
+    def coordinate_search(self, base: Dict[str, float], keys: List[str], step: float = 0.5,
+                          min_step: float = 0.125, max_rounds: int = 10) -> Dict[str, Any]:
+        """
+        Try +-step on every key in one parallel batch, move to the best
+        improvement and repeat; halve the step when nothing improves.
+        """
+        best = self.evaluate_many([dict(base)])[0]
+        for _ in range(max_rounds):
+            current = best["weights"]
+            candidates = [dict(current, **{key: current[key] + delta})
+                          for key in keys for delta in (-step, step)]
+            challenger = max(self.evaluate_many(candidates), key=_objective)
+            if _objective(challenger) > _objective(best):
+                best = challenger
+            elif step / 2 >= min_step:
+                step /= 2
+            else:
+                break
+        return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune RATING_WEIGHTS against recorded picks")
+    parser.add_argument("picks", nargs="?", help="JSON lines file of pick situations")
+    parser.add_argument("--set", default="TLA", help="cached set code the picks come from")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N situations instead")
+    parser.add_argument("--search", choices=("grid", "random", "coordinate"), default="coordinate")
+    parser.add_argument("--keys", nargs="+", default=list(DEFAULT_TUNED_KEYS),
+                        help="RATING_WEIGHTS keys to tune (grid search uses the first four)")
+    parser.add_argument("--samples", type=int, default=200, help="random search samples")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    set_cards = load_cached_set(args.set)
+    if args.picks:
+        situations = load_picks(args.picks)
+    elif args.synthetic:
+        situations = generate_picks(set_cards, args.synthetic)
+    else:
+        parser.error("give a picks file or --synthetic N")
+
+    base = {key: float(config.RATING_WEIGHTS.get(key, 0.0)) for key in args.keys}
+    tuner = WeightTuner(set_cards, situations, args.processes)
+    start = time.perf_counter()
+    try:
+        baseline = tuner.evaluate_many([base])[0]
+        if args.search == "grid":
+            best = tuner.grid_search(base, args.keys[:4], [-0.5, 0.0, 0.5])
+        elif args.search == "random":
+            best = tuner.random_search(base, args.keys, args.samples)
+        else:
+            best = tuner.coordinate_search(base, args.keys)
+    finally:
+        tuner.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(situations)} situations, {tuner.evaluations} evaluations in {elapsed:.1f}s "
+          f"({tuner.evaluations / elapsed * 60:.0f}/min)")
+    for label, result in (("current", baseline), ("best", best)):
+        print(f"{label:>8}: top-1 {result['top1']:.3f}  top-3 {result['top3']:.3f}  "
+              f"mean rank {result['mean_rank']:.2f}")
+    print("\nRATING_WEIGHTS overrides:")
+    print(json.dumps(best["weights"], indent=4))
+
+
+if __name__ == "__main__":
+    main()